@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Compare the split deployment with monolith mode
+
+Start the backend one way or the other, then run this script against the
+gateway. It reports request latency for a gateway -> ocr_service round trip
+and the combined resident memory of all uvicorn processes on this machine.
+
+Split deployment:   ./start_all_services.sh  (or start the four services by hand)
+Monolith mode:      cd backend/api_service && python -m uvicorn monolith:app --port 5001
+
+    python bench_monolith.py --url http://localhost:5001 -n 500
+"""
+import argparse
+import asyncio
+import statistics
+import subprocess
+import time
+
+import httpx
+from jose import jwt
+
+from config import JWT_SECRET_KEY, JWT_ALGORITHM
+
+RECEIPT_TEXT = """Walmart
+ROTH CREAMY 736547566780 F 3.97 N
+SILOSTFD RED 829354103800 F 5.48 N
+LYCHEE 840269200220 F 6.97 X
+SUBTOTAL 16.42
+TAX1 9.3750 % 0.65
+TOTAL 17.07"""
+
+
+def uvicorn_rss_mb() -> float:
+    """Sum of RSS for every running uvicorn process, in MB"""
+    output = subprocess.run(
+        ["ps", "-eo", "rss=,comm=,args="], capture_output=True, text=True
+    ).stdout
+    total_kb = 0
+    for line in output.splitlines():
+        rss, command, args = line.split(None, 2)
+        # Only the server processes, not shells whose command line mentions uvicorn
+        if command.startswith(("python", "uvicorn")) and "uvicorn" in args.split():
+            total_kb += int(rss)
+    return total_kb / 1024
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(url: str, requests: int, concurrency: int):
+    token = jwt.encode(
+        {"sub": "00000000-0000-0000-0000-000000000000", "email": "bench@smartbill.local"},
+        JWT_SECRET_KEY,
+        algorithm=JWT_ALGORITHM,
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=url, headers=headers, timeout=60.0) as client:
+        # Warm up connections and lazy imports
+        for _ in range(10):
+            await client.post("/api/ocr/test", json={"text": RECEIPT_TEXT})
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/ocr/test", json={"text": RECEIPT_TEXT})
+                latencies.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        wall = time.perf_counter() - wall_start
+
+    print(f"Requests:     {requests} (concurrency {concurrency})")
+    print(f"Throughput:   {requests / wall:.1f} req/s")
+    print(f"Latency p50:  {statistics.median(latencies):.2f} ms")
+    print(f"Latency p95:  {percentile(latencies, 95):.2f} ms")
+    print(f"Latency p99:  {percentile(latencies, 99):.2f} ms")
+    print(f"uvicorn RSS:  {uvicorn_rss_mb():.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5001", help="Gateway base URL")
+    parser.add_argument("-n", "--requests", type=int, default=500)
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency))
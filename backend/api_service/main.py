@@ -1,13 +1,15 @@
 """
 Main API Gateway Service - Routes requests to microservices
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from contextlib import asynccontextmanager
 import httpx
 from typing import Optional
 import os
+import sys
 
 from config import (
     AUTH_SERVICE_URL,
@@ -17,9 +19,20 @@ from config import (
 )
 from auth_middleware import verify_token
 
+# Modules shared by all services (profiling.py) live in backend/shared
+SHARED_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
+from profiling import install_profiler
+
 # Global HTTP client
 http_client = None
 
+# Optional in-process transports keyed by service URL.
+# Empty in the normal split deployment; monolith.py fills it so that
+# calls to a mounted service go through ASGI instead of the network.
+service_mounts: dict = {}
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -29,7 +42,7 @@ async def lifespan(app: FastAPI):
     global http_client
     # Create a single client instance for the entire application lifespan
     # This enables connection pooling and Keep-Alive
-    http_client = httpx.AsyncClient(timeout=60.0)
+    http_client = httpx.AsyncClient(timeout=60.0, mounts=service_mounts or None)
     yield
     await http_client.aclose()
 
@@ -76,6 +89,46 @@ async def forward_request(
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"{service_name} unavailable: {str(e)}")
 
+# Upstream response headers kept when streaming a response through
+STREAM_PASSTHROUGH_HEADERS = ("content-type", "content-encoding", "content-disposition", "vary")
+
+
+async def forward_stream(
+    method: str,
+    url: str,
+    headers: Optional[dict] = None,
+    params: Optional[dict] = None,
+    content=None,
+    service_name: str = "Service"
+):
+    """
+    Like forward_request, but streams the request body (`content` may be an
+    async iterator) and the upstream response instead of buffering either.
+    """
+    try:
+        upstream = await http_client.send(
+            http_client.build_request(method, url, headers=headers, params=params, content=content),
+            stream=True
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"{service_name} unavailable: {str(e)}")
+
+    if upstream.status_code >= 400:
+        body = await upstream.aread()
+        await upstream.aclose()
+        raise HTTPException(status_code=upstream.status_code, detail=body.decode(errors="replace"))
+
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers={
+            name: upstream.headers[name]
+            for name in STREAM_PASSTHROUGH_HEADERS
+            if name in upstream.headers
+        },
+        background=BackgroundTask(upstream.aclose)
+    )
+
 app = FastAPI(title="SmartBill API Gateway", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
@@ -87,6 +140,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (X-Profile-Token header / PROFILE_SAMPLE_RATE)
+install_profiler(app, "api_gateway")
+
 
 @app.get("/health")
 def health_check():
@@ -381,22 +437,167 @@ async def create_expense(
     )
 
 
+@app.post("/api/expenses/import")
+async def import_expenses(
+    request: Request,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token),
+    format: Optional[str] = None
+):
+    """
+    Bulk-import expenses from an NDJSON or CSV body
+    Requires authentication
+    The body and the NDJSON progress response are streamed, not buffered.
+    """
+    headers = {"Authorization": authorization} if authorization else {}
+    content_type = request.headers.get("content-type")
+    if content_type:
+        headers["Content-Type"] = content_type
+    return await forward_stream(
+        "POST",
+        f"{AUTH_SERVICE_URL}/expenses/import",
+        headers=headers,
+        params={"format": format} if format else None,
+        content=request.stream(),
+        service_name="Auth service"
+    )
+
+
 @app.get("/api/expenses")
 async def get_expenses(
     authorization: str = Header(None),
     user: dict = Depends(verify_token),
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    item: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
 ):
     """
     Get user's expenses
     Requires authentication
+    Pass `next_cursor` from the previous page as `cursor` to continue.
+    `item` keeps only expenses where someone was assigned that item.
+    `fields` / `include` select the returned fields; raw_text and
+    transcript are left out unless requested.
     """
     headers = {"Authorization": authorization} if authorization else {}
+    params = {"limit": limit, "offset": offset, "include_total": include_total}
+    if cursor:
+        params["cursor"] = cursor
+    if item:
+        params["item"] = item
+    if fields:
+        params["fields"] = fields
+    if include:
+        params["include"] = include
     return await forward_request(
         "GET",
         f"{AUTH_SERVICE_URL}/expenses",
-        params={"limit": limit, "offset": offset},
+        params=params,
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
+@app.get("/api/expenses/export")
+async def export_expenses(
+    request: Request,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token),
+    format: str = "ndjson"
+):
+    """
+    Download all of the user's expenses as NDJSON or CSV
+    Requires authentication
+    Streamed through without buffering; gzip is passed through untouched
+    when the client accepts it.
+    """
+    headers = {"Authorization": authorization} if authorization else {}
+    # Ask upstream for exactly what the client accepts, so compressed bytes
+    # can be relayed as-is (httpx would otherwise request gzip itself)
+    headers["Accept-Encoding"] = request.headers.get("accept-encoding") or "identity"
+    return await forward_stream(
+        "GET",
+        f"{AUTH_SERVICE_URL}/expenses/export",
+        headers=headers,
+        params={"format": format},
+        service_name="Auth service"
+    )
+
+
+@app.get("/api/expenses/search")
+async def search_expenses(
+    q: str,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token),
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
+):
+    """
+    Full-text search over the user's expenses, ranked
+    Requires authentication
+    Pass `next_cursor` from the previous page as `cursor` to continue.
+    """
+    headers = {"Authorization": authorization} if authorization else {}
+    params = {"q": q, "limit": limit}
+    if cursor:
+        params["cursor"] = cursor
+    if fields:
+        params["fields"] = fields
+    if include:
+        params["include"] = include
+    return await forward_request(
+        "GET",
+        f"{AUTH_SERVICE_URL}/expenses/search",
+        params=params,
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
+@app.get("/api/expenses/summary")
+async def get_expense_summary(
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """
+    Get dashboard totals (count, lifetime, month-to-date, owed / owing)
+    Requires authentication
+    """
+    headers = {"Authorization": authorization} if authorization else {}
+    return await forward_request(
+        "GET",
+        f"{AUTH_SERVICE_URL}/expenses/summary",
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
+@app.get("/api/expenses/shared-with-me")
+async def get_shared_expenses(
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token),
+    limit: int = 50,
+    offset: int = 0,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
+):
+    """Get expenses shared with current user"""
+    headers = {"Authorization": authorization} if authorization else {}
+    params = {"limit": limit, "offset": offset}
+    if fields:
+        params["fields"] = fields
+    if include:
+        params["include"] = include
+    return await forward_request(
+        "GET",
+        f"{AUTH_SERVICE_URL}/expenses/shared-with-me",
+        params=params,
         headers=headers,
         service_name="Auth service"
     )
@@ -573,17 +774,54 @@ async def create_expense_splits(
     )
 
 
+@app.post("/api/expenses/splits/calculate")
+async def calculate_splits(
+    request: dict,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """Preview split shares before the expense is saved"""
+    headers = {"Authorization": authorization} if authorization else {}
+    return await forward_request(
+        "POST",
+        f"{AUTH_SERVICE_URL}/expenses/splits/calculate",
+        json_data=request,
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
+@app.post("/api/expenses/{expense_id}/splits/calculate")
+async def calculate_expense_splits(
+    expense_id: str,
+    request: dict,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """Preview split shares for item assignments and a tax/tip policy"""
+    headers = {"Authorization": authorization} if authorization else {}
+    return await forward_request(
+        "POST",
+        f"{AUTH_SERVICE_URL}/expenses/{expense_id}/splits/calculate",
+        json_data=request,
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
 @app.get("/api/expenses/{expense_id}/splits")
 async def get_expense_splits(
     expense_id: str,
     authorization: str = Header(None),
-    user: dict = Depends(verify_token)
+    user: dict = Depends(verify_token),
+    item: Optional[str] = None
 ):
-    """Get expense splits"""
+    """Get expense splits (optionally only participants assigned `item`)"""
     headers = {"Authorization": authorization} if authorization else {}
     return await forward_request(
         "GET",
         f"{AUTH_SERVICE_URL}/expenses/{expense_id}/splits",
+        params={"item": item} if item else None,
         headers=headers,
         service_name="Auth service"
     )
@@ -607,16 +845,100 @@ async def send_bills_to_participants(
     )
 
 
-@app.get("/api/expenses/shared-with-me")
-async def get_shared_expenses(
+@app.patch("/api/expenses/{expense_id}/splits/{split_id}")
+async def update_expense_split(
+    expense_id: str,
+    split_id: str,
+    request: dict,
     authorization: str = Header(None),
     user: dict = Depends(verify_token)
 ):
-    """Get expenses shared with current user"""
+    """Mark a split as paid / unpaid"""
+    headers = {"Authorization": authorization} if authorization else {}
+    return await forward_request(
+        "PATCH",
+        f"{AUTH_SERVICE_URL}/expenses/{expense_id}/splits/{split_id}",
+        json_data=request,
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
+# ==================== Balance Routes ====================
+
+@app.get("/api/balances")
+async def get_balances(
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """Get net balances with every counterparty"""
     headers = {"Authorization": authorization} if authorization else {}
     return await forward_request(
         "GET",
-        f"{AUTH_SERVICE_URL}/expenses/shared-with-me",
+        f"{AUTH_SERVICE_URL}/balances",
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
+@app.get("/api/contact-groups/{group_id}/settle-up")
+async def get_settle_up_plan(
+    group_id: str,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """Get the transfers that settle all debts inside a contact group"""
+    headers = {"Authorization": authorization} if authorization else {}
+    return await forward_request(
+        "GET",
+        f"{AUTH_SERVICE_URL}/contact-groups/{group_id}/settle-up",
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
+# ==================== Analytics Routes ====================
+
+@app.get("/api/analytics/{report:path}")
+async def get_analytics(
+    report: str,
+    request: Request,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """
+    Spending analytics (daily, monthly, stores, contacts, groups, items/top)
+    Query parameters (start, end, limit) are passed through unchanged.
+    """
+    headers = {"Authorization": authorization} if authorization else {}
+    return await forward_request(
+        "GET",
+        f"{AUTH_SERVICE_URL}/analytics/{report}",
+        params=dict(request.query_params),
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
+# ==================== Item Catalog Routes ====================
+
+@app.get("/api/items/suggest")
+async def suggest_items(
+    q: str = "",
+    store: Optional[str] = None,
+    limit: int = 10,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """Autocomplete item names from the user's purchase history"""
+    headers = {"Authorization": authorization} if authorization else {}
+    params = {"q": q, "limit": limit}
+    if store:
+        params["store"] = store
+    return await forward_request(
+        "GET",
+        f"{AUTH_SERVICE_URL}/items/suggest",
+        params=params,
         headers=headers,
         service_name="Auth service"
     )
@@ -742,6 +1064,41 @@ async def update_contact_group(
     )
 
 
+@app.post("/api/contact-groups/{group_id}/members")
+async def add_contact_group_members(
+    group_id: str,
+    request: dict,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """Add contacts to a contact group"""
+    headers = {"Authorization": authorization} if authorization else {}
+    return await forward_request(
+        "POST",
+        f"{AUTH_SERVICE_URL}/contact-groups/{group_id}/members",
+        json_data=request,
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
+@app.delete("/api/contact-groups/{group_id}/members/{contact_id}")
+async def remove_contact_group_member(
+    group_id: str,
+    contact_id: str,
+    authorization: str = Header(None),
+    user: dict = Depends(verify_token)
+):
+    """Remove a contact from a contact group"""
+    headers = {"Authorization": authorization} if authorization else {}
+    return await forward_request(
+        "DELETE",
+        f"{AUTH_SERVICE_URL}/contact-groups/{group_id}/members/{contact_id}",
+        headers=headers,
+        service_name="Auth service"
+    )
+
+
 @app.delete("/api/contact-groups/{group_id}")
 async def delete_contact_group(
     group_id: str,
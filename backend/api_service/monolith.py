@@ -0,0 +1,258 @@
+"""
+Monolith mode - run the gateway and all backend services in one process
+
+The auth, OCR and STT FastAPI apps are imported into the gateway process and
+the gateway's HTTP client is pointed at them through ASGI transports, so every
+forwarded call stays in-process instead of crossing the network. Routes,
+payloads and error codes are exactly those of the split deployment.
+
+Usage (from backend/api_service, with every service's requirements installed):
+    python -m uvicorn monolith:app --port 5001
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import httpx
+from fastapi import FastAPI
+
+import main as gateway
+from config import AUTH_SERVICE_URL, OCR_SERVICE_URL, STT_SERVICE_URL
+
+logger = logging.getLogger("monolith")
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# service name -> (directory, URL the gateway uses to reach it)
+SERVICES = {
+    "auth_service": (os.path.join(BACKEND_DIR, "auth_service"), AUTH_SERVICE_URL),
+    "ocr_service": (os.path.join(BACKEND_DIR, "ocr_service"), OCR_SERVICE_URL),
+    "stt_service": (os.path.join(BACKEND_DIR, "stt_service"), STT_SERVICE_URL),
+}
+
+
+def _top_level_names(service_dir: str) -> set:
+    """Module and package names a service imports as top-level modules"""
+    names = set()
+    for entry in os.listdir(service_dir):
+        path = os.path.join(service_dir, entry)
+        if entry.endswith(".py"):
+            names.add(entry[:-3])
+        elif os.path.isdir(path) and os.path.exists(os.path.join(path, "__init__.py")):
+            names.add(entry)
+    return names
+
+
+class StreamingASGITransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that calls an ASGI app in-process and hands the response
+    body over chunk by chunk while the app is still sending it.
+
+    httpx.ASGITransport collects the whole body before returning, which
+    would hold a streamed export in memory and delay import progress events
+    until the import is done. Here the app runs in its own task and sends
+    through a small queue, so a slow reader also slows the app down
+    (back-pressure). App exceptions are logged. One raised before the
+    response starts becomes a 500, like a crashed upstream over HTTP; one
+    raised after it makes the reader fail with httpx.ReadError, so the
+    truncated body is not mistaken for a complete one (the gateway then
+    aborts the client connection, as uvicorn does in the split layout).
+    """
+
+    QUEUE_CHUNKS = 16
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "headers": [(k.lower(), v) for (k, v) in request.headers.raw],
+            "scheme": request.url.scheme,
+            "path": request.url.path,
+            "raw_path": request.url.raw_path,
+            "query_string": request.url.query,
+            "server": (request.url.host, request.url.port),
+            "client": ("127.0.0.1", 123),
+            "root_path": "",
+        }
+        request_body = request.stream.__aiter__()
+        request_complete = False
+        closed = asyncio.Event()
+        started = asyncio.get_running_loop().create_future()
+        chunks: asyncio.Queue = asyncio.Queue(self.QUEUE_CHUNKS)
+
+        async def receive() -> dict:
+            nonlocal request_complete
+            if request_complete:
+                # Streaming responses listen for this to stop early
+                await closed.wait()
+                return {"type": "http.disconnect"}
+            try:
+                body = await request_body.__anext__()
+            except StopAsyncIteration:
+                request_complete = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            return {"type": "http.request", "body": body, "more_body": True}
+
+        body_complete = False
+
+        async def send(message: dict):
+            nonlocal body_complete
+            if message["type"] == "http.response.start":
+                started.set_result(message)
+            elif message["type"] == "http.response.body" and not body_complete:
+                body = message.get("body", b"")
+                if body and request.method != "HEAD":
+                    await chunks.put(body)
+                if not message.get("more_body", False):
+                    body_complete = True
+                    await chunks.put(None)
+
+        async def run_app():
+            nonlocal body_complete
+            try:
+                await self.app(scope, receive, send)
+            except Exception as e:
+                logger.exception("In-process %s %s failed", request.method, request.url.path)
+                if started.done() and not body_complete and not closed.is_set():
+                    body_complete = True
+                    await chunks.put(e)
+            finally:
+                if not started.done():
+                    started.set_result({"status": 500, "headers": []})
+                if not body_complete and not closed.is_set():
+                    # The app stopped without finishing the body: end it here
+                    await chunks.put(None)
+
+        task = asyncio.create_task(run_app())
+        try:
+            start = await started
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        return httpx.Response(
+            start["status"],
+            headers=start.get("headers", []),
+            stream=_ASGIResponseStream(chunks, task, closed),
+        )
+
+
+class _ASGIResponseStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: asyncio.Queue, task: asyncio.Task, closed: asyncio.Event):
+        self._chunks = chunks
+        self._task = task
+        self._closed = closed
+        self._complete = False
+
+    async def __aiter__(self):
+        while not self._complete:
+            chunk = await self._chunks.get()
+            if chunk is None:
+                self._complete = True
+                break
+            if isinstance(chunk, Exception):
+                raise httpx.ReadError(f"App failed mid-response: {chunk!r}") from chunk
+            yield chunk
+
+    async def aclose(self):
+        self._closed.set()
+        if not self._complete:
+            # Reader gave up early: stop the app instead of letting it block
+            self._task.cancel()
+        try:
+            # A finished response may still run background tasks
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+# Modules a service only imports inside functions (at call time, when its
+# directory is no longer on sys.path), so they are imported up front
+LAZY_IMPORTS = {
+    "auth_service": ["migrations"],  # database.init_db / check_schema
+}
+
+
+def load_service_app(name: str, service_dir: str) -> FastAPI:
+    """
+    Import a service's main.py and return its FastAPI app.
+
+    Every service uses flat imports (`from models import ...`, `from config
+    import ...`), and several of those names collide between services. While a
+    service is imported, colliding modules from earlier services are hidden
+    from sys.modules; afterwards they are put back. Modules that did not
+    collide stay registered so lazy imports inside the service keep working.
+    """
+    shadowed = _top_level_names(service_dir)
+    saved = {
+        mod_name: sys.modules.pop(mod_name)
+        for mod_name in list(sys.modules)
+        if mod_name.split('.')[0] in shadowed
+    }
+
+    sys.path.insert(0, service_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            f"{name}_main", os.path.join(service_dir, "main.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        for mod_name in LAZY_IMPORTS.get(name, []):
+            importlib.import_module(mod_name)
+    finally:
+        sys.path.remove(service_dir)
+        saved_tops = {mod_name.split('.')[0] for mod_name in saved}
+        for mod_name in list(sys.modules):
+            if mod_name.split('.')[0] in saved_tops:
+                del sys.modules[mod_name]
+        sys.modules.update(saved)
+
+    return module.app
+
+
+# Load auth_service first: it is the only service with lazy flat imports
+# (database.init_db imports `migrations` at call time), so its modules must
+# be the ones left registered under the shared names.
+service_apps = {
+    name: load_service_app(name, service_dir)
+    for name, (service_dir, _) in SERVICES.items()
+}
+
+gateway.service_mounts.update({
+    url: StreamingASGITransport(service_apps[name])
+    for name, (_, url) in SERVICES.items()
+})
+
+app = gateway.app
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run each mounted service's startup/shutdown hooks (e.g. auth_service's
+    database initialisation) around the gateway's own lifespan.
+    ASGITransport does not send lifespan events, so this is done here.
+    """
+    async with AsyncExitStack() as stack:
+        for service_app in service_apps.values():
+            await stack.enter_async_context(
+                service_app.router.lifespan_context(service_app)
+            )
+        async with gateway.lifespan(app):
+            yield
+
+
+app.router.lifespan_context = lifespan
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5001)
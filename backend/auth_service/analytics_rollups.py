@@ -0,0 +1,154 @@
+"""
+Incremental maintenance of the spending analytics rollups
+
+Write paths call these helpers inside their own transaction with the rows
+they have just created (sign=1) or are about to delete (sign=-1). Deltas
+are aggregated in Python first, so each rollup table takes one multi-row
+upsert per call no matter how many expenses, items or splits are involved.
+Reads (routers/analytics.py) then only touch a few rows per month.
+"""
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Iterable, Optional, Tuple
+import uuid as uuid_lib
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import SpendDaily, SpendStoreMonthly, SpendParticipantMonthly, SpendItemMonthly
+
+# Must match the trimming in migrations/v0006_analytics_rollups.py
+WHITESPACE = " \t\r\n"
+KEY_LENGTH = 255
+
+
+def normalize_key(value: Optional[str]) -> str:
+    return (value or "").strip(WHITESPACE).lower()[:KEY_LENGTH]
+
+
+def participant_key(email: Optional[str], name: Optional[str]) -> str:
+    """Email when there is one, otherwise the participant's name"""
+    email_key = normalize_key(email)
+    return email_key if email_key else ("name:" + normalize_key(name))[:KEY_LENGTH]
+
+
+def _utc_day(created_at: Optional[datetime]) -> date:
+    created_at = created_at or datetime.now(timezone.utc)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.astimezone(timezone.utc).date()
+
+
+async def _upsert(
+    db: AsyncSession,
+    model,
+    rows: dict,
+    key_columns: Tuple[str, ...],
+    labels: Tuple[str, ...] = (),
+    update_labels: bool = True
+):
+    """
+    Add the numeric columns of each row to the stored row with the same key.
+    Label columns are overwritten (on additions only) rather than summed.
+    """
+    if not rows:
+        return
+    stmt = insert(model).values(list(rows.values()))
+    sample = next(iter(rows.values()))
+    set_ = {
+        name: getattr(model, name) + getattr(stmt.excluded, name)
+        for name in sample
+        if name not in key_columns and name not in labels
+    }
+    if update_labels:
+        for name in labels:
+            set_[name] = getattr(stmt.excluded, name)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(model, name) for name in key_columns],
+        set_=set_,
+    )
+    await db.execute(stmt)
+
+
+async def record_expenses(
+    db: AsyncSession,
+    user_id: uuid_lib.UUID,
+    expenses: Iterable[Tuple[Optional[datetime], object]],
+    sign: int = 1
+):
+    """
+    Fold (created_at, expense) pairs into the daily, store and item rollups.
+    `expense` needs store_name, total_amount and items (name, price,
+    quantity); ORM rows and request schemas both qualify.
+    """
+    daily = {}
+    stores = {}
+    items = {}
+
+    for created_at, expense in expenses:
+        day = _utc_day(created_at)
+        month = day.replace(day=1)
+        amount = Decimal(expense.total_amount) * sign
+
+        row = daily.setdefault(day, {
+            "user_id": user_id, "day": day, "expense_count": 0, "total_amount": Decimal(0),
+        })
+        row["expense_count"] += sign
+        row["total_amount"] += amount
+
+        store_key = normalize_key(expense.store_name)
+        row = stores.setdefault((month, store_key), {
+            "user_id": user_id, "month": month, "store_key": store_key,
+            "store_label": (expense.store_name or "").strip(WHITESPACE)[:KEY_LENGTH],
+            "expense_count": 0, "total_amount": Decimal(0),
+        })
+        row["expense_count"] += sign
+        row["total_amount"] += amount
+
+        for item in expense.items or []:
+            item_key = normalize_key(item.name)
+            quantity = Decimal(item.quantity if item.quantity is not None else 1)
+            row = items.setdefault((month, item_key), {
+                "user_id": user_id, "month": month, "item_key": item_key,
+                "item_label": (item.name or "").strip(WHITESPACE)[:KEY_LENGTH],
+                "occurrences": 0, "quantity": Decimal(0), "total_amount": Decimal(0),
+            })
+            row["occurrences"] += sign
+            row["quantity"] += quantity * sign
+            row["total_amount"] += Decimal(item.price) * quantity * sign
+
+    await _upsert(db, SpendDaily, daily, ("user_id", "day"))
+    await _upsert(
+        db, SpendStoreMonthly, stores,
+        ("user_id", "month", "store_key"), ("store_label",), update_labels=sign > 0
+    )
+    await _upsert(
+        db, SpendItemMonthly, items,
+        ("user_id", "month", "item_key"), ("item_label",), update_labels=sign > 0
+    )
+
+
+async def record_splits(
+    db: AsyncSession,
+    user_id: uuid_lib.UUID,
+    expense_created_at: Optional[datetime],
+    splits: Iterable,
+    sign: int = 1
+):
+    """Fold one expense's splits into the per-participant monthly rollup"""
+    month = _utc_day(expense_created_at).replace(day=1)
+    rows = {}
+    for split in splits:
+        key = participant_key(split.participant_email, split.participant_name)
+        row = rows.setdefault(key, {
+            "user_id": user_id, "month": month, "participant_key": key,
+            "participant_label": (split.participant_name or "").strip(WHITESPACE)[:KEY_LENGTH],
+            "split_count": 0, "total_amount": Decimal(0),
+        })
+        row["split_count"] += sign
+        row["total_amount"] += Decimal(split.amount_owed) * sign
+
+    await _upsert(
+        db, SpendParticipantMonthly, rows,
+        ("user_id", "month", "participant_key"), ("participant_label",), update_labels=sign > 0
+    )
@@ -0,0 +1,86 @@
+"""
+Pydantic schemas for spending analytics
+"""
+from pydantic import BaseModel
+from typing import List
+from datetime import date
+from decimal import Decimal
+from uuid import UUID
+
+
+class DailySpend(BaseModel):
+    day: date
+    expense_count: int
+    total_amount: Decimal
+
+
+class MonthlySpend(BaseModel):
+    month: date
+    expense_count: int
+    total_amount: Decimal
+
+
+class StoreMonthlySpend(BaseModel):
+    month: date
+    store_name: str
+    expense_count: int
+    total_amount: Decimal
+
+
+class ContactMonthlySpend(BaseModel):
+    month: date
+    participant_key: str  # Email, or 'name:<name>' for participants without one
+    participant_name: str
+    split_count: int
+    total_amount: Decimal
+
+
+class GroupMonthlySpend(BaseModel):
+    month: date
+    group_id: UUID
+    group_name: str
+    split_count: int
+    total_amount: Decimal
+
+
+class TopItem(BaseModel):
+    item_name: str
+    occurrences: int
+    quantity: Decimal
+    total_amount: Decimal
+
+
+class DailySpendResponse(BaseModel):
+    start: date
+    end: date
+    days: List[DailySpend]
+
+
+class MonthlySpendResponse(BaseModel):
+    start: date
+    end: date
+    months: List[MonthlySpend]
+
+
+class StoreSpendResponse(BaseModel):
+    start: date
+    end: date
+    stores: List[StoreMonthlySpend]
+
+
+class ContactSpendResponse(BaseModel):
+    start: date
+    end: date
+    contacts: List[ContactMonthlySpend]
+
+
+class GroupSpendResponse(BaseModel):
+    start: date
+    end: date
+    groups: List[GroupMonthlySpend]
+
+
+class TopItemsResponse(BaseModel):
+    start: date
+    end: date
+    items: List[TopItem]
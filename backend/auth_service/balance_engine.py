@@ -0,0 +1,177 @@
+"""
+Pairwise balances and settle-up planning
+
+`balances` holds one row per (user, counterparty email) with the net unpaid
+amount between them; positive means the counterparty owes the user. Split
+writes call apply_split_balances() in the same transaction, so reading a
+user's balances or a group's positions never touches expense_splits.
+Participants who register later get their side of the existing balances
+from backfill_registered_balances().
+"""
+import heapq
+import uuid as uuid_lib
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Hashable, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import String, Numeric, column, func, literal, select, values
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Balance, User
+from user_cache import UserSnapshot
+
+CENT = Decimal("0.01")
+
+
+async def apply_split_balances(
+    db: AsyncSession,
+    owner: UserSnapshot,
+    splits: Iterable,
+    sign: int = 1
+):
+    """
+    Apply unpaid splits on one of owner's expenses to the pair balances:
+    owner -> participant is credited and, for registered participants,
+    participant -> owner is debited. Pass sign=-1 when the splits are
+    removed or marked paid. Splits addressed to the owner are ignored.
+    """
+    owed_by_email = defaultdict(Decimal)
+    for split in splits:
+        if split.is_paid:
+            continue
+        email = (split.participant_email or "").lower()
+        if not email or email == owner.email:
+            continue
+        owed_by_email[email] += Decimal(split.amount_owed) * sign
+    if not owed_by_email:
+        return
+
+    now = datetime.now(timezone.utc)
+
+    # Owner side: one row per participant
+    stmt = insert(Balance).values([
+        {"user_id": owner.id, "counterparty_email": email, "net_amount": amount}
+        for email, amount in owed_by_email.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Balance.user_id, Balance.counterparty_email],
+        set_={"net_amount": Balance.net_amount + stmt.excluded.net_amount, "updated_at": now},
+    )
+    await db.execute(stmt)
+
+    # Participant side: only participants with an account, matched in SQL
+    participants = values(
+        column("email", String), column("amount", Numeric), name="participants"
+    ).data(list(owed_by_email.items()))
+    stmt = insert(Balance).from_select(
+        ["user_id", "counterparty_email", "net_amount"],
+        select(User.id, literal(owner.email, String), -participants.c.amount)
+        .join(participants, User.email == participants.c.email)
+        .where(User.id != owner.id),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Balance.user_id, Balance.counterparty_email],
+        set_={"net_amount": Balance.net_amount + stmt.excluded.net_amount, "updated_at": now},
+    )
+    await db.execute(stmt)
+
+
+async def backfill_registered_balances(db: AsyncSession, user_id: uuid_lib.UUID, email: str):
+    """
+    Give a newly registered user the participant side of every balance
+    other users already hold against their email, so both directions stay
+    mirrored (and group positions sum to zero). One INSERT ... SELECT.
+    """
+    owners = select(Balance.user_id.label("owner_id"), Balance.net_amount).where(
+        Balance.counterparty_email == email.lower(),
+        Balance.user_id != user_id,
+        Balance.net_amount != 0
+    ).subquery()
+    stmt = insert(Balance).from_select(
+        ["user_id", "counterparty_email", "net_amount"],
+        select(literal(user_id, UUID(as_uuid=True)), User.email, -owners.c.net_amount)
+        .join(owners, User.id == owners.c.owner_id),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Balance.user_id, Balance.counterparty_email],
+        set_={"net_amount": stmt.excluded.net_amount, "updated_at": datetime.now(timezone.utc)},
+    )
+    await db.execute(stmt)
+
+
+async def group_positions(
+    db: AsyncSession,
+    members: Sequence[Tuple[uuid_lib.UUID, str]]
+) -> Dict[uuid_lib.UUID, Decimal]:
+    """
+    Net position of each (user_id, email) member counting only balances
+    with other members; positive means the member is owed money.
+    One grouped query over the balances primary key.
+    """
+    user_ids = [user_id for user_id, _ in members]
+    emails = [email for _, email in members]
+    rows = await db.execute(
+        select(Balance.user_id, func.sum(Balance.net_amount))
+        .where(Balance.user_id.in_(user_ids), Balance.counterparty_email.in_(emails))
+        .group_by(Balance.user_id)
+    )
+    positions = {user_id: Decimal(0) for user_id in user_ids}
+    for user_id, amount in rows:
+        positions[user_id] = amount or Decimal(0)
+    return positions
+
+
+def plan_settlement(positions: Dict[Hashable, Decimal]) -> List[Tuple[Hashable, Hashable, Decimal]]:
+    """
+    Turn net positions into (debtor, creditor, amount) transfers.
+
+    Debtors whose amount exactly matches a creditor are paired first; the
+    rest are settled greedily, largest debtor against largest creditor,
+    using two heaps. That gives at most n - 1 transfers in O(n log n)
+    (an exact minimum is NP-hard). Amounts are handled in integer cents.
+    """
+    creditors, debtors = [], []
+    for key, amount in positions.items():
+        cents = int((Decimal(amount) / CENT).to_integral_value())
+        if cents > 0:
+            creditors.append((cents, key))
+        elif cents < 0:
+            debtors.append((-cents, key))
+
+    transfers = []
+
+    # Exact matches settle two people with one transfer
+    creditors_by_amount = defaultdict(list)
+    for cents, key in creditors:
+        creditors_by_amount[cents].append(key)
+    unmatched_debtors = []
+    for cents, key in debtors:
+        if creditors_by_amount.get(cents):
+            transfers.append((key, creditors_by_amount[cents].pop(), cents))
+        else:
+            unmatched_debtors.append((cents, key))
+
+    # Max-heaps via negated amounts; ties broken by insertion order
+    unmatched_creditors = [
+        (cents, key) for cents, keys in creditors_by_amount.items() for key in keys
+    ]
+    creditor_heap = [(-cents, index, key) for index, (cents, key) in enumerate(unmatched_creditors)]
+    debtor_heap = [(-cents, index, key) for index, (cents, key) in enumerate(unmatched_debtors)]
+    heapq.heapify(creditor_heap)
+    heapq.heapify(debtor_heap)
+    counter = len(creditor_heap) + len(debtor_heap)
+
+    while creditor_heap and debtor_heap:
+        credit, _, creditor = heapq.heappop(creditor_heap)
+        debit, _, debtor = heapq.heappop(debtor_heap)
+        cents = min(-credit, -debit)
+        transfers.append((debtor, creditor, cents))
+        counter += 1
+        if -credit > cents:
+            heapq.heappush(creditor_heap, (credit + cents, counter, creditor))
+        if -debit > cents:
+            heapq.heappush(debtor_heap, (debit + cents, counter, debtor))
+
+    return [(debtor, creditor, Decimal(cents) * CENT) for debtor, creditor, cents in transfers]
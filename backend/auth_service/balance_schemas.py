@@ -0,0 +1,35 @@
+"""
+Pydantic schemas for balances and settle-up plans
+"""
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+
+class BalanceSchema(BaseModel):
+    counterparty_email: str
+    counterparty_user_id: Optional[UUID] = None  # Set if the counterparty has an account
+    net_amount: Decimal  # Positive: they owe you; negative: you owe them
+    updated_at: Optional[datetime] = None
+
+
+class BalanceListResponse(BaseModel):
+    balances: List[BalanceSchema]
+    total_owed_to_you: Decimal
+    total_you_owe: Decimal
+
+
+class SettlementTransfer(BaseModel):
+    from_user_id: UUID
+    from_email: str
+    to_user_id: UUID
+    to_email: str
+    amount: Decimal
+
+
+class SettlementPlanResponse(BaseModel):
+    group_id: UUID
+    member_count: int
+    transfers: List[SettlementTransfer]
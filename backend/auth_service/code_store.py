@@ -0,0 +1,171 @@
+"""
+TTL store for one-time email codes (registration, password reset)
+
+Codes are written with an expiry and consumed at most once: consume()
+removes the code and reports whether it was present and unexpired, in one
+atomic step, so two concurrent requests cannot both use the same code.
+Handlers pass their session to consume() so the removal commits or rolls
+back together with the change the code authorises (a failed registration
+leaves the code usable).
+
+Backends (CODE_STORE):
+- "postgres" (default): the UNLOGGED one_time_codes table. Consuming is a
+  single DELETE ... RETURNING in the caller's transaction (its row lock
+  holds off a concurrent consume until that transaction ends); expired
+  rows are purged every CODE_PURGE_INTERVAL seconds by a background task.
+- "memory": a dict in this process. Only for a single worker (development,
+  tests); codes are lost on restart, and a consumed code is gone even if
+  the caller's transaction rolls back.
+"""
+import abc
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import engine
+from metrics import metrics
+from models import OneTimeCode
+
+logger = logging.getLogger(__name__)
+
+CODE_STORE = os.getenv("CODE_STORE", "postgres").lower()
+CODE_TTL_SECONDS = int(os.getenv("CODE_TTL_SECONDS", "600"))
+CODE_PURGE_INTERVAL = float(os.getenv("CODE_PURGE_INTERVAL", "300"))
+
+REGISTRATION = "registration"
+PASSWORD_RESET = "password_reset"
+
+
+class CodeStore(abc.ABC):
+    """Interface shared by the backends"""
+
+    @abc.abstractmethod
+    async def put(self, purpose: str, email: str, code: str, ttl: int = CODE_TTL_SECONDS):
+        """Store the code until ttl seconds from now"""
+
+    @abc.abstractmethod
+    async def consume(
+        self, purpose: str, email: str, code: str, db: Optional[AsyncSession] = None
+    ) -> bool:
+        """
+        Remove the code; True if it existed and had not expired. With db
+        the removal is part of that session's transaction (the caller
+        commits); without it, it commits on its own.
+        """
+
+    @abc.abstractmethod
+    async def purge(self) -> int:
+        """Drop expired codes; returns how many were removed"""
+
+
+class MemoryCodeStore(CodeStore):
+    def __init__(self):
+        self._codes: Dict[Tuple[str, str, str], float] = {}
+
+    async def put(self, purpose: str, email: str, code: str, ttl: int = CODE_TTL_SECONDS):
+        self._codes[(purpose, email, code)] = time.monotonic() + ttl
+
+    async def consume(
+        self, purpose: str, email: str, code: str, db: Optional[AsyncSession] = None
+    ) -> bool:
+        # No await between lookup and removal: atomic within the event loop
+        expires_at = self._codes.pop((purpose, email, code), None)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    async def purge(self) -> int:
+        now = time.monotonic()
+        expired = [key for key, expires_at in self._codes.items() if expires_at <= now]
+        for key in expired:
+            del self._codes[key]
+        return len(expired)
+
+
+class PostgresCodeStore(CodeStore):
+    async def put(self, purpose: str, email: str, code: str, ttl: int = CODE_TTL_SECONDS):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        stmt = insert(OneTimeCode).values(
+            purpose=purpose, email=email, code=code, expires_at=expires_at
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[OneTimeCode.purpose, OneTimeCode.email, OneTimeCode.code],
+            set_={"expires_at": stmt.excluded.expires_at},
+        )
+        async with engine.begin() as conn:
+            await conn.execute(stmt)
+
+    async def consume(
+        self, purpose: str, email: str, code: str, db: Optional[AsyncSession] = None
+    ) -> bool:
+        stmt = (
+            delete(OneTimeCode)
+            .where(
+                OneTimeCode.purpose == purpose,
+                OneTimeCode.email == email,
+                OneTimeCode.code == code
+            )
+            .returning(OneTimeCode.expires_at)
+        )
+        if db is not None:
+            expires_at = await db.scalar(stmt)
+        else:
+            async with engine.begin() as conn:
+                expires_at = await conn.scalar(stmt)
+        return expires_at is not None and expires_at > datetime.now(timezone.utc)
+
+    async def purge(self) -> int:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                delete(OneTimeCode).where(OneTimeCode.expires_at <= func.now())
+            )
+        return result.rowcount
+
+
+def _create_store() -> CodeStore:
+    if CODE_STORE == "memory":
+        return MemoryCodeStore()
+    if CODE_STORE == "postgres":
+        return PostgresCodeStore()
+    raise RuntimeError(f"Unknown CODE_STORE {CODE_STORE!r} (expected postgres or memory)")
+
+
+code_store: CodeStore = _create_store()
+
+
+async def _purge_forever():
+    while True:
+        await asyncio.sleep(CODE_PURGE_INTERVAL)
+        try:
+            removed = await code_store.purge()
+            metrics.inc("code_store_purged", removed)
+        except Exception as e:
+            logger.warning("Purging expired codes failed: %s", e)
+
+
+_purger: Optional[asyncio.Task] = None
+
+
+async def start_purger():
+    """Start the periodic purge of expired codes (app startup)"""
+    global _purger
+    if _purger is None and CODE_PURGE_INTERVAL > 0:
+        _purger = asyncio.create_task(_purge_forever())
+
+
+async def stop_purger():
+    """Stop the purge task (app shutdown)"""
+    global _purger
+    if _purger is None:
+        return
+    _purger.cancel()
+    try:
+        await _purger
+    except asyncio.CancelledError:
+        pass
+    _purger = None
@@ -0,0 +1,31 @@
+"""
+Shared pytest fixtures
+
+Tests that need Postgres take the `database` fixture. It connects to
+DATABASE_URL once per session and skips those tests when the database is
+unreachable, so the suite stays green on machines without one.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from database import DATABASE_URL, engine
+
+PROBE_TIMEOUT_SECONDS = 5
+
+
+async def _probe():
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def database():
+    try:
+        asyncio.run(asyncio.wait_for(_probe(), PROBE_TIMEOUT_SECONDS))
+    except Exception as e:
+        pytest.skip(f"DATABASE_URL ({DATABASE_URL}) is unreachable: {e}")
@@ -27,6 +27,14 @@ class UpdateContactGroupRequest(BaseModel):
     contact_ids: Optional[List[UUID]] = None
 
 
+class AddGroupMembersRequest(BaseModel):
+    contact_ids: List[UUID]
+
+
+class GroupMembersResponse(BaseModel):
+    members: List[ContactGroupMemberSchema]
+
+
 class ContactGroupResponse(BaseModel):
     id: UUID
     user_id: UUID
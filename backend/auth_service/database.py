@@ -1,12 +1,17 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import NullPool
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 import os
+import time
+from uuid import uuid4
 from dotenv import load_dotenv
 
+from metrics import metrics
+
 # Load from project root .env file
 project_root = os.path.join(os.path.dirname(__file__), '..', '..', '..')
 env_path = os.path.join(project_root, '.env')
@@ -18,21 +23,125 @@ DATABASE_URL = os.getenv(
     "postgresql://kongyingyi@localhost:5432/smartbill"
 )
 
-engine = create_engine(DATABASE_URL, poolclass=NullPool)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str) -> str:
+    """
+    Point a plain postgresql:// URL at the asyncpg driver.
+    DATABASE_URL stays driver-agnostic so existing .env files keep working.
+    """
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# Connection pool settings
+# DB_POOL_SIZE=0 disables app-side pooling (one connection per session).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# PgBouncer in transaction/statement mode cannot keep prepared statements
+# across transactions, so asyncpg's statement caches must be off.
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records checkout wait time, overflow connections
+    and checkout timeouts in the metrics registry.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        overflow_before = self._overflow
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.inc("db_pool_checkout_timeouts")
+            raise
+        finally:
+            metrics.observe("db_pool_checkout_wait", time.perf_counter() - start)
+            if self._overflow > max(overflow_before, 0):
+                metrics.inc("db_pool_overflow_events")
+
+
+def _engine_options() -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if DB_POOL_SIZE <= 0:
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=InstrumentedPool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    if DB_PGBOUNCER:
+        # Transaction pooling hands each transaction a different server
+        # connection: no statement caches, and unique prepared statement
+        # names so they cannot collide with another client's
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return options
+
+
+engine = create_async_engine(to_async_url(DATABASE_URL), **_engine_options())
 
-def get_db() -> Session:
+
+@event.listens_for(engine.sync_engine, "connect")
+def _count_new_connection(dbapi_connection, connection_record):
+    metrics.inc("db_pool_connections_opened")
+
+
+if DB_POOL_SIZE > 0:
+    metrics.gauge("db_pool_size", lambda: engine.sync_engine.pool.size())
+    metrics.gauge("db_pool_checked_out", lambda: engine.sync_engine.pool.checkedout())
+    metrics.gauge("db_pool_idle", lambda: engine.sync_engine.pool.checkedin())
+    metrics.gauge("db_pool_overflow", lambda: max(engine.sync_engine.pool.overflow(), 0))
+
+# expire_on_commit=False: objects stay readable after commit without an
+# implicit (and, under asyncio, forbidden) lazy refresh.
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+
+
+async def get_db() -> AsyncSession:
     """Dependency for getting database session"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
-    """Initialize database tables"""
-    from models import Base
-    Base.metadata.create_all(bind=engine)
+# Apply pending migrations at startup instead of refusing to start
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+
+
+async def init_db():
+    """Create or upgrade database tables by applying all pending migrations"""
+    from migrations import migrate
+    return await migrate(engine)
+
 
+async def check_schema():
+    """
+    Startup check: compare the recorded schema version with the code.
+    This is one small query, not a reflection of every table.
+    """
+    from migrations import LATEST_VERSION, current_version
+    async with engine.connect() as conn:
+        version = await current_version(conn)
+    if version == LATEST_VERSION:
+        return
+    if version > LATEST_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this code ({LATEST_VERSION})"
+        )
+    if not AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema version {version} is behind {LATEST_VERSION}; run `python init_db.py`"
+        )
+    await init_db()
@@ -3,29 +3,22 @@ Common dependencies for the application
 """
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid as uuid_lib
-from database import SessionLocal
-from models import User
+from database import get_db
 from auth import verify_token
+from user_cache import UserSnapshot, load_user
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_db() -> Session:
-    """Dependency for getting database session"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
+    db: AsyncSession = Depends(get_db)
+) -> UserSnapshot:
     """
-    Get current user from JWT token
+    Get current user from JWT token.
+    Returns a read-only snapshot, usually from the user cache.
     """
     payload = verify_token(token)
     if not payload:
@@ -34,7 +27,7 @@ async def get_current_user(
             detail="Invalid token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
     user_id_str = payload.get("sub")
     if not user_id_str:
         raise HTTPException(
@@ -42,7 +35,7 @@ async def get_current_user(
             detail="Invalid token payload",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
     try:
         user_id = uuid_lib.UUID(user_id_str)
     except (ValueError, TypeError):
@@ -51,13 +44,12 @@ async def get_current_user(
             detail="Invalid user ID format",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        
-    user = db.query(User).filter(User.id == user_id).first()
+
+    user = await load_user(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-        
-    return user
 
+    return user
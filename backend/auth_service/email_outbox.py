@@ -0,0 +1,116 @@
+"""
+Transactional email outbox
+
+Request handlers call enqueue() with their own session, so an email is
+queued if and only if the transaction that calls for it commits. Nothing
+is sent from the API process: outbox_worker.py claims pending rows and
+delivers them through email_service.
+
+Digest mode (BILL_DIGEST_WINDOW_SECONDS > 0): bill emails are held for the
+window, and the worker sends all pending bills for a recipient as one
+combined email when the oldest of them falls due.
+"""
+import os
+import uuid as uuid_lib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import EmailOutbox
+
+SPLIT_BILL = "split_bill"
+
+BILL_DIGEST_WINDOW_SECONDS = int(os.getenv("BILL_DIGEST_WINDOW_SECONDS", "0"))
+
+
+def split_bill_message(split, payer_name: str, expense) -> dict:
+    """Outbox row for one split's bill email (expense / split data captured now)"""
+    return {
+        "id": uuid_lib.uuid4(),
+        "kind": SPLIT_BILL,
+        "recipient": split.participant_email,
+        "split_id": split.id,
+        "payload": {
+            "to_name": split.participant_name,
+            "payer_name": payer_name,
+            "expense": {
+                "store_name": expense.store_name or "Unknown",
+                "total": str(expense.total_amount),
+                "date": expense.created_at.strftime("%B %d, %Y") if expense.created_at else "Recent",
+            },
+            "split": {
+                "amount_owed": str(split.amount_owed),
+                "items_detail": split.items_detail or [],
+            },
+        },
+    }
+
+
+async def enqueue(db: AsyncSession, messages: List[dict]) -> List[uuid_lib.UUID]:
+    """
+    Queue messages in the caller's transaction with one multi-row insert.
+    A split has at most one pending email (unique partial index): a message
+    for a split that already has one is skipped, also under concurrent
+    calls. Returns the ids of the messages actually queued.
+    """
+    if not messages:
+        return []
+    now = datetime.now(timezone.utc)
+    digest_due = now + timedelta(seconds=BILL_DIGEST_WINDOW_SECONDS)
+    messages = [
+        dict(message, next_attempt_at=digest_due if message["kind"] == SPLIT_BILL else now)
+        for message in messages
+    ]
+    stmt = (
+        insert(EmailOutbox)
+        .values(messages)
+        .on_conflict_do_nothing(
+            index_elements=[EmailOutbox.split_id],
+            index_where=text("status = 'pending'")
+        )
+        .returning(EmailOutbox.id)
+    )
+    return list((await db.scalars(stmt)).all())
+
+
+def _bill(row: EmailOutbox) -> dict:
+    payload = row.payload
+    return {
+        "payer_name": payload["payer_name"],
+        "expense_data": dict(payload["expense"], total=Decimal(payload["expense"]["total"])),
+        "split_data": dict(payload["split"], amount_owed=Decimal(payload["split"]["amount_owed"])),
+    }
+
+
+async def deliver(rows: List[EmailOutbox]) -> Optional[str]:
+    """
+    Send one email for a group of outbox rows with the same kind and
+    recipient (more than one only for bill digests). Returns None on
+    success, otherwise the error.
+    """
+    # Imported here so API workers never need the SMTP configuration
+    from email_service import send_split_bill_email, send_split_bill_digest_email
+
+    row = rows[0]
+    if row.kind == SPLIT_BILL:
+        if len(rows) > 1:
+            sent = await send_split_bill_digest_email(
+                to_email=row.recipient,
+                to_name=row.payload["to_name"],
+                bills=[_bill(r) for r in sorted(rows, key=lambda r: r.created_at)]
+            )
+            return None if sent else "send_split_bill_digest_email failed"
+        bill = _bill(row)
+        sent = await send_split_bill_email(
+            to_email=row.recipient,
+            to_name=row.payload["to_name"],
+            payer_name=bill["payer_name"],
+            expense_data=bill["expense_data"],
+            split_data=bill["split_data"]
+        )
+        return None if sent else "send_split_bill_email failed"
+    return f"Unknown outbox kind {row.kind!r}"
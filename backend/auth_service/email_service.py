@@ -1,13 +1,23 @@
 """
 Email service for sending verification codes
+
+Messages go through a pool of authenticated SMTP sessions (SMTPPool), so a
+batch of bills costs one TCP + STARTTLS + AUTH handshake per pooled
+connection instead of one per message.
 """
 import aiosmtplib
+import asyncio
 import random
 import os
+import socket
+import time
 from dotenv import load_dotenv
+from email.message import Message
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import List, Optional, Tuple
+
+from metrics import metrics
 
 # Load from project root .env file
 project_root = os.path.join(os.path.dirname(__file__), '..', '..')
@@ -25,6 +35,13 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER = os.getenv("SMTP_USER", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USER)
+SMTP_START_TLS = os.getenv("SMTP_START_TLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+# Connection pool
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))  # Max concurrent sessions / sends
+SMTP_POOL_IDLE_SECONDS = float(os.getenv("SMTP_POOL_IDLE_SECONDS", "60"))  # Servers drop idle sessions
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
 
 # Debug: Print SMTP configuration status
 print(f"SMTP_HOST: {SMTP_HOST}")
@@ -38,6 +55,145 @@ else:
     print("⚠️  SMTP not configured - verification codes will be printed to console")
 
 
+# Errors after which a pooled session is assumed dead and replaced once
+RECONNECT_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+)
+
+
+class SMTPPool:
+    """
+    Pool of logged-in SMTP sessions with bounded concurrency.
+
+    At most `size` messages are in flight; each uses an idle session when
+    there is one and opens a new one otherwise. Sessions idle for longer
+    than `idle_seconds`, or that have sent `max_messages`, are closed
+    instead of reused. If a reused session turns out to be dead, the
+    message is retried once on a fresh connection. Any other error closes
+    the session and is raised to the caller.
+    """
+
+    def __init__(
+        self,
+        hostname: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        username: str = SMTP_USER,
+        password: str = SMTP_PASSWORD,
+        start_tls: bool = SMTP_START_TLS,
+        size: int = SMTP_POOL_SIZE,
+        idle_seconds: float = SMTP_POOL_IDLE_SECONDS,
+        max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION,
+        timeout: float = SMTP_TIMEOUT,
+        local_hostname: Optional[str] = None
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.size = max(size, 1)
+        self.idle_seconds = idle_seconds
+        self.max_messages = max_messages
+        self.timeout = timeout
+        # aiosmtplib would otherwise call the blocking getfqdn() on every
+        # connect; resolved once, off the event loop, by the first _connect()
+        self.local_hostname = local_hostname
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # (client, last used, messages sent); most recently used last
+        self._idle: List[Tuple[aiosmtplib.SMTP, float, int]] = []
+
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        if self.local_hostname is None:
+            self.local_hostname = await asyncio.get_running_loop().run_in_executor(
+                None, socket.getfqdn
+            )
+        started = time.perf_counter()
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            start_tls=self.start_tls,
+            timeout=self.timeout,
+            local_hostname=self.local_hostname,
+        )
+        try:
+            await client.connect()
+        except BaseException:
+            # e.g. rejected login: don't leave the socket open
+            client.close()
+            raise
+        metrics.inc("smtp_connections_opened")
+        metrics.observe("smtp_connect", time.perf_counter() - started)
+        return client
+
+    @staticmethod
+    async def _close(client: aiosmtplib.SMTP):
+        try:
+            if client.is_connected:
+                await client.quit()
+        except Exception:
+            client.close()
+
+    async def _checkout(self) -> Tuple[aiosmtplib.SMTP, int, bool]:
+        """An open session, its message count and whether it was reused"""
+        now = time.monotonic()
+        while self._idle:
+            client, last_used, sent = self._idle.pop()
+            if client.is_connected and now - last_used < self.idle_seconds:
+                return client, sent, True
+            await self._close(client)
+        return await self._connect(), 0, False
+
+    async def _checkin(self, client: aiosmtplib.SMTP, sent: int):
+        if sent >= self.max_messages:
+            await self._close(client)
+        else:
+            self._idle.append((client, time.monotonic(), sent))
+
+    async def send(self, message: Message):
+        """Send one message through a pooled session"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+        async with self._semaphore:
+            started = time.perf_counter()
+            client, sent, reused = await self._checkout()
+            try:
+                try:
+                    await client.send_message(message)
+                except RECONNECT_ERRORS:
+                    if not reused:
+                        raise
+                    # The server dropped an idle session: retry once on a new one
+                    metrics.inc("smtp_reconnects")
+                    client.close()
+                    client, sent = await self._connect(), 0
+                    await client.send_message(message)
+            except BaseException:
+                metrics.inc("smtp_send_errors")
+                await self._close(client)
+                raise
+            await self._checkin(client, sent + 1)
+            metrics.inc("smtp_messages_sent")
+            metrics.observe("smtp_send", time.perf_counter() - started)
+
+    async def close(self):
+        """Quit all idle sessions (shutdown)"""
+        idle, self._idle = self._idle, []
+        for client, _, _ in idle:
+            await self._close(client)
+
+
+smtp_pool = SMTPPool()
+metrics.gauge("smtp_pool_idle", smtp_pool.idle_count)
+
+
 def generate_verification_code() -> str:
     """Generate a 6-digit verification code"""
     return str(random.randint(100000, 999999))
@@ -182,14 +338,7 @@ The SmartBill Team
         message.attach(part2)
 
         print(f"📤 Sending email to {to_email}...")
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            username=SMTP_USER,
-            password=SMTP_PASSWORD,
-            start_tls=True,
-        )
+        await smtp_pool.send(message)
         print(f"✅ Email sent successfully to {to_email}")
         return True
     except Exception as e:
@@ -335,14 +484,7 @@ async def send_bill_email(
         part = MIMEText(html, "html", "utf-8")
         message.attach(part)
 
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            username=SMTP_USER,
-            password=SMTP_PASSWORD,
-            start_tls=True,
-        )
+        await smtp_pool.send(message)
         return True
     except Exception as e:
         print(f"❌ Failed to send bill email: {e}")
@@ -527,14 +669,7 @@ async def send_split_bill_email(
         part = MIMEText(html, "html", "utf-8")
         message.attach(part)
 
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            username=SMTP_USER,
-            password=SMTP_PASSWORD,
-            start_tls=True,
-        )
+        await smtp_pool.send(message)
         return True
     except Exception as e:
         print(f"❌ Failed to send split bill email: {e}")
@@ -542,3 +677,138 @@ async def send_split_bill_email(
         traceback.print_exc()
         return False
 
+
+
+async def send_split_bill_digest_email(
+    to_email: str,
+    to_name: str,
+    bills: List[dict]
+) -> bool:
+    """
+    Send one email covering several expense splits for the same participant
+    
+    Args:
+        to_email: Participant's email address
+        to_name: Participant's name
+        bills: One dict per split: payer_name, expense_data (store_name,
+            total, date) and split_data (amount_owed, items_detail)
+    
+    Returns:
+        True if sent successfully, False otherwise
+    """
+    if not SMTP_USER or not SMTP_PASSWORD:
+        print(f"⚠️  SMTP not configured. Would send bill digest ({len(bills)} splits) to {to_email}")
+        return False
+    
+    try:
+        total_owed = sum(bill['split_data'].get('amount_owed', 0) for bill in bills)
+        payers = sorted({bill['payer_name'] for bill in bills})
+        
+        subject = f"SmartBill - You owe ${total_owed:.2f} across {len(bills)} bills"
+        
+        message = MIMEMultipart("alternative")
+        message["Subject"] = subject
+        message["From"] = SMTP_FROM
+        message["To"] = to_email
+
+        # One row per split
+        rows_html = ""
+        for bill in bills:
+            expense_data = bill['expense_data']
+            split_data = bill['split_data']
+            items = ", ".join(split_data.get('items_detail') or []) or "Split based on total bill"
+            rows_html += f"""
+            <tr>
+              <td style="padding: 12px; border-bottom: 1px solid #e5e7eb; color: #374151;">
+                <strong>{expense_data.get('store_name', 'Receipt')}</strong><br>
+                <span style="color: #6b7280; font-size: 13px;">{expense_data.get('date', 'Recent')} · paid by {bill['payer_name']}</span><br>
+                <span style="color: #9ca3af; font-size: 13px;">{items}</span>
+              </td>
+              <td style="padding: 12px; border-bottom: 1px solid #e5e7eb; color: #111827; font-weight: 600; text-align: right; white-space: nowrap;">
+                ${split_data.get('amount_owed', 0):.2f}
+              </td>
+            </tr>
+            """
+
+        html = f"""
+        <!DOCTYPE html>
+        <html>
+          <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+          </head>
+          <body style="margin: 0; padding: 0; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif; background-color: #f5f5f5;">
+            <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f5f5f5; padding: 40px 0;">
+              <tr>
+                <td align="center">
+                  <table width="600" cellpadding="0" cellspacing="0" style="background-color: #ffffff; border-radius: 12px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
+                    <!-- Header -->
+                    <tr>
+                      <td style="background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%); padding: 40px; text-align: center; border-radius: 12px 12px 0 0;">
+                        <h1 style="margin: 0; color: #ffffff; font-size: 32px; font-weight: 700;">
+                          💸 {len(bills)} New Bill Splits
+                        </h1>
+                        <p style="margin: 8px 0 0 0; color: #fef3c7; font-size: 14px; font-weight: 500;">
+                          From {", ".join(payers)}
+                        </p>
+                      </td>
+                    </tr>
+                    
+                    <!-- Content -->
+                    <tr>
+                      <td style="padding: 40px;">
+                        <p style="margin: 0 0 24px 0; color: #6b7280; font-size: 16px;">
+                          Hi {to_name}, here are your shares of recent expenses.
+                        </p>
+                        
+                        <table width="100%" cellpadding="0" cellspacing="0" style="border-collapse: collapse; margin-bottom: 24px;">
+                          <tbody>
+              {rows_html}
+                          </tbody>
+                          <tfoot>
+                            <tr style="background-color: #fef3c7;">
+                              <td style="padding: 16px; font-weight: 700; color: #92400e; font-size: 18px;">
+                                Total
+                              </td>
+                              <td style="padding: 16px; font-weight: 700; color: #92400e; font-size: 18px; text-align: right;">
+                                ${total_owed:.2f}
+                              </td>
+                            </tr>
+                          </tfoot>
+                        </table>
+                        
+                        <p style="margin: 0; color: #6b7280; font-size: 14px; line-height: 1.6;">
+                          Please settle each amount with the person who paid. Once paid, they can mark it as settled in SmartBill.
+                        </p>
+                      </td>
+                    </tr>
+                    
+                    <!-- Footer -->
+                    <tr>
+                      <td style="padding: 32px 40px; background-color: #f9fafb; border-radius: 0 0 12px 12px; border-top: 1px solid #e5e7eb;">
+                        <p style="margin: 0 0 8px 0; color: #6b7280; font-size: 14px;">
+                          This is an automated bill split digest from SmartBill.
+                        </p>
+                        <p style="margin: 0; color: #9ca3af; font-size: 12px;">
+                          © 2024 SmartBill. Making expense splitting simple.
+                        </p>
+                      </td>
+                    </tr>
+                  </table>
+                </td>
+              </tr>
+            </table>
+          </body>
+        </html>
+        """
+
+        part = MIMEText(html, "html", "utf-8")
+        message.attach(part)
+
+        await smtp_pool.send(message)
+        return True
+    except Exception as e:
+        print(f"❌ Failed to send bill digest email: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
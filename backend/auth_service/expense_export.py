@@ -0,0 +1,115 @@
+"""
+Streaming export of a user's expenses (GET /expenses/export)
+
+Rows are read through a server-side cursor in partitions of
+EXPORT_BATCH_SIZE and written out as each partition arrives, so memory use
+does not depend on how many expenses the user has. The row shape matches
+POST /expenses/import, so an export can be imported again as-is.
+"""
+import csv
+import io
+import json
+import os
+import uuid as uuid_lib
+import zlib
+from typing import AsyncIterator, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from database import AsyncSessionLocal
+from metrics import metrics
+from models import Expense
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+EXPORT_COLUMNS = [
+    "id", "store_name", "total_amount", "subtotal", "tax_amount", "tax_rate",
+    "created_at", "raw_text", "transcript", "items", "participants",
+]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _row(expense: Expense) -> dict:
+    return {
+        "id": str(expense.id),
+        "store_name": expense.store_name,
+        "total_amount": expense.total_amount,
+        "subtotal": expense.subtotal,
+        "tax_amount": expense.tax_amount,
+        "tax_rate": expense.tax_rate,
+        "created_at": expense.created_at.isoformat() if expense.created_at else None,
+        "raw_text": expense.raw_text,
+        "transcript": expense.transcript,
+        "items": [
+            {"name": item.name, "price": str(item.price), "quantity": str(item.quantity)}
+            for item in expense.items
+        ],
+        "participants": [
+            {"name": p.name, "items": p.items or []}
+            for p in expense.participants
+        ],
+    }
+
+
+def _encode_ndjson(expenses: Iterable[Expense]) -> str:
+    return "".join(json.dumps(_row(expense), default=str) + "\n" for expense in expenses)
+
+
+def _encode_csv(expenses: Iterable[Expense], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for expense in expenses:
+        row = _row(expense)
+        row["items"] = json.dumps(row["items"])
+        row["participants"] = json.dumps(row["participants"])
+        writer.writerow(["" if row[name] is None else row[name] for name in EXPORT_COLUMNS])
+    return buffer.getvalue()
+
+
+async def export_expenses_stream(
+    user_id: uuid_lib.UUID,
+    fmt: str,
+    compress: bool = False
+) -> AsyncIterator[bytes]:
+    """Yield the export body chunk by chunk, optionally gzip-compressed"""
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    exported = 0
+
+    # A session of its own: the response outlives the request's dependencies
+    async with AsyncSessionLocal() as db:
+        result = await db.stream_scalars(
+            select(Expense)
+            .options(
+                selectinload(Expense.items),
+                selectinload(Expense.participants)
+            )
+            .where(Expense.user_id == user_id)
+            .order_by(Expense.created_at, Expense.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        first = True
+        async for partition in result.partitions():
+            if fmt == "csv":
+                text = _encode_csv(partition, header=first)
+            else:
+                text = _encode_ndjson(partition)
+            first = False
+            exported += len(partition)
+            chunk = text.encode()
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if fmt == "csv" and first:
+            # No rows: still send the header
+            chunk = _encode_csv([], header=True).encode()
+            yield compressor.compress(chunk) if compressor else chunk
+
+    if compressor:
+        yield compressor.flush()
+    metrics.inc("expense_export_rows", exported)
@@ -0,0 +1,271 @@
+"""
+Streaming bulk import of expenses (POST /expenses/import)
+
+The request body is read chunk by chunk as NDJSON (one CreateExpenseRequest
+object per line, plus an optional `created_at`) or CSV (one expense per
+record, `items` / `participants` as JSON-encoded columns). Valid rows are
+collected into batches and written with Postgres COPY, one transaction per
+batch, so memory stays flat and round-trips grow with batches, not rows.
+
+Progress and per-row errors are streamed back as NDJSON while the upload
+is still being read:
+
+    {"event": "error", "row": 7, "errors": [{"loc": ["total_amount"], "msg": "..."}]}
+    {"event": "progress", "rows": 1000, "imported": 999, "failed": 1}
+    {"event": "done", "rows": 1200, "imported": 1199, "failed": 1, "seconds": 0.41}
+
+Rows are numbered from 1 in body order, not counting the CSV header or
+blank lines.
+"""
+import codecs
+import csv
+import json
+import os
+import time
+import uuid as uuid_lib
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import AsyncIterator, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import text
+from starlette.responses import StreamingResponse
+
+from database import AsyncSessionLocal
+from expense_schemas import ImportExpenseRow
+from expense_summary import adjust_expense_totals, current_month_start
+from analytics_rollups import record_expenses
+from item_catalog import record_items
+from metrics import metrics
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# A single NDJSON line / CSV record larger than this aborts the import
+IMPORT_MAX_RECORD_BYTES = int(os.getenv("IMPORT_MAX_RECORD_BYTES", str(1024 * 1024)))
+
+CSV_JSON_COLUMNS = ("items", "participants")
+
+EXPENSE_COLUMNS = [
+    "id", "user_id", "store_name", "total_amount", "subtotal", "tax_amount",
+    "tax_rate", "raw_text", "transcript", "created_at",
+]
+ITEM_COLUMNS = ["id", "expense_id", "name", "price", "quantity"]
+PARTICIPANT_COLUMNS = ["id", "expense_id", "name", "items"]
+
+
+class ImportProgressResponse(StreamingResponse):
+    """
+    StreamingResponse that can be sent while the request body is still
+    being read. Starlette's version listens for http.disconnect on the same
+    receive channel and would swallow body chunks; here a disconnect
+    surfaces from request.stream() as ClientDisconnect instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        if len(buffer) > IMPORT_MAX_RECORD_BYTES:
+            raise ValueError(f"Record longer than {IMPORT_MAX_RECORD_BYTES} bytes")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def _csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Join physical lines into CSV records (quoted fields may span lines)"""
+    pending = None
+    async for line in _lines(chunks):
+        record = line if pending is None else pending + "\n" + line
+        # Quotes are balanced once the record is complete ("" escapes count twice)
+        if record.count('"') % 2:
+            if len(record) > IMPORT_MAX_RECORD_BYTES:
+                raise ValueError(f"Record longer than {IMPORT_MAX_RECORD_BYTES} bytes")
+            pending = record
+            continue
+        pending = None
+        yield record
+    if pending is not None:
+        yield pending
+
+
+async def parse_rows(chunks: AsyncIterator[bytes], fmt: str):
+    """
+    Yield (row_number, data, error) for every non-blank record.
+    `data` is a dict ready for validation, or None when `error` says why
+    the record could not be decoded.
+    """
+    row_number = 0
+    if fmt == "csv":
+        header = None
+        async for record in _csv_records(chunks):
+            if not record.strip():
+                continue
+            values = next(csv.reader([record]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row_number += 1
+            data = {
+                name: value
+                for name, value in zip(header, values)
+                if value != ""
+            }
+            try:
+                for name in CSV_JSON_COLUMNS:
+                    if name in data:
+                        data[name] = json.loads(data[name])
+            except json.JSONDecodeError as e:
+                yield row_number, None, f"Invalid JSON in column {name}: {e}"
+                continue
+            yield row_number, data, None
+    else:
+        async for line in _lines(chunks):
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                yield row_number, json.loads(line), None
+            except json.JSONDecodeError as e:
+                yield row_number, None, f"Invalid JSON: {e}"
+
+
+async def _copy_batch(db, user_id: uuid_lib.UUID, rows: List[ImportExpenseRow]):
+    """Write one batch with COPY and fold it into the summary, rollups and item catalog"""
+    now = datetime.now(timezone.utc)
+    month_start = current_month_start(now)
+    expenses, items, participants = [], [], []
+    dated_rows = []
+    amount = month_amount = Decimal(0)
+
+    for row in rows:
+        expense_id = uuid_lib.uuid4()
+        created_at = row.created_at or now
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        dated_rows.append((created_at, row))
+        expenses.append((
+            expense_id, user_id, row.store_name, row.total_amount, row.subtotal,
+            row.tax_amount, row.tax_rate, row.raw_text, row.transcript, created_at,
+        ))
+        for item in row.items:
+            items.append((uuid_lib.uuid4(), expense_id, item.name, item.price, item.quantity))
+        for participant in row.participants:
+            participants.append((
+                uuid_lib.uuid4(), expense_id, participant.name,
+                # The asyncpg JSONB codec takes serialized JSON
+                json.dumps(participant.items) if participant.items else None,
+            ))
+        amount += row.total_amount
+        if current_month_start(created_at) == month_start:
+            month_amount += row.total_amount
+
+    # COPY runs on the session's connection, inside its transaction. The
+    # asyncpg adapter only sends BEGIN with the first statement it runs
+    # itself, so open the transaction before handing the connection to COPY;
+    # otherwise the COPYs autocommit and a later failure leaves them behind.
+    await db.execute(text("SELECT 1"))
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    pg = raw_connection.driver_connection
+    await pg.copy_records_to_table("expenses", records=expenses, columns=EXPENSE_COLUMNS)
+    if items:
+        await pg.copy_records_to_table("expense_items", records=items, columns=ITEM_COLUMNS)
+    if participants:
+        await pg.copy_records_to_table(
+            "expense_participants", records=participants, columns=PARTICIPANT_COLUMNS
+        )
+
+    await adjust_expense_totals(
+        db, user_id, len(rows), amount, month_to_date_delta=month_amount
+    )
+    await record_expenses(db, user_id, dated_rows)
+    await record_items(db, user_id, dated_rows)
+
+
+def _event(**payload) -> bytes:
+    return (json.dumps(payload, default=str) + "\n").encode()
+
+
+async def import_expenses_stream(
+    user_id: uuid_lib.UUID,
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    batch_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """Run an import and yield NDJSON progress events"""
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    started = time.perf_counter()
+    rows = imported = failed = 0
+    batch: List[ImportExpenseRow] = []
+    batch_rows: List[int] = []
+
+    async with AsyncSessionLocal() as db:
+
+        async def flush():
+            nonlocal imported, failed
+            batch_started = time.perf_counter()
+            try:
+                await _copy_batch(db, user_id, batch)
+                await db.commit()
+                imported += len(batch)
+                metrics.inc("expense_import_rows", len(batch))
+                error = None
+            except Exception as e:
+                await db.rollback()
+                failed += len(batch)
+                metrics.inc("expense_import_failed_batches")
+                error = _event(
+                    event="error", rows=[batch_rows[0], batch_rows[-1]],
+                    errors=[{"loc": [], "msg": str(e)}]
+                )
+            metrics.observe("expense_import_batch", time.perf_counter() - batch_started)
+            batch.clear()
+            batch_rows.clear()
+            return error
+
+        try:
+            async for row_number, data, decode_error in parse_rows(chunks, fmt):
+                rows += 1
+                if decode_error:
+                    failed += 1
+                    yield _event(event="error", row=row_number, errors=[{"loc": [], "msg": decode_error}])
+                    continue
+                try:
+                    batch.append(ImportExpenseRow.model_validate(data))
+                    batch_rows.append(row_number)
+                except ValidationError as e:
+                    failed += 1
+                    yield _event(event="error", row=row_number, errors=[
+                        {"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()
+                    ])
+                    continue
+
+                if len(batch) >= batch_size:
+                    error = await flush()
+                    if error:
+                        yield error
+                    yield _event(event="progress", rows=rows, imported=imported, failed=failed)
+        except ValueError as e:
+            # Unreadable body (oversized record, bad encoding): keep what was written
+            yield _event(event="error", row=rows + 1, errors=[{"loc": [], "msg": str(e)}])
+
+        if batch:
+            error = await flush()
+            if error:
+                yield error
+
+    yield _event(
+        event="done", rows=rows, imported=imported, failed=failed,
+        seconds=round(time.perf_counter() - started, 3)
+    )
@@ -31,25 +31,42 @@ class CreateExpenseRequest(BaseModel):
     participants: List[ExpenseParticipantSchema] = []
 
 
+class ImportExpenseRow(CreateExpenseRequest):
+    """One row of POST /expenses/import; keeps the original date if given"""
+    created_at: Optional[datetime] = None
+
+
 class ExpenseResponse(BaseModel):
+    # Listings may return a sparse fieldset (see `fields` / `include`),
+    # so everything but `id` can be absent.
     id: str
-    user_id: str
-    store_name: Optional[str]
-    total_amount: Decimal
-    subtotal: Optional[Decimal]
-    tax_amount: Optional[Decimal]
-    tax_rate: Optional[Decimal]
-    raw_text: Optional[str]
-    transcript: Optional[str]
+    user_id: Optional[str] = None
+    store_name: Optional[str] = None
+    total_amount: Optional[Decimal] = None
+    subtotal: Optional[Decimal] = None
+    tax_amount: Optional[Decimal] = None
+    tax_rate: Optional[Decimal] = None
+    raw_text: Optional[str] = None
+    transcript: Optional[str] = None
     items: List[ExpenseItemSchema] = []
     participants: List[ExpenseParticipantSchema] = []
-    created_at: datetime
+    created_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class ExpenseSummaryResponse(BaseModel):
+    expense_count: int = 0
+    lifetime_total: Decimal = Decimal(0)
+    month_to_date_total: Decimal = Decimal(0)
+    owed_to_user: Decimal = Decimal(0)
+    user_owes: Decimal = Decimal(0)
+    updated_at: Optional[datetime] = None
+
+
 class ExpenseListResponse(BaseModel):
     expenses: List[ExpenseResponse]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
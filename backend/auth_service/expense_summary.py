@@ -0,0 +1,154 @@
+"""
+Incremental maintenance of user_expense_summary
+
+Every write path that creates or removes expenses or splits calls one of
+these helpers inside its own transaction, so the summary row is committed
+together with the change and GET /expenses/summary is a primary-key read.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Iterable, Optional
+import uuid as uuid_lib
+
+from sqlalchemy import String, Numeric, case, column, func, literal, select, values
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ExpenseSplit, User, UserExpenseSummary
+from user_cache import UserSnapshot
+
+ZERO = Decimal("0")
+
+
+def current_month_start(now: Optional[datetime] = None) -> date:
+    """First day of the current UTC month"""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(timezone.utc).date().replace(day=1)
+
+
+async def adjust_expense_totals(
+    db: AsyncSession,
+    user_id: uuid_lib.UUID,
+    count_delta: int,
+    amount_delta: Decimal,
+    created_at: Optional[datetime] = None,
+    month_to_date_delta: Optional[Decimal] = None
+):
+    """
+    Add count_delta expenses worth amount_delta to a user's totals.
+    The month-to-date total only moves for expenses created this UTC month
+    and starts again from zero when the month rolls over. Batch writers
+    that span several months pass month_to_date_delta explicitly.
+    """
+    month_start = current_month_start()
+    if month_to_date_delta is not None:
+        mtd_delta = month_to_date_delta
+    elif created_at is None or current_month_start(created_at) == month_start:
+        mtd_delta = amount_delta
+    else:
+        mtd_delta = ZERO
+
+    stmt = insert(UserExpenseSummary).values(
+        user_id=user_id,
+        expense_count=count_delta,
+        lifetime_total=amount_delta,
+        month_start=month_start,
+        month_to_date_total=mtd_delta,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserExpenseSummary.user_id],
+        set_={
+            "expense_count": UserExpenseSummary.expense_count + stmt.excluded.expense_count,
+            "lifetime_total": UserExpenseSummary.lifetime_total + stmt.excluded.lifetime_total,
+            "month_to_date_total": case(
+                (
+                    UserExpenseSummary.month_start == stmt.excluded.month_start,
+                    UserExpenseSummary.month_to_date_total + stmt.excluded.month_to_date_total,
+                ),
+                else_=stmt.excluded.month_to_date_total,
+            ),
+            "month_start": stmt.excluded.month_start,
+            "updated_at": datetime.now(timezone.utc),
+        },
+    )
+    await db.execute(stmt)
+
+
+async def adjust_split_balances(
+    db: AsyncSession,
+    owner: UserSnapshot,
+    splits: Iterable,
+    sign: int = 1
+):
+    """
+    Apply unpaid splits on one of owner's expenses to both sides:
+    owner.owed_to_user and, for participants who are registered users,
+    user_owes. Pass sign=-1 when the splits are removed or settled.
+    Splits addressed to the owner themselves are ignored.
+    """
+    owed_to_owner = ZERO
+    owed_by_email = defaultdict(lambda: ZERO)
+    for split in splits:
+        if split.is_paid:
+            continue
+        email = (split.participant_email or "").lower()
+        if email == owner.email:
+            continue
+        amount = Decimal(split.amount_owed) * sign
+        owed_to_owner += amount
+        if email:
+            owed_by_email[email] += amount
+
+    if owed_to_owner:
+        stmt = insert(UserExpenseSummary).values(user_id=owner.id, owed_to_user=owed_to_owner)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserExpenseSummary.user_id],
+            set_={
+                "owed_to_user": UserExpenseSummary.owed_to_user + stmt.excluded.owed_to_user,
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+        await db.execute(stmt)
+
+    if owed_by_email:
+        # One statement for all participants: match emails to users in SQL
+        participants = values(
+            column("email", String), column("amount", Numeric), name="participants"
+        ).data(list(owed_by_email.items()))
+        stmt = insert(UserExpenseSummary).from_select(
+            ["user_id", "user_owes"],
+            select(User.id, participants.c.amount)
+            .join(participants, User.email == participants.c.email)
+            .where(User.id != owner.id),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserExpenseSummary.user_id],
+            set_={
+                "user_owes": UserExpenseSummary.user_owes + stmt.excluded.user_owes,
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+        await db.execute(stmt)
+
+
+async def backfill_registered_summary(db: AsyncSession, user_id: uuid_lib.UUID, email: str):
+    """
+    Credit a newly registered user's user_owes with the unpaid splits
+    already addressed to their email, so settling one later does not drive
+    it negative. One INSERT ... SELECT; adds nothing if there are none.
+    """
+    unpaid = (
+        select(literal(user_id, UUID(as_uuid=True)), func.sum(ExpenseSplit.amount_owed))
+        .where(
+            func.lower(ExpenseSplit.participant_email) == email.lower(),
+            ExpenseSplit.is_paid.is_(False)
+        )
+        .having(func.count() > 0)
+    )
+    stmt = insert(UserExpenseSummary).from_select(["user_id", "user_owes"], unpaid)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserExpenseSummary.user_id],
+        set_={"user_owes": stmt.excluded.user_owes, "updated_at": datetime.now(timezone.utc)},
+    )
+    await db.execute(stmt)
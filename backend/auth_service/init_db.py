@@ -1,12 +1,12 @@
 """
 Initialize database tables
-Run this script to create all database tables
+Run this script to create all database tables or apply pending migrations
 """
-from database import engine, init_db
-from models import Base
+import asyncio
 
-if __name__ == "__main__":
-    print("Creating database tables...")
-    init_db()
-    print("✅ Database tables created successfully!")
+from database import init_db
 
+if __name__ == "__main__":
+    print("Applying database migrations...")
+    version = asyncio.run(init_db())
+    print(f"✅ Database schema is at version {version}")
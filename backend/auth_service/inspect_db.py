@@ -1,24 +1,26 @@
+import asyncio
 import sys
 import os
-from sqlalchemy import inspect
+from sqlalchemy import inspect, select
 
 # Add the current directory to the path so we can import modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import SessionLocal, engine
-from models import User, EmailVerificationCode, Expense, ExpenseItem, ExpenseParticipant, Contact, ContactGroup, ExpenseSplit
+from database import AsyncSessionLocal, engine
+from models import User, Expense, ExpenseItem, ExpenseParticipant, Contact, ContactGroup, ExpenseSplit
 
-def inspect_db():
-    db = SessionLocal()
+async def inspect_db():
+    db = AsyncSessionLocal()
     try:
-        inspector = inspect(engine)
-        table_names = inspector.get_table_names()
+        async with engine.connect() as conn:
+            table_names = await conn.run_sync(
+                lambda sync_conn: inspect(sync_conn).get_table_names()
+            )
         print(f"Found tables: {table_names}")
         print("-" * 50)
 
         models = [
             User, 
-            EmailVerificationCode, 
             Expense, 
             ExpenseItem, 
             ExpenseParticipant,
@@ -31,7 +33,7 @@ def inspect_db():
             table_name = model.__tablename__
             if table_name in table_names:
                 print(f"\nTable: {table_name}")
-                records = db.query(model).all()
+                records = (await db.scalars(select(model))).all()
                 print(f"Count: {len(records)}")
                 if records:
                     print("Data:")
@@ -48,7 +50,7 @@ def inspect_db():
     except Exception as e:
         print(f"Error inspecting database: {e}")
     finally:
-        db.close()
+        await db.close()
 
 if __name__ == "__main__":
-    inspect_db()
+    asyncio.run(inspect_db())
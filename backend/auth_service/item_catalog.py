@@ -0,0 +1,135 @@
+"""
+Item catalog maintenance and lookup
+
+Expense writes call record_items() in the same transaction. Each item
+updates two rows: the user's all-stores entry (store_key '') and the
+entry for the expense's store, if it has one. The catalog is a purchase
+history, so deleting an expense does not remove entries.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+import uuid as uuid_lib
+
+from sqlalchemy import case, func, literal_column, or_, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from analytics_rollups import WHITESPACE, KEY_LENGTH, normalize_key
+from models import ItemCatalog
+
+# Prices kept per entry for the median (must match migrations/v0008)
+RECENT_PRICES = 20
+
+
+async def record_items(
+    db: AsyncSession,
+    user_id: uuid_lib.UUID,
+    expenses: Iterable[Tuple[Optional[datetime], object]]
+):
+    """
+    Fold the items of (created_at, expense) pairs into the catalog with
+    one multi-row upsert. `expense` needs store_name and items (name, price).
+    """
+    entries = {}
+    for created_at, expense in expenses:
+        seen_at = created_at or datetime.now(timezone.utc)
+        if seen_at.tzinfo is None:
+            seen_at = seen_at.replace(tzinfo=timezone.utc)
+        store_keys = [""]
+        store_key = normalize_key(expense.store_name)
+        if store_key:
+            store_keys.append(store_key)
+        for item in expense.items or []:
+            item_key = normalize_key(item.name)
+            if not item_key:
+                continue
+            for key in store_keys:
+                entries.setdefault((key, item_key), []).append(
+                    (seen_at, (item.name or "").strip(WHITESPACE)[:KEY_LENGTH], Decimal(item.price))
+                )
+    if not entries:
+        return
+
+    rows = []
+    for (store_key, item_key), sightings in entries.items():
+        sightings.sort(key=lambda sighting: sighting[0], reverse=True)
+        newest_at, newest_label, newest_price = sightings[0]
+        rows.append({
+            "user_id": user_id,
+            "store_key": store_key,
+            "item_key": item_key,
+            "item_label": newest_label,
+            "times_bought": len(sightings),
+            "last_price": newest_price,
+            "last_seen_at": newest_at,
+            "recent_prices": [price for _, _, price in sightings[:RECENT_PRICES]],
+        })
+
+    stmt = insert(ItemCatalog).values(rows)
+    newer = stmt.excluded.last_seen_at >= func.coalesce(ItemCatalog.last_seen_at, stmt.excluded.last_seen_at)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ItemCatalog.user_id, ItemCatalog.store_key, ItemCatalog.item_key],
+        set_={
+            "times_bought": ItemCatalog.times_bought + stmt.excluded.times_bought,
+            "item_label": case((newer, stmt.excluded.item_label), else_=ItemCatalog.item_label),
+            "last_price": case((newer, stmt.excluded.last_price), else_=ItemCatalog.last_price),
+            "last_seen_at": func.greatest(ItemCatalog.last_seen_at, stmt.excluded.last_seen_at),
+            # Older sightings (historical imports) must not displace the
+            # recent window the median is computed from
+            "recent_prices": text(
+                "CASE WHEN EXCLUDED.last_seen_at >= "
+                "COALESCE(item_catalog.last_seen_at, EXCLUDED.last_seen_at) "
+                f"THEN (EXCLUDED.recent_prices || item_catalog.recent_prices)[1:{RECENT_PRICES}] "
+                "ELSE item_catalog.recent_prices END"
+            ),
+        },
+    )
+    await db.execute(stmt)
+
+
+# Median of the recent prices, computed per returned row
+MEDIAN_PRICE = literal_column(
+    "(SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY p) "
+    "FROM unnest(item_catalog.recent_prices) AS p)"
+).label("median_price")
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def suggest_items(
+    db: AsyncSession,
+    user_id: uuid_lib.UUID,
+    q: str,
+    store: Optional[str] = None,
+    limit: int = 10
+) -> List[Tuple[ItemCatalog, Optional[Decimal]]]:
+    """
+    Prefix matches first, then fuzzy (trigram word-similarity) matches,
+    each ordered by closeness and how often the item was bought. Both
+    predicates are served by ix_item_catalog_trgm. Returns
+    (ItemCatalog, median_price) pairs; an empty `q` lists the most bought.
+    """
+    q_key = normalize_key(q)
+    stmt = (
+        select(ItemCatalog, MEDIAN_PRICE)
+        .where(
+            ItemCatalog.user_id == user_id,
+            ItemCatalog.store_key == normalize_key(store)
+        )
+    )
+    if q_key:
+        prefix = ItemCatalog.item_key.like(_escape_like(q_key) + "%", escape="\\")
+        # item_key %> q  <=>  word_similarity(q, item_key) >= pg_trgm.word_similarity_threshold
+        stmt = stmt.where(or_(prefix, ItemCatalog.item_key.op("%>")(q_key))).order_by(
+            prefix.desc(),
+            func.word_similarity(q_key, ItemCatalog.item_key).desc(),
+        )
+    stmt = stmt.order_by(
+        ItemCatalog.times_bought.desc(),
+        ItemCatalog.last_seen_at.desc(),
+        ItemCatalog.item_key
+    ).limit(limit)
+    return [(entry, median) for entry, median in await db.execute(stmt)]
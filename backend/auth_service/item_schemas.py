@@ -0,0 +1,21 @@
+"""
+Pydantic schemas for the item catalog
+"""
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
+
+
+class ItemSuggestion(BaseModel):
+    name: str
+    times_bought: int
+    last_price: Optional[Decimal] = None
+    median_price: Optional[Decimal] = None
+    last_seen_at: Optional[datetime] = None
+
+
+class ItemSuggestResponse(BaseModel):
+    query: str
+    store_name: Optional[str] = None
+    suggestions: List[ItemSuggestion]
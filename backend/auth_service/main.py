@@ -1,11 +1,23 @@
 """
 Authentication Service - Email registration and login
 """
+import os
+import sys
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import init_db
-from routers import auth, expenses, contacts, splits
+from database import check_schema
+from metrics import metrics
+from routers import auth, expenses, contacts, splits, balances, analytics, items
+from user_cache import start_invalidation_listener, stop_invalidation_listener
+from code_store import start_purger, stop_purger
+from email_service import smtp_pool
+
+# Modules shared by all services (profiling.py) live in backend/shared
+SHARED_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
+from profiling import install_profiler
 
 app = FastAPI(title="SmartBill Auth Service", version="1.0.0")
 
@@ -18,11 +30,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (X-Profile-Token header / PROFILE_SAMPLE_RATE)
+install_profiler(app, "auth_service")
+
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
-    init_db()
+    """Check (and if needed migrate) the database schema on startup"""
+    await check_schema()
+    await start_invalidation_listener()
+    await start_purger()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_invalidation_listener()
+    await stop_purger()
+    await smtp_pool.close()
 
 
 @app.get("/health")
@@ -31,11 +55,20 @@ def health_check():
     return {"status": "healthy", "service": "auth_service"}
 
 
+@app.get("/metrics")
+def get_metrics():
+    """In-process metrics for this worker (pool, timings, counters)"""
+    return metrics.snapshot()
+
+
 # Register Routers
 app.include_router(auth.router, tags=["Authentication"])
 app.include_router(expenses.router, prefix="/expenses", tags=["Expenses"])
 app.include_router(contacts.router, tags=["Contacts"])
 app.include_router(splits.router, prefix="/expenses", tags=["Splits"])
+app.include_router(balances.router, tags=["Balances"])
+app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(items.router, prefix="/items", tags=["Items"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+"""
+Versioned schema migrations for auth_service
+
+Each module named vNNNN_<description>.py in this package is one migration:
+
+    VERSION = 2                 # strictly increasing
+    DESCRIPTION = "..."
+    TRANSACTIONAL = True        # False for CREATE INDEX CONCURRENTLY etc.
+
+    async def upgrade(conn): ...
+
+Applied versions are recorded in the `schema_version` table. Startup only
+reads the highest recorded version; migrations run when it is behind.
+Migrations hold a Postgres advisory lock so that several workers starting
+at once apply each migration exactly once. Waiting workers poll for the
+lock instead of blocking on it: a blocked pg_advisory_lock() call is a
+running statement with a snapshot, which CREATE INDEX CONCURRENTLY in the
+migrating worker would wait for forever.
+"""
+import asyncio
+import importlib
+import pkgutil
+from types import ModuleType
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# Arbitrary constant identifying the migration advisory lock
+MIGRATION_LOCK_ID = 7_238_114_001
+MIGRATION_LOCK_POLL_SECONDS = 0.5
+
+
+def load_migrations() -> List[ModuleType]:
+    """Import every migration module, ordered by VERSION"""
+    modules = [
+        importlib.import_module(f"{__name__}.{info.name}")
+        for info in pkgutil.iter_modules(__path__)
+        if info.name.startswith("v")
+    ]
+    modules.sort(key=lambda module: module.VERSION)
+    versions = [module.VERSION for module in modules]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions: {versions}")
+    return modules
+
+
+async def current_version(conn: AsyncConnection) -> int:
+    """Highest applied migration, or 0 for an unmanaged database"""
+    exists = await conn.scalar(text("SELECT to_regclass('schema_version') IS NOT NULL"))
+    if not exists:
+        return 0
+    return await conn.scalar(text("SELECT COALESCE(MAX(version), 0) FROM schema_version"))
+
+
+async def create_index_concurrently(conn: AsyncConnection, name: str, definition: str):
+    """
+    CREATE INDEX CONCURRENTLY that can be retried.
+    A failed concurrent build leaves an INVALID index behind, which
+    IF NOT EXISTS would then silently keep, so drop it first.
+    `definition` is everything after the index name, e.g. "ON t (col)".
+    """
+    invalid = await conn.scalar(text(
+        "SELECT NOT i.indisvalid FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name})
+    if invalid:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    await conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}"))
+
+
+async def _acquire_lock(lock_conn: AsyncConnection):
+    """Take the migration lock, sleeping (outside any statement) between tries"""
+    while not await lock_conn.scalar(
+        text("SELECT pg_try_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}
+    ):
+        await asyncio.sleep(MIGRATION_LOCK_POLL_SECONDS)
+
+
+async def migrate(engine: AsyncEngine) -> int:
+    """Apply all pending migrations and return the resulting version"""
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await _acquire_lock(lock_conn)
+        try:
+            await lock_conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_version ("
+                " version INTEGER PRIMARY KEY,"
+                " description TEXT NOT NULL,"
+                " applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            ))
+            version = await current_version(lock_conn)
+
+            for migration in MIGRATIONS:
+                if migration.VERSION <= version:
+                    continue
+                print(f"Applying migration {migration.VERSION}: {migration.DESCRIPTION}")
+                if migration.TRANSACTIONAL:
+                    async with engine.begin() as conn:
+                        await migration.upgrade(conn)
+                        await _record(conn, migration)
+                else:
+                    async with engine.connect() as conn:
+                        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                        await migration.upgrade(conn)
+                        await _record(conn, migration)
+                version = migration.VERSION
+            return version
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+
+async def _record(conn: AsyncConnection, migration: ModuleType):
+    await conn.execute(
+        text("INSERT INTO schema_version (version, description) VALUES (:version, :description)"),
+        {"version": migration.VERSION, "description": migration.DESCRIPTION}
+    )
+
+
+# Loaded last: migration modules import helpers from this package
+MIGRATIONS = load_migrations()
+LATEST_VERSION = MIGRATIONS[-1].VERSION if MIGRATIONS else 0
@@ -0,0 +1,141 @@
+"""
+Baseline schema, as previously created by Base.metadata.create_all
+
+Every statement uses IF NOT EXISTS, so databases created by the old
+startup code are adopted as version 1 without changes.
+"""
+from sqlalchemy import text
+
+VERSION = 1
+DESCRIPTION = "baseline schema"
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id UUID PRIMARY KEY,
+        email VARCHAR(255) NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        email_verified BOOLEAN NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        updated_at TIMESTAMPTZ
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+    """
+    CREATE TABLE IF NOT EXISTS email_verification_codes (
+        id UUID PRIMARY KEY,
+        email VARCHAR(255) NOT NULL,
+        code VARCHAR(6) NOT NULL,
+        expires_at TIMESTAMPTZ NOT NULL,
+        used BOOLEAN NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_email_verification_codes_email ON email_verification_codes (email)",
+    """
+    CREATE TABLE IF NOT EXISTS password_reset_codes (
+        id UUID PRIMARY KEY,
+        email VARCHAR(255) NOT NULL,
+        code VARCHAR(6) NOT NULL,
+        expires_at TIMESTAMPTZ NOT NULL,
+        used BOOLEAN NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_password_reset_codes_email ON password_reset_codes (email)",
+    """
+    CREATE TABLE IF NOT EXISTS expenses (
+        id UUID PRIMARY KEY,
+        user_id UUID NOT NULL REFERENCES users (id),
+        store_name VARCHAR(255),
+        total_amount NUMERIC(10, 2) NOT NULL,
+        subtotal NUMERIC(10, 2),
+        tax_amount NUMERIC(10, 2),
+        tax_rate NUMERIC(5, 4),
+        raw_text VARCHAR,
+        transcript VARCHAR,
+        receipt_image_url VARCHAR,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        updated_at TIMESTAMPTZ
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_expenses_user_id ON expenses (user_id)",
+    """
+    CREATE TABLE IF NOT EXISTS expense_items (
+        id UUID PRIMARY KEY,
+        expense_id UUID NOT NULL REFERENCES expenses (id) ON DELETE CASCADE,
+        name VARCHAR(255) NOT NULL,
+        price NUMERIC(10, 2) NOT NULL,
+        quantity NUMERIC(10, 2) NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_expense_items_expense_id ON expense_items (expense_id)",
+    """
+    CREATE TABLE IF NOT EXISTS expense_participants (
+        id UUID PRIMARY KEY,
+        expense_id UUID NOT NULL REFERENCES expenses (id) ON DELETE CASCADE,
+        name VARCHAR(255) NOT NULL,
+        items VARCHAR,
+        created_at TIMESTAMPTZ DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_expense_participants_expense_id ON expense_participants (expense_id)",
+    """
+    CREATE TABLE IF NOT EXISTS contacts (
+        id UUID PRIMARY KEY,
+        user_id UUID NOT NULL REFERENCES users (id),
+        friend_user_id UUID NOT NULL REFERENCES users (id),
+        nickname VARCHAR(255),
+        created_at TIMESTAMPTZ DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_contacts_user_id ON contacts (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_friend_user_id ON contacts (friend_user_id)",
+    """
+    CREATE TABLE IF NOT EXISTS contact_groups (
+        id UUID PRIMARY KEY,
+        user_id UUID NOT NULL REFERENCES users (id),
+        name VARCHAR(255) NOT NULL,
+        description VARCHAR,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        updated_at TIMESTAMPTZ
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_contact_groups_user_id ON contact_groups (user_id)",
+    """
+    CREATE TABLE IF NOT EXISTS contact_group_members (
+        id UUID PRIMARY KEY,
+        group_id UUID NOT NULL REFERENCES contact_groups (id) ON DELETE CASCADE,
+        contact_id UUID NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        CONSTRAINT _contact_group_uc UNIQUE (group_id, contact_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_contact_group_members_group_id ON contact_group_members (group_id)",
+    "CREATE INDEX IF NOT EXISTS ix_contact_group_members_contact_id ON contact_group_members (contact_id)",
+    """
+    CREATE TABLE IF NOT EXISTS expense_splits (
+        id UUID PRIMARY KEY,
+        expense_id UUID NOT NULL REFERENCES expenses (id) ON DELETE CASCADE,
+        participant_name VARCHAR(255) NOT NULL,
+        participant_email VARCHAR(255),
+        contact_id UUID REFERENCES contacts (id),
+        amount_owed NUMERIC(10, 2) NOT NULL,
+        items_detail VARCHAR,
+        is_paid BOOLEAN NOT NULL,
+        email_sent BOOLEAN NOT NULL,
+        email_sent_at TIMESTAMPTZ,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        updated_at TIMESTAMPTZ
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_expense_splits_expense_id ON expense_splits (expense_id)",
+    "CREATE INDEX IF NOT EXISTS ix_expense_splits_contact_id ON expense_splits (contact_id)",
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
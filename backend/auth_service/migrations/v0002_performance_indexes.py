@@ -0,0 +1,29 @@
+"""
+Indexes for the hot lookup predicates
+
+Built with CREATE INDEX CONCURRENTLY so existing tables stay writable.
+"""
+from migrations import create_index_concurrently
+
+VERSION = 2
+DESCRIPTION = "performance indexes for listings, shared-with-me and code lookups"
+TRANSACTIONAL = False
+
+INDEXES = [
+    # GET /expenses: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    ("ix_expenses_user_id_created_at", "ON expenses (user_id, created_at DESC, id DESC)"),
+    # GET /expenses/shared-with-me
+    ("ix_expense_splits_participant_email", "ON expense_splits (participant_email)"),
+    # register / reset-password code checks
+    ("ix_email_verification_codes_lookup",
+     "ON email_verification_codes (email, code, used, expires_at)"),
+    ("ix_password_reset_codes_lookup",
+     "ON password_reset_codes (email, code, used, expires_at)"),
+    # add_contact duplicate checks
+    ("ix_contacts_user_id_friend_user_id", "ON contacts (user_id, friend_user_id)"),
+]
+
+
+async def upgrade(conn):
+    for name, definition in INDEXES:
+        await create_index_concurrently(conn, name, definition)
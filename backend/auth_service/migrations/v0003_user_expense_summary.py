@@ -0,0 +1,66 @@
+"""
+user_expense_summary table, backfilled from existing expenses and splits
+"""
+from sqlalchemy import text
+
+VERSION = 3
+DESCRIPTION = "user_expense_summary table"
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS user_expense_summary (
+        user_id UUID PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+        expense_count INTEGER NOT NULL DEFAULT 0,
+        lifetime_total NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        month_start DATE,
+        month_to_date_total NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        owed_to_user NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        user_owes NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ DEFAULT now()
+    )
+    """,
+    # Expense counts and totals
+    """
+    INSERT INTO user_expense_summary
+        (user_id, expense_count, lifetime_total, month_start, month_to_date_total)
+    SELECT
+        user_id,
+        count(*),
+        COALESCE(sum(total_amount), 0),
+        date_trunc('month', now() AT TIME ZONE 'UTC')::date,
+        COALESCE(sum(total_amount) FILTER (
+            WHERE created_at >= date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+        ), 0)
+    FROM expenses
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO NOTHING
+    """,
+    # Unpaid splits owed to each expense owner (self-splits excluded)
+    """
+    INSERT INTO user_expense_summary (user_id, owed_to_user)
+    SELECT e.user_id, sum(s.amount_owed)
+    FROM expense_splits s
+    JOIN expenses e ON e.id = s.expense_id
+    JOIN users u ON u.id = e.user_id
+    WHERE NOT s.is_paid AND lower(COALESCE(s.participant_email, '')) <> u.email
+    GROUP BY e.user_id
+    ON CONFLICT (user_id) DO UPDATE SET owed_to_user = EXCLUDED.owed_to_user
+    """,
+    # Unpaid splits each registered participant owes to others
+    """
+    INSERT INTO user_expense_summary (user_id, user_owes)
+    SELECT u.id, sum(s.amount_owed)
+    FROM expense_splits s
+    JOIN expenses e ON e.id = s.expense_id
+    JOIN users u ON u.email = lower(s.participant_email)
+    WHERE NOT s.is_paid AND e.user_id <> u.id
+    GROUP BY u.id
+    ON CONFLICT (user_id) DO UPDATE SET user_owes = EXCLUDED.user_owes
+    """,
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
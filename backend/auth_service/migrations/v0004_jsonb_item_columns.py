@@ -0,0 +1,36 @@
+"""
+Store participant items and split item details as JSONB
+
+The columns held json.dumps() strings; they are converted in place and
+indexed with GIN (jsonb_path_ops) so containment filters such as
+items @> '["Soda"]' are answered from the index.
+"""
+from sqlalchemy import text
+
+from migrations import create_index_concurrently
+
+VERSION = 4
+DESCRIPTION = "JSONB participant items / split items_detail with GIN indexes"
+# CREATE INDEX CONCURRENTLY; the ALTERs are safe to re-run on JSONB columns
+TRANSACTIONAL = False
+
+ALTERS = [
+    "ALTER TABLE expense_participants ALTER COLUMN items TYPE JSONB "
+    "USING NULLIF(items::text, '')::jsonb",
+    "ALTER TABLE expense_splits ALTER COLUMN items_detail TYPE JSONB "
+    "USING NULLIF(items_detail::text, '')::jsonb",
+]
+
+INDEXES = [
+    # GET /expenses?item=...
+    ("ix_expense_participants_items", "ON expense_participants USING GIN (items jsonb_path_ops)"),
+    # GET /expenses/{id}/splits?item=...
+    ("ix_expense_splits_items_detail", "ON expense_splits USING GIN (items_detail jsonb_path_ops)"),
+]
+
+
+async def upgrade(conn):
+    for statement in ALTERS:
+        await conn.execute(text(statement))
+    for name, definition in INDEXES:
+        await create_index_concurrently(conn, name, definition)
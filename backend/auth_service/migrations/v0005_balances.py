@@ -0,0 +1,52 @@
+"""
+balances table (per-pair net amounts), backfilled from unpaid splits
+"""
+from sqlalchemy import text
+
+VERSION = 5
+DESCRIPTION = "balances table"
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS balances (
+        user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        counterparty_email VARCHAR(255) NOT NULL,
+        net_amount NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ DEFAULT now(),
+        PRIMARY KEY (user_id, counterparty_email)
+    )
+    """,
+    # Expense owner side: each participant owes the owner
+    """
+    INSERT INTO balances (user_id, counterparty_email, net_amount)
+    SELECT e.user_id, lower(s.participant_email), sum(s.amount_owed)
+    FROM expense_splits s
+    JOIN expenses e ON e.id = s.expense_id
+    JOIN users o ON o.id = e.user_id
+    WHERE NOT s.is_paid
+      AND s.participant_email IS NOT NULL
+      AND lower(s.participant_email) <> o.email
+    GROUP BY e.user_id, lower(s.participant_email)
+    ON CONFLICT (user_id, counterparty_email)
+    DO UPDATE SET net_amount = balances.net_amount + EXCLUDED.net_amount
+    """,
+    # Registered participant side: they owe the owner
+    """
+    INSERT INTO balances (user_id, counterparty_email, net_amount)
+    SELECT u.id, o.email, -sum(s.amount_owed)
+    FROM expense_splits s
+    JOIN expenses e ON e.id = s.expense_id
+    JOIN users o ON o.id = e.user_id
+    JOIN users u ON u.email = lower(s.participant_email)
+    WHERE NOT s.is_paid AND u.id <> o.id
+    GROUP BY u.id, o.email
+    ON CONFLICT (user_id, counterparty_email)
+    DO UPDATE SET net_amount = balances.net_amount + EXCLUDED.net_amount
+    """,
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
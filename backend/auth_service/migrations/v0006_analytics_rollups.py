@@ -0,0 +1,109 @@
+"""
+Spending analytics rollup tables, backfilled from existing data
+
+Key normalization here must match analytics_rollups.py.
+"""
+from sqlalchemy import text
+
+VERSION = 6
+DESCRIPTION = "analytics rollup tables"
+TRANSACTIONAL = True
+
+# Trim whitespace like Python's str.strip() does for common input
+TRIM = "E' \\t\\r\\n'"
+MONTH = "date_trunc('month', e.created_at AT TIME ZONE 'UTC')::date"
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS spend_daily (
+        user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        day DATE NOT NULL,
+        expense_count INTEGER NOT NULL DEFAULT 0,
+        total_amount NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS spend_store_monthly (
+        user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        month DATE NOT NULL,
+        store_key VARCHAR(255) NOT NULL,
+        store_label VARCHAR(255) NOT NULL DEFAULT '',
+        expense_count INTEGER NOT NULL DEFAULT 0,
+        total_amount NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, month, store_key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS spend_participant_monthly (
+        user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        month DATE NOT NULL,
+        participant_key VARCHAR(255) NOT NULL,
+        participant_label VARCHAR(255) NOT NULL DEFAULT '',
+        split_count INTEGER NOT NULL DEFAULT 0,
+        total_amount NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, month, participant_key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS spend_item_monthly (
+        user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        month DATE NOT NULL,
+        item_key VARCHAR(255) NOT NULL,
+        item_label VARCHAR(255) NOT NULL DEFAULT '',
+        occurrences INTEGER NOT NULL DEFAULT 0,
+        quantity NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        total_amount NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, month, item_key)
+    )
+    """,
+    """
+    INSERT INTO spend_daily (user_id, day, expense_count, total_amount)
+    SELECT e.user_id, (e.created_at AT TIME ZONE 'UTC')::date, count(*), sum(e.total_amount)
+    FROM expenses e
+    GROUP BY 1, 2
+    ON CONFLICT DO NOTHING
+    """,
+    f"""
+    INSERT INTO spend_store_monthly (user_id, month, store_key, store_label, expense_count, total_amount)
+    SELECT e.user_id, {MONTH},
+           lower(btrim(COALESCE(e.store_name, ''), {TRIM})),
+           max(btrim(COALESCE(e.store_name, ''), {TRIM})),
+           count(*), sum(e.total_amount)
+    FROM expenses e
+    GROUP BY 1, 2, 3
+    ON CONFLICT DO NOTHING
+    """,
+    f"""
+    INSERT INTO spend_participant_monthly
+        (user_id, month, participant_key, participant_label, split_count, total_amount)
+    SELECT e.user_id, {MONTH},
+           left(COALESCE(
+               lower(NULLIF(btrim(s.participant_email, {TRIM}), '')),
+               'name:' || lower(btrim(s.participant_name, {TRIM}))
+           ), 255),
+           max(btrim(s.participant_name, {TRIM})),
+           count(*), sum(s.amount_owed)
+    FROM expense_splits s
+    JOIN expenses e ON e.id = s.expense_id
+    GROUP BY 1, 2, 3
+    ON CONFLICT DO NOTHING
+    """,
+    f"""
+    INSERT INTO spend_item_monthly
+        (user_id, month, item_key, item_label, occurrences, quantity, total_amount)
+    SELECT e.user_id, {MONTH},
+           lower(btrim(i.name, {TRIM})),
+           max(btrim(i.name, {TRIM})),
+           count(*), sum(i.quantity), sum(i.price * i.quantity)
+    FROM expense_items i
+    JOIN expenses e ON e.id = i.expense_id
+    GROUP BY 1, 2, 3
+    ON CONFLICT DO NOTHING
+    """,
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
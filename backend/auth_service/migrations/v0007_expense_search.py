@@ -0,0 +1,123 @@
+"""
+Full-text search vector on expenses
+
+expenses.search_vector combines store name (weight A), item names (B),
+transcript (C) and OCR raw text (D) with the 'simple' configuration, so
+non-English receipts and store names are matched as written.
+
+It is kept current by triggers, which also cover COPY imports:
+- a BEFORE row trigger on expenses when the text columns change
+- statement-level triggers with transition tables on expense_items, so
+  a multi-row item insert refreshes each affected expense once
+"""
+from sqlalchemy import text
+
+from migrations import create_index_concurrently
+
+VERSION = 7
+DESCRIPTION = "expense full-text search vector, triggers and GIN index"
+# Backfill and CREATE INDEX CONCURRENTLY run outside one big transaction
+TRANSACTIONAL = False
+
+STATEMENTS = [
+    "ALTER TABLE expenses ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    # (user_id, search_vector) GIN index needs btree_gin for the UUID column
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    """
+    CREATE OR REPLACE FUNCTION expense_search_vector(
+        store_name TEXT, item_names TEXT, transcript TEXT, raw_text TEXT
+    ) RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('simple', COALESCE(store_name, '')), 'A')
+            || setweight(to_tsvector('simple', COALESCE(item_names, '')), 'B')
+            || setweight(to_tsvector('simple', COALESCE(transcript, '')), 'C')
+            || setweight(to_tsvector('simple', left(COALESCE(raw_text, ''), 200000)), 'D')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION expenses_search_vector_row() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := expense_search_vector(
+            NEW.store_name,
+            (SELECT string_agg(name, ' ') FROM expense_items WHERE expense_id = NEW.id),
+            NEW.transcript,
+            NEW.raw_text
+        );
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION expense_items_refresh_search_vector() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- changed_items is the transition table of the firing statement
+        UPDATE expenses e
+        SET search_vector = expense_search_vector(
+            e.store_name,
+            (SELECT string_agg(i.name, ' ') FROM expense_items i WHERE i.expense_id = e.id),
+            e.transcript,
+            e.raw_text
+        )
+        WHERE e.id IN (SELECT DISTINCT expense_id FROM changed_items);
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS expenses_search_vector ON expenses",
+    """
+    CREATE TRIGGER expenses_search_vector
+    BEFORE INSERT OR UPDATE OF store_name, transcript, raw_text ON expenses
+    FOR EACH ROW EXECUTE FUNCTION expenses_search_vector_row()
+    """,
+    # Transition tables allow only one event per trigger
+    "DROP TRIGGER IF EXISTS expense_items_search_insert ON expense_items",
+    """
+    CREATE TRIGGER expense_items_search_insert
+    AFTER INSERT ON expense_items
+    REFERENCING NEW TABLE AS changed_items
+    FOR EACH STATEMENT EXECUTE FUNCTION expense_items_refresh_search_vector()
+    """,
+    "DROP TRIGGER IF EXISTS expense_items_search_update ON expense_items",
+    """
+    CREATE TRIGGER expense_items_search_update
+    AFTER UPDATE ON expense_items
+    REFERENCING NEW TABLE AS changed_items
+    FOR EACH STATEMENT EXECUTE FUNCTION expense_items_refresh_search_vector()
+    """,
+    "DROP TRIGGER IF EXISTS expense_items_search_delete ON expense_items",
+    """
+    CREATE TRIGGER expense_items_search_delete
+    AFTER DELETE ON expense_items
+    REFERENCING OLD TABLE AS changed_items
+    FOR EACH STATEMENT EXECUTE FUNCTION expense_items_refresh_search_vector()
+    """,
+]
+
+# Backfill in slices so no single statement holds locks on the whole table
+BACKFILL_BATCH = 5000
+BACKFILL = """
+    WITH batch AS (
+        SELECT id FROM expenses WHERE search_vector IS NULL LIMIT :batch
+    )
+    UPDATE expenses e
+    SET search_vector = expense_search_vector(
+        e.store_name,
+        (SELECT string_agg(i.name, ' ') FROM expense_items i WHERE i.expense_id = e.id),
+        e.transcript,
+        e.raw_text
+    )
+    FROM batch WHERE e.id = batch.id
+"""
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
+    while True:
+        result = await conn.execute(text(BACKFILL), {"batch": BACKFILL_BATCH})
+        if result.rowcount == 0:
+            break
+    await create_index_concurrently(
+        conn, "ix_expenses_user_id_search_vector", "ON expenses USING GIN (user_id, search_vector)"
+    )
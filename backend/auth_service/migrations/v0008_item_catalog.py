@@ -0,0 +1,72 @@
+"""
+Per-user / per-store item catalog with a trigram index, backfilled from
+expense_items
+
+Key normalization here must match analytics_rollups.normalize_key.
+"""
+from sqlalchemy import text
+
+from migrations import create_index_concurrently
+
+VERSION = 8
+DESCRIPTION = "item catalog with pg_trgm autocomplete index"
+TRANSACTIONAL = False
+
+TRIM = "E' \\t\\r\\n'"
+RECENT_PRICES = 20
+
+STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    """
+    CREATE TABLE IF NOT EXISTS item_catalog (
+        user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        store_key VARCHAR(255) NOT NULL,
+        item_key VARCHAR(255) NOT NULL,
+        item_label VARCHAR(255) NOT NULL,
+        times_bought INTEGER NOT NULL DEFAULT 0,
+        last_price NUMERIC(10, 2),
+        last_seen_at TIMESTAMPTZ,
+        recent_prices NUMERIC(10, 2)[] NOT NULL DEFAULT '{}',
+        PRIMARY KEY (user_id, store_key, item_key)
+    )
+    """,
+    # One all-stores row ('') plus one row per named store
+    f"""
+    INSERT INTO item_catalog
+        (user_id, store_key, item_key, item_label, times_bought,
+         last_price, last_seen_at, recent_prices)
+    SELECT user_id, store_key, item_key,
+           (array_agg(item_label ORDER BY created_at DESC))[1],
+           count(*),
+           (array_agg(price ORDER BY created_at DESC))[1],
+           max(created_at),
+           (array_agg(price ORDER BY created_at DESC))[1:{RECENT_PRICES}]
+    FROM (
+        SELECT e.user_id, s.store_key,
+               lower(btrim(i.name, {TRIM})) AS item_key,
+               btrim(i.name, {TRIM}) AS item_label,
+               i.price, e.created_at
+        FROM expense_items i
+        JOIN expenses e ON e.id = i.expense_id
+        CROSS JOIN LATERAL (
+            SELECT '' AS store_key
+            UNION ALL
+            SELECT lower(btrim(e.store_name, {TRIM}))
+            WHERE btrim(COALESCE(e.store_name, ''), {TRIM}) <> ''
+        ) s
+    ) items
+    WHERE item_key <> ''
+    GROUP BY user_id, store_key, item_key
+    ON CONFLICT DO NOTHING
+    """,
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
+    await create_index_concurrently(
+        conn, "ix_item_catalog_trgm",
+        "ON item_catalog USING GIN (user_id, store_key, item_key gin_trgm_ops)"
+    )
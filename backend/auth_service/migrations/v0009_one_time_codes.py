@@ -0,0 +1,33 @@
+"""
+UNLOGGED one_time_codes table replacing email_verification_codes and
+password_reset_codes (see code_store.py)
+
+Outstanding codes are not carried over: they live for minutes, and users
+can simply request a new one.
+"""
+from sqlalchemy import text
+
+VERSION = 9
+DESCRIPTION = "one_time_codes replaces the verification / reset code tables"
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    # UNLOGGED: no WAL for this write-heavy, disposable data (emptied after a crash)
+    """
+    CREATE UNLOGGED TABLE IF NOT EXISTS one_time_codes (
+        purpose VARCHAR(32) NOT NULL,
+        email VARCHAR(255) NOT NULL,
+        code VARCHAR(16) NOT NULL,
+        expires_at TIMESTAMPTZ NOT NULL,
+        PRIMARY KEY (purpose, email, code)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_one_time_codes_expires_at ON one_time_codes (expires_at)",
+    "DROP TABLE IF EXISTS email_verification_codes",
+    "DROP TABLE IF EXISTS password_reset_codes",
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
@@ -0,0 +1,37 @@
+"""
+email_outbox table drained by outbox_worker.py
+"""
+from sqlalchemy import text
+
+VERSION = 10
+DESCRIPTION = "email outbox"
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS email_outbox (
+        id UUID PRIMARY KEY,
+        kind VARCHAR(32) NOT NULL,
+        recipient VARCHAR(255) NOT NULL,
+        payload JSONB NOT NULL,
+        split_id UUID REFERENCES expense_splits (id) ON DELETE CASCADE,
+        status VARCHAR(16) NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        last_error TEXT,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        sent_at TIMESTAMPTZ
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_email_outbox_split_id ON email_outbox (split_id)",
+    # Only pending rows are ever claimed; sent / failed rows stay out of the index
+    """
+    CREATE INDEX IF NOT EXISTS ix_email_outbox_pending
+    ON email_outbox (next_attempt_at) WHERE status = 'pending'
+    """,
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
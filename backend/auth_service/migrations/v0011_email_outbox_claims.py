@@ -0,0 +1,24 @@
+"""
+Separate claim lease for email_outbox
+
+next_attempt_at used to carry the digest due time, the retry backoff and
+the worker's lease at once, so the digest sweep could not tell a row
+leased by another worker from one that was merely waiting. The lease now
+lives in claimed_until / claimed_by; next_attempt_at only says when a row
+is due.
+"""
+from sqlalchemy import text
+
+VERSION = 11
+DESCRIPTION = "email_outbox claimed_until / claimed_by"
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    "ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ",
+    "ALTER TABLE email_outbox ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(255)",
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
@@ -0,0 +1,34 @@
+"""
+At most one pending email per split
+
+send-bills used to check for a pending row with a plain SELECT before
+inserting, so two concurrent calls could both queue the same bill. The
+partial unique index lets enqueue() insert with ON CONFLICT DO NOTHING
+instead. Duplicates queued before this migration are dropped first,
+keeping the oldest.
+"""
+from sqlalchemy import text
+
+VERSION = 12
+DESCRIPTION = "email_outbox unique pending split_id"
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    DELETE FROM email_outbox duplicate
+    USING email_outbox kept
+    WHERE duplicate.status = 'pending'
+      AND kept.status = 'pending'
+      AND duplicate.split_id = kept.split_id
+      AND (duplicate.created_at, duplicate.id) > (kept.created_at, kept.id)
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_email_outbox_pending_split_id
+    ON email_outbox (split_id) WHERE status = 'pending'
+    """,
+]
+
+
+async def upgrade(conn):
+    for statement in STATEMENTS:
+        await conn.execute(text(statement))
@@ -1,11 +1,11 @@
 """
 Database models for authentication service
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Numeric, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Text, Boolean, DateTime, Date, Integer, ForeignKey, Numeric, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR, ARRAY
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 import uuid
 
 Base = declarative_base()
@@ -29,26 +29,18 @@ class User(Base):
     contact_groups = relationship("ContactGroup", back_populates="user", cascade="all, delete-orphan")
 
 
-class EmailVerificationCode(Base):
-    __tablename__ = "email_verification_codes"
-
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email = Column(String(255), nullable=False, index=True)
-    code = Column(String(6), nullable=False)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
-    used = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-
-
-class PasswordResetCode(Base):
-    __tablename__ = "password_reset_codes"
+class OneTimeCode(Base):
+    """
+    Email verification / password reset codes for the Postgres code store
+    (code_store.py). Rows are deleted when consumed or once expired.
+    """
+    __tablename__ = "one_time_codes"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email = Column(String(255), nullable=False, index=True)
-    code = Column(String(6), nullable=False)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
-    used = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    purpose = Column(String(32), primary_key=True)  # "registration" / "password_reset"
+    email = Column(String(255), primary_key=True)
+    code = Column(String(16), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
 
 
 class Expense(Base):
@@ -64,6 +56,8 @@ class Expense(Base):
     raw_text = Column(String, nullable=True)  # OCR raw text
     transcript = Column(String, nullable=True)  # Voice transcript
     receipt_image_url = Column(String, nullable=True)  # Optional: image storage URL
+    # Maintained by database triggers (migrations/v0007_expense_search.py)
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -94,7 +88,7 @@ class ExpenseParticipant(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     expense_id = Column(UUID(as_uuid=True), ForeignKey("expenses.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String(255), nullable=False)
-    items = Column(String, nullable=True)  # JSON string of items
+    items = Column(JSONB, nullable=True)  # List of item names
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -160,7 +154,7 @@ class ExpenseSplit(Base):
     participant_email = Column(String(255), nullable=True)
     contact_id = Column(UUID(as_uuid=True), ForeignKey("contacts.id"), nullable=True, index=True)  # Link to contact if registered
     amount_owed = Column(Numeric(10, 2), nullable=False)  # How much this person owes
-    items_detail = Column(String, nullable=True)  # JSON string of items this person is paying for
+    items_detail = Column(JSONB, nullable=True)  # List of items this person is paying for
     is_paid = Column(Boolean, default=False, nullable=False)
     email_sent = Column(Boolean, default=False, nullable=False)
     email_sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -171,3 +165,134 @@ class ExpenseSplit(Base):
     expense = relationship("Expense", back_populates="splits")
     contact = relationship("Contact")
 
+
+class UserExpenseSummary(Base):
+    """
+    Per-user dashboard totals, maintained incrementally by expense_summary.py
+    whenever expenses or splits are written
+    """
+    __tablename__ = "user_expense_summary"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    expense_count = Column(Integer, nullable=False, server_default="0")
+    lifetime_total = Column(Numeric(14, 2), nullable=False, server_default="0")
+    month_start = Column(Date, nullable=True)  # UTC month that month_to_date_total belongs to
+    month_to_date_total = Column(Numeric(14, 2), nullable=False, server_default="0")
+    owed_to_user = Column(Numeric(14, 2), nullable=False, server_default="0")  # Unpaid splits on the user's expenses
+    user_owes = Column(Numeric(14, 2), nullable=False, server_default="0")  # Unpaid splits addressed to the user
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Balance(Base):
+    """
+    Net unpaid amount between a user and one counterparty, across all
+    expenses. Positive: the counterparty owes the user. Kept in both
+    directions for registered users by balance_engine.py.
+    """
+    __tablename__ = "balances"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    counterparty_email = Column(String(255), primary_key=True)  # Lowercased
+    net_amount = Column(Numeric(14, 2), nullable=False, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# ==================== Analytics rollups ====================
+# Maintained incrementally by analytics_rollups.py. Keys are normalized
+# (trimmed, lowercased); *_label keeps the most recently written spelling.
+
+class SpendDaily(Base):
+    __tablename__ = "spend_daily"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC
+    expense_count = Column(Integer, nullable=False, server_default="0")
+    total_amount = Column(Numeric(14, 2), nullable=False, server_default="0")
+
+
+class SpendStoreMonthly(Base):
+    __tablename__ = "spend_store_monthly"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)  # First day of the UTC month
+    store_key = Column(String(255), primary_key=True)  # '' for unknown store
+    store_label = Column(String(255), nullable=False, server_default="")
+    expense_count = Column(Integer, nullable=False, server_default="0")
+    total_amount = Column(Numeric(14, 2), nullable=False, server_default="0")
+
+
+class SpendParticipantMonthly(Base):
+    """Amounts assigned to each split participant, by expense month"""
+    __tablename__ = "spend_participant_monthly"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)
+    participant_key = Column(String(255), primary_key=True)  # Email, or 'name:<name>' without one
+    participant_label = Column(String(255), nullable=False, server_default="")
+    split_count = Column(Integer, nullable=False, server_default="0")
+    total_amount = Column(Numeric(14, 2), nullable=False, server_default="0")
+
+
+class SpendItemMonthly(Base):
+    __tablename__ = "spend_item_monthly"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)
+    item_key = Column(String(255), primary_key=True)
+    item_label = Column(String(255), nullable=False, server_default="")
+    occurrences = Column(Integer, nullable=False, server_default="0")
+    quantity = Column(Numeric(14, 2), nullable=False, server_default="0")
+    total_amount = Column(Numeric(14, 2), nullable=False, server_default="0")  # price * quantity
+
+
+class ItemCatalog(Base):
+    """
+    Items a user has bought, for autocomplete and price hints.
+    store_key '' is the all-stores entry; other rows are per store.
+    Maintained by item_catalog.py.
+    """
+    __tablename__ = "item_catalog"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    store_key = Column(String(255), primary_key=True)
+    item_key = Column(String(255), primary_key=True)  # Trimmed, lowercased name
+    item_label = Column(String(255), nullable=False)  # Most recent spelling
+    times_bought = Column(Integer, nullable=False, server_default="0")
+    last_price = Column(Numeric(10, 2), nullable=True)
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
+    recent_prices = Column(ARRAY(Numeric(10, 2)), nullable=False, server_default="{}")  # Newest first
+
+
+class EmailOutbox(Base):
+    """
+    Emails waiting to be sent by outbox_worker.py.
+    Rows are written in the same transaction as the change they announce.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String(32), nullable=False)  # Selects the email template, e.g. "split_bill"
+    recipient = Column(String(255), nullable=False)
+    payload = Column(JSONB, nullable=False)  # Template data, captured when queued
+    split_id = Column(UUID(as_uuid=True), ForeignKey("expense_splits.id", ondelete="CASCADE"), nullable=True, index=True)
+    status = Column(String(16), nullable=False, server_default="pending")  # pending / sent / failed
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())  # Due time (digest window / retry backoff)
+    claimed_until = Column(DateTime(timezone=True), nullable=True)  # Lease held by a worker while sending
+    claimed_by = Column(String(255), nullable=True)  # Worker holding the lease
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+
+# Composite indexes for hot queries
+# (created by migrations/v0002_performance_indexes.py)
+Index("ix_expenses_user_id_created_at", Expense.user_id, Expense.created_at.desc(), Expense.id.desc())
+Index("ix_expense_splits_participant_email", ExpenseSplit.participant_email)
+Index("ix_contacts_user_id_friend_user_id", Contact.user_id, Contact.friend_user_id)
+Index("ix_expense_participants_items", ExpenseParticipant.items, postgresql_using="gin", postgresql_ops={"items": "jsonb_path_ops"})
+Index("ix_expense_splits_items_detail", ExpenseSplit.items_detail, postgresql_using="gin", postgresql_ops={"items_detail": "jsonb_path_ops"})
+Index("ix_expenses_user_id_search_vector", Expense.user_id, Expense.search_vector, postgresql_using="gin")
+Index("ix_item_catalog_trgm", ItemCatalog.user_id, ItemCatalog.store_key, ItemCatalog.item_key, postgresql_using="gin", postgresql_ops={"item_key": "gin_trgm_ops"})
+Index("ux_email_outbox_pending_split_id", EmailOutbox.split_id, unique=True, postgresql_where=EmailOutbox.status == "pending")
+Index("ix_email_outbox_pending", EmailOutbox.next_attempt_at, postgresql_where=EmailOutbox.status == "pending")
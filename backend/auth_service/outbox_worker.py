@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Email outbox worker
+
+Run one or more of these next to the API workers:
+
+    python outbox_worker.py [--concurrency 8] [--batch-size 50]
+
+Each pass claims up to --batch-size due rows with SELECT ... FOR UPDATE
+SKIP LOCKED, so any number of worker processes can share the outbox
+without sending a row twice. Claiming sets a lease (claimed_until, now +
+OUTBOX_LEASE_SECONDS, and claimed_by): leased rows are skipped by every
+other worker, and if a worker dies mid-send its rows are claimable again
+once the lease runs out. In digest mode (BILL_DIGEST_WINDOW_SECONDS > 0)
+a due bill row also claims the other pending bill rows for the same
+recipient that are only waiting out the digest window (not leased, not
+backing off after a failure), and each recipient's bills go out as one
+combined email.
+Emails are then sent with bounded concurrency and the outcomes written
+back with one statement per outcome:
+
+- sent: status 'sent'; for bill emails the split's email_sent is set too
+  (only for rows this worker still held the lease on)
+- failed: retried after exponential backoff (OUTBOX_BACKOFF_SECONDS * 2^n,
+  at most OUTBOX_MAX_BACKOFF_SECONDS) until OUTBOX_MAX_ATTEMPTS, then
+  status 'failed' with the last error kept for inspection
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import uuid as uuid_lib
+
+from sqlalchemy import String, case, column, func, or_, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+
+from database import AsyncSessionLocal
+from email_outbox import BILL_DIGEST_WINDOW_SECONDS, SPLIT_BILL, deliver
+from metrics import metrics
+from models import EmailOutbox, ExpenseSplit
+
+logger = logging.getLogger("outbox_worker")
+
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_BACKOFF_SECONDS", "30"))
+OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Pending and not held by a live lease
+CLAIMABLE = (
+    EmailOutbox.status == "pending",
+    or_(EmailOutbox.claimed_until.is_(None), EmailOutbox.claimed_until <= func.now()),
+)
+
+
+def _seconds(expr):
+    return func.make_interval(0, 0, 0, 0, 0, 0, expr)
+
+
+async def _lease(db, claimable) -> List[EmailOutbox]:
+    """Lease the rows selected by `claimable` (an id select) to this worker"""
+    return (await db.scalars(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(claimable.with_for_update(skip_locked=True).scalar_subquery()))
+        .values(
+            attempts=EmailOutbox.attempts + 1,
+            claimed_until=func.now() + _seconds(OUTBOX_LEASE_SECONDS),
+            claimed_by=WORKER_ID,
+        )
+        .returning(EmailOutbox)
+        .execution_options(synchronize_session=False)
+    )).all()
+
+
+async def claim_batch(batch_size: int) -> List[EmailOutbox]:
+    """
+    Lease up to batch_size due rows to this worker; in digest mode, plus
+    the other pending bill rows of the same recipients
+    """
+    async with AsyncSessionLocal() as db:
+        rows = await _lease(db, (
+            select(EmailOutbox.id)
+            .where(*CLAIMABLE, EmailOutbox.next_attempt_at <= func.now())
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(batch_size)
+        ))
+        recipients = {row.recipient for row in rows if row.kind == SPLIT_BILL}
+        if BILL_DIGEST_WINDOW_SECONDS > 0 and recipients:
+            rows += await _lease(db, (
+                select(EmailOutbox.id)
+                .where(
+                    *CLAIMABLE,
+                    EmailOutbox.kind == SPLIT_BILL,
+                    EmailOutbox.recipient.in_(recipients),
+                    EmailOutbox.id.notin_([row.id for row in rows]),
+                    # Due, or held only by the digest window (never attempted);
+                    # rows backing off after a failure wait for their retry
+                    or_(EmailOutbox.next_attempt_at <= func.now(), EmailOutbox.attempts == 0)
+                )
+            ))
+        await db.commit()
+    return rows
+
+
+def group_rows(rows: List[EmailOutbox]) -> List[List[EmailOutbox]]:
+    """One group per email to send: bill rows by recipient in digest mode"""
+    if BILL_DIGEST_WINDOW_SECONDS <= 0:
+        return [[row] for row in rows]
+    groups: Dict[tuple, List[EmailOutbox]] = {}
+    for row in rows:
+        key = (row.kind, row.recipient) if row.kind == SPLIT_BILL else (row.kind, row.id)
+        groups.setdefault(key, []).append(row)
+    return list(groups.values())
+
+
+async def record_results(rows: List[EmailOutbox], errors: Dict[uuid_lib.UUID, Optional[str]]):
+    """Write back the outcome of a sent batch in one transaction"""
+    now = datetime.now(timezone.utc)
+    sent = [row for row in rows if errors.get(row.id) is None]
+    failed = [row for row in rows if errors.get(row.id) is not None]
+
+    # Only rows this worker still holds: after an expired lease another
+    # worker may have claimed them
+    held = EmailOutbox.claimed_by == WORKER_ID
+    async with AsyncSessionLocal() as db:
+        if sent:
+            # Splits are marked only for the rows this update changed
+            updated = await db.scalars(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_([row.id for row in sent]), held)
+                .values(status="sent", sent_at=now, last_error=None, claimed_until=None, claimed_by=None)
+                .returning(EmailOutbox.split_id)
+                .execution_options(synchronize_session=False)
+            )
+            split_ids = [split_id for split_id in updated if split_id]
+            if split_ids:
+                await db.execute(
+                    update(ExpenseSplit)
+                    .where(ExpenseSplit.id.in_(split_ids))
+                    .values(email_sent=True, email_sent_at=now)
+                )
+        if failed:
+            outcome = values(
+                column("id", UUID(as_uuid=True)), column("error", String), name="outcome"
+            ).data([(row.id, errors[row.id]) for row in failed])
+            backoff = func.least(
+                OUTBOX_BACKOFF_SECONDS * func.power(2, EmailOutbox.attempts - 1),
+                OUTBOX_MAX_BACKOFF_SECONDS
+            )
+            exhausted = EmailOutbox.attempts >= OUTBOX_MAX_ATTEMPTS
+            await db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == outcome.c.id, held)
+                .values(
+                    status=case((exhausted, "failed"), else_="pending"),
+                    last_error=outcome.c.error,
+                    next_attempt_at=func.now() + _seconds(backoff),
+                    claimed_until=None,
+                    claimed_by=None,
+                )
+            )
+        await db.commit()
+
+    metrics.inc("outbox_sent", len(sent))
+    metrics.inc("outbox_send_failures", len(failed))
+
+
+async def process_batch(batch_size: int, concurrency: int) -> int:
+    """Claim, send and record one batch; returns how many rows were claimed"""
+    rows = await claim_batch(batch_size)
+    if not rows:
+        return 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(group: List[EmailOutbox]) -> Optional[str]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                return await deliver(group)
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"
+            finally:
+                metrics.observe("outbox_delivery", time.perf_counter() - started)
+
+    groups = group_rows(rows)
+    results = await asyncio.gather(*(send(group) for group in groups))
+    errors = {row.id: error for group, error in zip(groups, results) for row in group}
+    await record_results(rows, errors)
+    metrics.inc("outbox_emails", len(groups))
+    return len(rows)
+
+
+async def run(batch_size: int, concurrency: int, stopped: asyncio.Event):
+    """Drain the outbox until stopped, polling when it is empty"""
+    logger.info("Outbox worker started (batch %d, concurrency %d)", batch_size, concurrency)
+    while not stopped.is_set():
+        try:
+            claimed = await process_batch(batch_size, concurrency)
+        except Exception:
+            logger.exception("Outbox batch failed")
+            claimed = 0
+        if claimed < batch_size:
+            try:
+                await asyncio.wait_for(stopped.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    logger.info("Outbox worker stopped")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Send queued emails from email_outbox")
+    parser.add_argument("--concurrency", type=int, default=OUTBOX_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    args = parser.parse_args()
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Finish the current batch, then exit
+        loop.add_signal_handler(sig, stopped.set)
+    try:
+        await run(args.batch_size, args.concurrency, stopped)
+    finally:
+        from email_service import smtp_pool
+        await smtp_pool.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+"""
+Opaque cursors for keyset pagination
+
+A cursor is the sort key of the last row on a page, JSON-encoded and
+base64url-wrapped so clients treat it as an opaque token.
+"""
+import base64
+import json
+import uuid as uuid_lib
+from datetime import datetime
+from typing import Any, List
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode sort-key values (datetime, UUID, numbers, strings) as a cursor"""
+    payload = []
+    for value in values:
+        if isinstance(value, datetime):
+            payload.append({"t": value.isoformat()})
+        elif isinstance(value, uuid_lib.UUID):
+            payload.append({"u": str(value)})
+        else:
+            payload.append(value)
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor produced by encode_cursor, raising 400 if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError("wrong cursor size")
+        values = []
+        for value in payload:
+            if isinstance(value, dict) and "t" in value:
+                values.append(datetime.fromisoformat(value["t"]))
+            elif isinstance(value, dict) and "u" in value:
+                values.append(uuid_lib.UUID(value["u"]))
+            else:
+                values.append(value)
+        return values
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
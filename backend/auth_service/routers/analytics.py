@@ -0,0 +1,291 @@
+"""
+Spending Analytics Routes
+
+All queries read the rollup tables maintained by analytics_rollups.py,
+never expenses / expense_items / expense_splits. `start` and `end` are
+inclusive dates; monthly endpoints widen them to whole UTC months and
+default to the last 12 months.
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from dependencies import get_db, get_current_user
+from user_cache import UserSnapshot
+from models import (
+    User, Contact, ContactGroup, ContactGroupMember,
+    SpendDaily, SpendStoreMonthly, SpendParticipantMonthly, SpendItemMonthly
+)
+from analytics_schemas import (
+    DailySpend, DailySpendResponse,
+    MonthlySpend, MonthlySpendResponse,
+    StoreMonthlySpend, StoreSpendResponse,
+    ContactMonthlySpend, ContactSpendResponse,
+    GroupMonthlySpend, GroupSpendResponse,
+    TopItem, TopItemsResponse
+)
+
+router = APIRouter()
+
+
+def _month_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """Resolve start/end to the first days of the first and last months"""
+    today = datetime.now(timezone.utc).date()
+    end_month = (end or today).replace(day=1)
+    if start:
+        start_month = start.replace(day=1)
+    else:
+        year, month = divmod(end_month.year * 12 + end_month.month - 1 - 11, 12)
+        start_month = date(year, month + 1, 1)
+    if start_month > end_month:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    return start_month, end_month
+
+
+@router.get("/daily", response_model=DailySpendResponse)
+async def get_daily_spend(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Spend per UTC day (defaults to the last 30 days)
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    
+    rows = (await db.scalars(
+        select(SpendDaily)
+        .where(
+            SpendDaily.user_id == current_user.id,
+            SpendDaily.day.between(start, end),
+            SpendDaily.expense_count != 0
+        )
+        .order_by(SpendDaily.day)
+    )).all()
+    
+    return DailySpendResponse(
+        start=start,
+        end=end,
+        days=[
+            DailySpend(day=row.day, expense_count=row.expense_count, total_amount=row.total_amount)
+            for row in rows
+        ]
+    )
+
+
+@router.get("/monthly", response_model=MonthlySpendResponse)
+async def get_monthly_spend(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Spend per month
+    """
+    start_month, end_month = _month_range(start, end)
+    month = func.date_trunc("month", SpendDaily.day).cast(SpendDaily.day.type)
+    last_day = (end_month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    
+    rows = (await db.execute(
+        select(month, func.sum(SpendDaily.expense_count), func.sum(SpendDaily.total_amount))
+        .where(
+            SpendDaily.user_id == current_user.id,
+            SpendDaily.day.between(start_month, last_day)
+        )
+        .group_by(month)
+        .having(func.sum(SpendDaily.expense_count) != 0)
+        .order_by(month)
+    )).all()
+    
+    return MonthlySpendResponse(
+        start=start_month,
+        end=end_month,
+        months=[
+            MonthlySpend(month=row[0], expense_count=row[1], total_amount=row[2])
+            for row in rows
+        ]
+    )
+
+
+@router.get("/stores", response_model=StoreSpendResponse)
+async def get_store_spend(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Spend per store per month, largest first within each month
+    """
+    start_month, end_month = _month_range(start, end)
+    
+    rows = (await db.scalars(
+        select(SpendStoreMonthly)
+        .where(
+            SpendStoreMonthly.user_id == current_user.id,
+            SpendStoreMonthly.month.between(start_month, end_month),
+            SpendStoreMonthly.expense_count != 0
+        )
+        .order_by(SpendStoreMonthly.month, SpendStoreMonthly.total_amount.desc())
+    )).all()
+    
+    return StoreSpendResponse(
+        start=start_month,
+        end=end_month,
+        stores=[
+            StoreMonthlySpend(
+                month=row.month,
+                store_name=row.store_label or "Unknown Store",
+                expense_count=row.expense_count,
+                total_amount=row.total_amount
+            )
+            for row in rows
+        ]
+    )
+
+
+@router.get("/contacts", response_model=ContactSpendResponse)
+async def get_contact_spend(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Amounts split to each participant per month (by expense month)
+    """
+    start_month, end_month = _month_range(start, end)
+    
+    rows = (await db.scalars(
+        select(SpendParticipantMonthly)
+        .where(
+            SpendParticipantMonthly.user_id == current_user.id,
+            SpendParticipantMonthly.month.between(start_month, end_month),
+            SpendParticipantMonthly.split_count != 0
+        )
+        .order_by(SpendParticipantMonthly.month, SpendParticipantMonthly.total_amount.desc())
+    )).all()
+    
+    return ContactSpendResponse(
+        start=start_month,
+        end=end_month,
+        contacts=[
+            ContactMonthlySpend(
+                month=row.month,
+                participant_key=row.participant_key,
+                participant_name=row.participant_label,
+                split_count=row.split_count,
+                total_amount=row.total_amount
+            )
+            for row in rows
+        ]
+    )
+
+
+@router.get("/groups", response_model=GroupSpendResponse)
+async def get_group_spend(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Amounts split to the members of each contact group per month
+    Uses current group membership.
+    """
+    start_month, end_month = _month_range(start, end)
+    
+    rows = (await db.execute(
+        select(
+            SpendParticipantMonthly.month,
+            ContactGroup.id,
+            ContactGroup.name,
+            func.sum(SpendParticipantMonthly.split_count),
+            func.sum(SpendParticipantMonthly.total_amount)
+        )
+        .select_from(ContactGroup)
+        .join(ContactGroupMember, ContactGroupMember.group_id == ContactGroup.id)
+        .join(Contact, Contact.id == ContactGroupMember.contact_id)
+        .join(User, User.id == Contact.friend_user_id)
+        .join(
+            SpendParticipantMonthly,
+            (SpendParticipantMonthly.user_id == ContactGroup.user_id)
+            & (SpendParticipantMonthly.participant_key == User.email)
+        )
+        .where(
+            ContactGroup.user_id == current_user.id,
+            SpendParticipantMonthly.month.between(start_month, end_month)
+        )
+        .group_by(SpendParticipantMonthly.month, ContactGroup.id, ContactGroup.name)
+        .having(func.sum(SpendParticipantMonthly.split_count) != 0)
+        .order_by(SpendParticipantMonthly.month, func.sum(SpendParticipantMonthly.total_amount).desc())
+    )).all()
+    
+    return GroupSpendResponse(
+        start=start_month,
+        end=end_month,
+        groups=[
+            GroupMonthlySpend(
+                month=row[0],
+                group_id=row[1],
+                group_name=row[2],
+                split_count=row[3],
+                total_amount=row[4]
+            )
+            for row in rows
+        ]
+    )
+
+
+@router.get("/items/top", response_model=TopItemsResponse)
+async def get_top_items(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = 10,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Items with the highest total spend over the period
+    """
+    start_month, end_month = _month_range(start, end)
+    total = func.sum(SpendItemMonthly.total_amount)
+    
+    rows = (await db.execute(
+        select(
+            func.max(SpendItemMonthly.item_label),
+            func.sum(SpendItemMonthly.occurrences),
+            func.sum(SpendItemMonthly.quantity),
+            total
+        )
+        .where(
+            SpendItemMonthly.user_id == current_user.id,
+            SpendItemMonthly.month.between(start_month, end_month)
+        )
+        .group_by(SpendItemMonthly.item_key)
+        .having(func.sum(SpendItemMonthly.occurrences) > 0)
+        .order_by(total.desc())
+        .limit(min(max(limit, 1), 100))
+    )).all()
+    
+    return TopItemsResponse(
+        start=start_month,
+        end=end_month,
+        items=[
+            TopItem(item_name=row[0], occurrences=row[1], quantity=row[2], total_amount=row[3])
+            for row in rows
+        ]
+    )
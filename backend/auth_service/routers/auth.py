@@ -2,11 +2,15 @@
 Authentication Routes
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from dependencies import get_db, get_current_user
-from models import User, EmailVerificationCode, PasswordResetCode
+from user_cache import UserSnapshot, invalidate_user
+from models import User
+from balance_engine import backfill_registered_balances
+from expense_summary import backfill_registered_summary
+from code_store import code_store, REGISTRATION, PASSWORD_RESET
 from schemas import (
     RegisterRequest,
     LoginRequest,
@@ -16,7 +20,13 @@ from schemas import (
     PasswordResetRequest,
     MessageResponse,
 )
-from auth import verify_password, get_password_hash, create_access_token, verify_token
+from auth import (
+    verify_password_async,
+    get_password_hash_async,
+    needs_rehash,
+    create_access_token,
+    verify_token,
+)
 from email_service import send_verification_email, generate_verification_code
 
 router = APIRouter()
@@ -24,7 +34,7 @@ router = APIRouter()
 @router.post("/send-verification-code", response_model=MessageResponse)
 async def send_verification_code(
     request: SendVerificationCodeRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Send verification code to email
@@ -32,25 +42,16 @@ async def send_verification_code(
     email = request.email.lower()
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await db.scalar(select(User).where(User.email == email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Generate verification code
+    # Generate and store verification code
     code = generate_verification_code()
-    expires_at = datetime.utcnow() + timedelta(minutes=10)
-    
-    # Save verification code
-    verification = EmailVerificationCode(
-        email=email,
-        code=code,
-        expires_at=expires_at
-    )
-    db.add(verification)
-    db.commit()
+    await code_store.put(REGISTRATION, email, code)
     
     # Send email
     await send_verification_email(email, code, "registration")
@@ -61,7 +62,7 @@ async def send_verification_code(
 @router.post("/register", response_model=TokenResponse)
 async def register(
     request: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Register a new user with email verification code
@@ -69,43 +70,33 @@ async def register(
     email = request.email.lower()
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await db.scalar(select(User).where(User.email == email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Verify code
-    verification = (
-        db.query(EmailVerificationCode)
-        .filter(
-            EmailVerificationCode.email == email,
-            EmailVerificationCode.code == request.verification_code,
-            EmailVerificationCode.used == False,
-            EmailVerificationCode.expires_at > datetime.utcnow()
-        )
-        .first()
-    )
-    
-    if not verification:
+    # Verify and consume code; rolled back with the user insert if that fails
+    if not await code_store.consume(REGISTRATION, email, request.verification_code, db):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired verification code"
         )
     
-    # Mark code as used
-    verification.used = True
-    
     # Create user
     user = User(
         email=email,
-        password_hash=get_password_hash(request.password),
+        password_hash=await get_password_hash_async(request.password),
         email_verified=True
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.flush()
+    # Splits addressed to this email before registration
+    await backfill_registered_balances(db, user.id, email)
+    await backfill_registered_summary(db, user.id, email)
+    await db.commit()
+    await db.refresh(user)
     
     # Create access token
     access_token = create_access_token(data={"sub": str(user.id), "email": user.email})
@@ -120,20 +111,26 @@ async def register(
 @router.post("/login", response_model=TokenResponse)
 async def login(
     request: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Login with email and password
     """
     email = request.email.lower()
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     
-    if not user or not verify_password(request.password, user.password_hash):
+    if not user or not await verify_password_async(request.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
+    # Upgrade the hash if BCRYPT_ROUNDS changed since it was created
+    if needs_rehash(user.password_hash):
+        user.password_hash = await get_password_hash_async(request.password)
+        await invalidate_user(db, user.id)
+        await db.commit()
+    
     # Create access token
     access_token = create_access_token(data={"sub": str(user.id), "email": user.email})
     
@@ -147,7 +144,7 @@ async def login(
 @router.post("/send-password-reset-code", response_model=MessageResponse)
 async def send_password_reset_code(
     request: SendVerificationCodeRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Send password reset verification code
@@ -155,23 +152,14 @@ async def send_password_reset_code(
     email = request.email.lower()
     
     # Check if user exists
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         # Don't reveal if user exists
         return MessageResponse(message="If email exists, reset code sent")
     
-    # Generate reset code
+    # Generate and store reset code
     code = generate_verification_code()
-    expires_at = datetime.utcnow() + timedelta(minutes=10)
-    
-    # Save reset code
-    reset_code = PasswordResetCode(
-        email=email,
-        code=code,
-        expires_at=expires_at
-    )
-    db.add(reset_code)
-    db.commit()
+    await code_store.put(PASSWORD_RESET, email, code)
     
     # Send email
     await send_verification_email(email, code, "password_reset")
@@ -182,33 +170,22 @@ async def send_password_reset_code(
 @router.post("/reset-password", response_model=MessageResponse)
 async def reset_password(
     request: PasswordResetRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Reset password with verification code
     """
     email = request.email.lower()
     
-    # Verify code
-    reset_code = (
-        db.query(PasswordResetCode)
-        .filter(
-            PasswordResetCode.email == email,
-            PasswordResetCode.code == request.verification_code,
-            PasswordResetCode.used == False,
-            PasswordResetCode.expires_at > datetime.utcnow()
-        )
-        .first()
-    )
-    
-    if not reset_code:
+    # Verify and consume code; rolled back with the password update if that fails
+    if not await code_store.consume(PASSWORD_RESET, email, request.verification_code, db):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired verification code"
         )
     
     # Get user
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -216,9 +193,9 @@ async def reset_password(
         )
     
     # Update password
-    user.password_hash = get_password_hash(request.new_password)
-    reset_code.used = True
-    db.commit()
+    user.password_hash = await get_password_hash_async(request.new_password)
+    await invalidate_user(db, user.id)
+    await db.commit()
     
     return MessageResponse(message="Password reset successfully")
 
@@ -239,7 +216,7 @@ async def verify_token_endpoint(token: str):
 
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """
     Get current user info
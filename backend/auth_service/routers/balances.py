@@ -0,0 +1,115 @@
+"""
+Balance and Settle-up Routes
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from decimal import Decimal
+import uuid as uuid_lib
+
+from dependencies import get_db, get_current_user
+from user_cache import UserSnapshot
+from models import User, Balance, Contact, ContactGroup, ContactGroupMember
+from balance_schemas import (
+    BalanceSchema,
+    BalanceListResponse,
+    SettlementTransfer,
+    SettlementPlanResponse
+)
+from balance_engine import group_positions, plan_settlement
+
+router = APIRouter()
+
+
+@router.get("/balances", response_model=BalanceListResponse)
+async def get_balances(
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Net balance with every counterparty across all unpaid splits
+    Positive amounts are owed to the current user.
+    """
+    rows = (await db.execute(
+        select(Balance, User.id)
+        .outerjoin(User, User.email == Balance.counterparty_email)
+        .where(Balance.user_id == current_user.id, Balance.net_amount != 0)
+        .order_by(Balance.net_amount.desc())
+    )).all()
+    
+    balances = [
+        BalanceSchema(
+            counterparty_email=balance.counterparty_email,
+            counterparty_user_id=counterparty_id,
+            net_amount=balance.net_amount,
+            updated_at=balance.updated_at
+        )
+        for balance, counterparty_id in rows
+    ]
+    
+    return BalanceListResponse(
+        balances=balances,
+        total_owed_to_you=sum((b.net_amount for b in balances if b.net_amount > 0), Decimal(0)),
+        total_you_owe=-sum((b.net_amount for b in balances if b.net_amount < 0), Decimal(0))
+    )
+
+
+@router.get("/contact-groups/{group_id}/settle-up", response_model=SettlementPlanResponse)
+async def get_settle_up_plan(
+    group_id: str,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Transfers that settle all debts between members of a contact group
+    (the creator plus its contacts), using as few transfers as the
+    greedy planner finds
+    """
+    try:
+        group_uuid = uuid_lib.UUID(group_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
+    
+    group = await db.scalar(
+        select(ContactGroup)
+        .options(
+            selectinload(ContactGroup.members).selectinload(ContactGroupMember.contact).selectinload(Contact.friend_user)
+        )
+        .where(
+            ContactGroup.id == group_uuid,
+            ContactGroup.user_id == current_user.id
+        )
+    )
+    
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Group not found"
+        )
+    
+    emails = {current_user.id: current_user.email}
+    for member in group.members:
+        if member.contact and member.contact.friend_user:
+            emails[member.contact.friend_user.id] = member.contact.friend_user.email
+    
+    positions = await group_positions(db, list(emails.items()))
+    transfers = [
+        SettlementTransfer(
+            from_user_id=debtor,
+            from_email=emails[debtor],
+            to_user_id=creditor,
+            to_email=emails[creditor],
+            amount=amount
+        )
+        for debtor, creditor, amount in plan_settlement(positions)
+    ]
+    
+    return SettlementPlanResponse(
+        group_id=group.id,
+        member_count=len(emails),
+        transfers=transfers
+    )
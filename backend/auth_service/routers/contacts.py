@@ -2,10 +2,16 @@
 Contact and Contact Group Routes
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Set
 import uuid as uuid_lib
 
 from dependencies import get_db, get_current_user
+from user_cache import UserSnapshot
 from models import User, Contact, ContactGroup, ContactGroupMember
 from contact_schemas import AddContactRequest, UpdateContactRequest, ContactResponse, ContactListResponse
 from contact_group_schemas import (
@@ -13,7 +19,9 @@ from contact_group_schemas import (
     UpdateContactGroupRequest,
     ContactGroupResponse,
     ContactGroupListResponse,
-    ContactGroupMemberSchema
+    ContactGroupMemberSchema,
+    AddGroupMembersRequest,
+    GroupMembersResponse
 )
 from schemas import MessageResponse
 
@@ -24,14 +32,14 @@ router = APIRouter()
 @router.post("/contacts", response_model=ContactResponse)
 async def add_contact(
     request: AddContactRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Add a friend to contacts (must be a registered user)
     """
     # Find friend by email
-    friend = db.query(User).filter(User.email == request.friend_email.lower()).first()
+    friend = await db.scalar(select(User).where(User.email == request.friend_email.lower()))
     if not friend:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -46,10 +54,10 @@ async def add_contact(
         )
     
     # Check if already in contacts
-    existing = db.query(Contact).filter(
+    existing = await db.scalar(select(Contact).where(
         Contact.user_id == current_user.id,
         Contact.friend_user_id == friend.id
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(
@@ -67,10 +75,10 @@ async def add_contact(
     
     # Auto-create reverse contact (B -> A) if not exists
     # B's nickname for A should be default (email username)
-    reverse_existing = db.query(Contact).filter(
+    reverse_existing = await db.scalar(select(Contact).where(
         Contact.user_id == friend.id,
         Contact.friend_user_id == current_user.id
-    ).first()
+    ))
     
     if not reverse_existing:
         # Default nickname is email username (before @)
@@ -82,8 +90,8 @@ async def add_contact(
         )
         db.add(reverse_contact)
     
-    db.commit()
-    db.refresh(contact)
+    await db.commit()
+    await db.refresh(contact)
     
     return ContactResponse(
         id=str(contact.id),
@@ -97,19 +105,18 @@ async def add_contact(
 
 @router.get("/contacts", response_model=ContactListResponse)
 async def get_contacts(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get user's contact list
     """
     # Get contacts with friend info
-    contacts = (
-        db.query(Contact)
+    contacts = (await db.scalars(
+        select(Contact)
         .options(selectinload(Contact.friend_user))
-        .filter(Contact.user_id == current_user.id)
-        .all()
-    )
+        .where(Contact.user_id == current_user.id)
+    )).all()
     
     contact_responses = []
     for contact in contacts:
@@ -130,8 +137,8 @@ async def get_contacts(
 async def update_contact(
     contact_id: str,
     request: UpdateContactRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Update a contact's nickname
@@ -145,10 +152,10 @@ async def update_contact(
         )
     
     # Verify contact ownership
-    contact = db.query(Contact).filter(
+    contact = await db.scalar(select(Contact).where(
         Contact.id == contact_uuid,
         Contact.user_id == current_user.id
-    ).first()
+    ))
     
     if not contact:
         raise HTTPException(
@@ -160,11 +167,11 @@ async def update_contact(
     if request.nickname is not None:
         contact.nickname = request.nickname if request.nickname else None
     
-    db.commit()
-    db.refresh(contact)
+    await db.commit()
+    await db.refresh(contact)
     
     # Get friend user info
-    friend = db.query(User).filter(User.id == contact.friend_user_id).first()
+    friend = await db.get(User, contact.friend_user_id)
     
     return ContactResponse(
         id=str(contact.id),
@@ -179,8 +186,8 @@ async def update_contact(
 @router.delete("/contacts/{contact_id}", response_model=MessageResponse)
 async def delete_contact(
     contact_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a contact
@@ -194,10 +201,10 @@ async def delete_contact(
         )
     
     # Find contact and verify ownership
-    contact = db.query(Contact).filter(
+    contact = await db.scalar(select(Contact).where(
         Contact.id == contact_uuid,
         Contact.user_id == current_user.id
-    ).first()
+    ))
     
     if not contact:
         raise HTTPException(
@@ -205,8 +212,8 @@ async def delete_contact(
             detail="Contact not found"
         )
     
-    db.delete(contact)
-    db.commit()
+    await db.delete(contact)
+    await db.commit()
     
     return MessageResponse(message="Contact deleted successfully")
 
@@ -216,18 +223,18 @@ async def delete_contact(
 @router.post("/contact-groups", response_model=ContactGroupResponse)
 async def create_contact_group(
     request: CreateContactGroupRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new contact group
     """
     # Verify all contact IDs belong to the user
     if request.contact_ids:
-        contacts = db.query(Contact).filter(
+        contacts = (await db.scalars(select(Contact).where(
             Contact.id.in_([uuid_lib.UUID(str(cid)) for cid in request.contact_ids]),
             Contact.user_id == current_user.id
-        ).all()
+        ))).all()
         if len(contacts) != len(request.contact_ids):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -241,7 +248,7 @@ async def create_contact_group(
         description=request.description
     )
     db.add(group)
-    db.flush()
+    await db.flush()
     
     # Add members
     for contact_id in request.contact_ids:
@@ -251,11 +258,11 @@ async def create_contact_group(
         )
         db.add(member)
     
-    db.commit()
-    db.refresh(group)
+    await db.commit()
+    await db.refresh(group)
     
     # Get creator (user who created the group)
-    creator = db.query(User).filter(User.id == group.user_id).first()
+    creator = await db.get(User, group.user_id)
     
     # Build response - always include creator first
     members = []
@@ -269,11 +276,11 @@ async def create_contact_group(
         ))
     
     # Add other members (contacts)
-    members_query = db.query(ContactGroupMember, Contact, User).join(
+    members_query = (await db.execute(select(ContactGroupMember, Contact, User).join(
         Contact, ContactGroupMember.contact_id == Contact.id
     ).join(
         User, Contact.friend_user_id == User.id
-    ).filter(ContactGroupMember.group_id == group.id).all()
+    ).where(ContactGroupMember.group_id == group.id))).all()
     
     for member, contact, friend_user in members_query:
         members.append(ContactGroupMemberSchema(
@@ -298,22 +305,21 @@ async def create_contact_group(
 
 @router.get("/contact-groups", response_model=ContactGroupListResponse)
 async def get_contact_groups(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get user's contact groups
     """
     # Get user's groups
-    groups = (
-        db.query(ContactGroup)
+    groups = (await db.scalars(
+        select(ContactGroup)
         .options(
             selectinload(ContactGroup.members).selectinload(ContactGroupMember.contact).selectinload(Contact.friend_user)
         )
-        .filter(ContactGroup.user_id == current_user.id)
+        .where(ContactGroup.user_id == current_user.id)
         .order_by(ContactGroup.created_at.desc())
-        .all()
-    )
+    )).all()
     
     group_responses = []
     for group in groups:
@@ -356,15 +362,14 @@ async def get_contact_groups(
     return ContactGroupListResponse(groups=group_responses, total=len(group_responses))
 
 
-@router.put("/contact-groups/{group_id}", response_model=ContactGroupResponse)
-async def update_contact_group(
+async def _owned_group_for_update(
+    db: AsyncSession,
     group_id: str,
-    request: UpdateContactGroupRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+    current_user: UserSnapshot
+) -> ContactGroup:
     """
-    Update a contact group
+    The group, row-locked so concurrent membership edits are applied one
+    after another; only the creator may change it
     """
     try:
         group_uuid = uuid_lib.UUID(group_id)
@@ -374,10 +379,9 @@ async def update_contact_group(
             detail="Invalid ID format"
         )
     
-    # Find group (all users can view, but only creator can update)
-    group = db.query(ContactGroup).filter(
-        ContactGroup.id == group_uuid
-    ).first()
+    group = await db.scalar(
+        select(ContactGroup).where(ContactGroup.id == group_uuid).with_for_update()
+    )
     
     if not group:
         raise HTTPException(
@@ -391,89 +395,205 @@ async def update_contact_group(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only group creator can update this group"
         )
+    return group
+
+
+def _member_schema(contact: Contact, friend_user: User) -> ContactGroupMemberSchema:
+    return ContactGroupMemberSchema(
+        contact_id=contact.id,
+        user_id=friend_user.id,
+        contact_email=friend_user.email,
+        contact_nickname=contact.nickname,
+        is_creator=False
+    )
+
+
+async def _group_members(db: AsyncSession, group_id: uuid_lib.UUID) -> Dict[uuid_lib.UUID, ContactGroupMemberSchema]:
+    """Current members of the group by contact ID (one joined query)"""
+    rows = await db.execute(
+        select(Contact, User)
+        .join(ContactGroupMember, ContactGroupMember.contact_id == Contact.id)
+        .join(User, Contact.friend_user_id == User.id)
+        .where(ContactGroupMember.group_id == group_id)
+        .order_by(ContactGroupMember.created_at)
+    )
+    return {contact.id: _member_schema(contact, friend_user) for contact, friend_user in rows}
+
+
+async def _owned_contacts(
+    db: AsyncSession,
+    owner_id: uuid_lib.UUID,
+    contact_ids: Set[uuid_lib.UUID]
+) -> Dict[uuid_lib.UUID, ContactGroupMemberSchema]:
+    """
+    Member entries for contact_ids (one joined query); 400 unless every
+    one of them is the owner's contact
+    """
+    if not contact_ids:
+        return {}
+    rows = await db.execute(
+        select(Contact, User)
+        .join(User, Contact.friend_user_id == User.id)
+        .where(Contact.id.in_(contact_ids), Contact.user_id == owner_id)
+    )
+    contacts = {contact.id: _member_schema(contact, friend_user) for contact, friend_user in rows}
+    if len(contacts) != len(contact_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="One or more contacts not found or not owned by user"
+        )
+    return contacts
+
+
+async def _insert_members(db: AsyncSession, group_id: uuid_lib.UUID, contact_ids: Iterable[uuid_lib.UUID]):
+    """One multi-row INSERT; contacts already in the group are skipped"""
+    rows = [
+        {"id": uuid_lib.uuid4(), "group_id": group_id, "contact_id": contact_id}
+        for contact_id in contact_ids
+    ]
+    if rows:
+        await db.execute(
+            insert(ContactGroupMember)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[ContactGroupMember.group_id, ContactGroupMember.contact_id])
+        )
+
+
+@router.put("/contact-groups/{group_id}", response_model=ContactGroupResponse)
+async def update_contact_group(
+    group_id: str,
+    request: UpdateContactGroupRequest,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Update a contact group
+    A new contact_ids list is applied as a difference: only contacts that
+    were added are inserted and only those that were dropped are deleted.
+    The response is built from the rows already loaded.
+    """
+    group = await _owned_group_for_update(db, group_id, current_user)
+    changed = False
     
     # Update group fields
-    if request.name is not None:
+    if request.name is not None and request.name != group.name:
         group.name = request.name
-    if request.description is not None:
+        changed = True
+    if request.description is not None and request.description != group.description:
         group.description = request.description
+        changed = True
+    
+    members = await _group_members(db, group.id)
     
-    # Update members if provided
+    # Update members if provided (creator is automatically included, not in contact_ids)
     if request.contact_ids is not None:
-        # Verify all contact IDs belong to the user
-        if request.contact_ids:
-            contacts = db.query(Contact).filter(
-                Contact.id.in_([uuid_lib.UUID(str(cid)) for cid in request.contact_ids]),
-                Contact.user_id == current_user.id
-            ).all()
-            if len(contacts) != len(request.contact_ids):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="One or more contacts not found or not owned by user"
-                )
+        wanted = {uuid_lib.UUID(str(contact_id)) for contact_id in request.contact_ids if contact_id}
+        added = await _owned_contacts(db, current_user.id, wanted - members.keys())
+        removed = members.keys() - wanted
         
-        # Delete existing members (only non-creator members)
-        db.query(ContactGroupMember).filter(ContactGroupMember.group_id == group.id).delete()
+        await _insert_members(db, group.id, added)
+        if removed:
+            await db.execute(delete(ContactGroupMember).where(
+                ContactGroupMember.group_id == group.id,
+                ContactGroupMember.contact_id.in_(removed)
+            ))
         
-        # Add new members (creator is automatically included, not in contact_ids)
-        for contact_id in request.contact_ids:
-            if contact_id:  # Ensure contact_id is not None or empty
-                member = ContactGroupMember(
-                group_id=group.id,
-                    contact_id=uuid_lib.UUID(str(contact_id))
-            )
-            db.add(member)
-    
-    db.commit()
-    db.refresh(group)
+        for contact_id in removed:
+            del members[contact_id]
+        members.update(added)
+        changed = changed or bool(added or removed)
     
-    # Get creator (user who created the group)
-    creator = db.query(User).filter(User.id == group.user_id).first()
+    if changed:
+        group.updated_at = datetime.now(timezone.utc)
+        await db.commit()
     
     # Build response - always include creator first
-    members = []
-    if creator:
-        members.append(ContactGroupMemberSchema(
-            contact_id=None,
-            user_id=creator.id,
-            contact_email=creator.email,
-            contact_nickname=None,
-            is_creator=True
-        ))
-    
-    # Add other members (contacts)
-    members_query = db.query(ContactGroupMember, Contact, User).join(
-        Contact, ContactGroupMember.contact_id == Contact.id
-    ).join(
-        User, Contact.friend_user_id == User.id
-    ).filter(ContactGroupMember.group_id == group.id).all()
-    
-    for member, contact, friend_user in members_query:
-        members.append(ContactGroupMemberSchema(
-            contact_id=contact.id,
-            user_id=friend_user.id,
-            contact_email=friend_user.email,
-            contact_nickname=contact.nickname,
-            is_creator=False
-        ))
-    
+    creator = ContactGroupMemberSchema(
+        contact_id=None,
+        user_id=current_user.id,
+        contact_email=current_user.email,
+        contact_nickname=None,
+        is_creator=True
+    )
     return ContactGroupResponse(
         id=group.id,
         user_id=group.user_id,
         name=group.name,
         description=group.description,
-        members=members,
-        member_count=len(members),
+        members=[creator, *members.values()],
+        member_count=len(members) + 1,
         created_at=group.created_at,
         updated_at=group.updated_at
     )
 
 
+@router.post("/contact-groups/{group_id}/members", response_model=GroupMembersResponse)
+async def add_contact_group_members(
+    group_id: str,
+    request: AddGroupMembersRequest,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Add contacts to a group
+    Only the new membership rows are written; contacts already in the
+    group are left alone. Returns the member entries for the requested
+    contacts.
+    """
+    group = await _owned_group_for_update(db, group_id, current_user)
+    
+    contacts = await _owned_contacts(
+        db, current_user.id, {uuid_lib.UUID(str(contact_id)) for contact_id in request.contact_ids}
+    )
+    if contacts:
+        await _insert_members(db, group.id, contacts)
+        group.updated_at = datetime.now(timezone.utc)
+    await db.commit()
+    
+    return GroupMembersResponse(members=list(contacts.values()))
+
+
+@router.delete("/contact-groups/{group_id}/members/{contact_id}", response_model=MessageResponse)
+async def remove_contact_group_member(
+    group_id: str,
+    contact_id: str,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Remove one contact from a group (only that membership row is deleted)
+    """
+    try:
+        contact_uuid = uuid_lib.UUID(contact_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
+    
+    group = await _owned_group_for_update(db, group_id, current_user)
+    
+    result = await db.execute(delete(ContactGroupMember).where(
+        ContactGroupMember.group_id == group.id,
+        ContactGroupMember.contact_id == contact_uuid
+    ))
+    if not result.rowcount:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contact is not a member of this group"
+        )
+    
+    group.updated_at = datetime.now(timezone.utc)
+    await db.commit()
+    
+    return MessageResponse(message="Member removed successfully")
+
+
 @router.delete("/contact-groups/{group_id}", response_model=MessageResponse)
 async def delete_contact_group(
     group_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete a contact group
@@ -487,9 +607,7 @@ async def delete_contact_group(
         )
     
     # Find group (all users can view, but only creator can delete)
-    group = db.query(ContactGroup).filter(
-        ContactGroup.id == group_uuid
-    ).first()
+    group = await db.get(ContactGroup, group_uuid)
     
     if not group:
             raise HTTPException(
@@ -505,8 +623,8 @@ async def delete_contact_group(
         )
     
     # Delete group (cascade will delete members)
-    db.delete(group)
-    db.commit()
+    await db.delete(group)
+    await db.commit()
     
     return MessageResponse(message="Group deleted successfully")
 
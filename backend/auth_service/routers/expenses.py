@@ -1,158 +1,398 @@
 """
 Expense Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, selectinload
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, insert, tuple_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, defer
+from typing import Optional
 import uuid as uuid_lib
-import json
 
 from dependencies import get_db, get_current_user
-from models import User, Expense, ExpenseItem, ExpenseParticipant, ExpenseSplit
+from user_cache import UserSnapshot
+from models import Expense, ExpenseItem, ExpenseParticipant, ExpenseSplit, UserExpenseSummary
 from expense_schemas import (
     CreateExpenseRequest, 
     ExpenseResponse, 
     ExpenseListResponse, 
     ExpenseItemSchema, 
-    ExpenseParticipantSchema
+    ExpenseParticipantSchema,
+    ExpenseSummaryResponse
 )
 from schemas import MessageResponse
+from pagination import encode_cursor, decode_cursor
+from expense_summary import adjust_expense_totals, adjust_split_balances, current_month_start
+from balance_engine import apply_split_balances
+from analytics_rollups import record_expenses, record_splits
+from item_catalog import record_items
+from expense_import import ImportProgressResponse, import_expenses_stream
+from expense_export import MEDIA_TYPES, export_expenses_stream
 
 router = APIRouter()
 
+# Fields a listing can return; `id` is always included
+EXPENSE_FIELDS = (
+    "id", "user_id", "store_name", "total_amount", "subtotal", "tax_amount",
+    "tax_rate", "raw_text", "transcript", "items", "participants", "created_at"
+)
+# Large text columns, only loaded when asked for
+LARGE_TEXT_FIELDS = ("raw_text", "transcript")
+
+
+def _select_fields(fields: Optional[str], include: Optional[str]) -> set:
+    """
+    Resolve the `fields` / `include` query parameters to a set of field names.
+    `fields` is an exact comma-separated list; `include` adds to the default
+    set, which is every field except LARGE_TEXT_FIELDS.
+    """
+    if fields:
+        selected = {name.strip() for name in fields.split(",") if name.strip()}
+    else:
+        selected = set(EXPENSE_FIELDS) - set(LARGE_TEXT_FIELDS)
+    if include:
+        selected |= {name.strip() for name in include.split(",") if name.strip()}
+    unknown = selected - set(EXPENSE_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    selected.add("id")
+    return selected
+
+
+def _listing_options(selected: set) -> list:
+    """Loader options that skip columns and children the response won't use"""
+    options = [
+        defer(getattr(Expense, name))
+        for name in LARGE_TEXT_FIELDS
+        if name not in selected
+    ]
+    if "items" in selected:
+        options.append(selectinload(Expense.items))
+    if "participants" in selected:
+        options.append(selectinload(Expense.participants))
+    return options
+
+
+def _to_response(expense: Expense, selected: set) -> ExpenseResponse:
+    """Build an ExpenseResponse holding only the selected fields"""
+    values = {"id": str(expense.id)}
+    for name in selected:
+        if name == "id":
+            continue
+        if name == "user_id":
+            values[name] = str(expense.user_id)
+        elif name == "items":
+            values[name] = [
+                ExpenseItemSchema(name=item.name, price=item.price, quantity=item.quantity)
+                for item in expense.items
+            ]
+        elif name == "participants":
+            values[name] = [
+                ExpenseParticipantSchema(name=p.name, items=p.items or [])
+                for p in expense.participants
+            ]
+        else:
+            values[name] = getattr(expense, name)
+    return ExpenseResponse(**values)
+
 @router.post("", response_model=ExpenseResponse)
 async def create_expense(
     request: CreateExpenseRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Create a new expense
+
+    The expense row and each child table are written with one INSERT
+    apiece, so the number of round-trips does not grow with the number
+    of receipt lines. The response is built from the request data.
     """
-    # Create expense
-    expense = Expense(
-        user_id=current_user.id,
+    expense_id, created_at = (await db.execute(
+        insert(Expense)
+        .values(
+            user_id=current_user.id,
+            store_name=request.store_name,
+            total_amount=request.total_amount,
+            subtotal=request.subtotal,
+            tax_amount=request.tax_amount,
+            tax_rate=request.tax_rate,
+            raw_text=request.raw_text,
+            transcript=request.transcript
+        )
+        .returning(Expense.id, Expense.created_at)
+    )).one()
+    
+    # Create expense items (one multi-row INSERT)
+    if request.items:
+        await db.execute(insert(ExpenseItem).values([
+            {
+                "id": uuid_lib.uuid4(),
+                "expense_id": expense_id,
+                "name": item_data.name,
+                "price": item_data.price,
+                "quantity": item_data.quantity
+            }
+            for item_data in request.items
+        ]))
+    
+    # Create expense participants (one multi-row INSERT)
+    if request.participants:
+        await db.execute(insert(ExpenseParticipant).values([
+            {
+                "id": uuid_lib.uuid4(),
+                "expense_id": expense_id,
+                "name": participant_data.name,
+                "items": participant_data.items or None
+            }
+            for participant_data in request.participants
+        ]))
+    
+    await adjust_expense_totals(db, current_user.id, 1, request.total_amount)
+    await record_expenses(db, current_user.id, [(created_at, request)])
+    await record_items(db, current_user.id, [(created_at, request)])
+    await db.commit()
+    
+    return ExpenseResponse(
+        id=str(expense_id),
+        user_id=str(current_user.id),
         store_name=request.store_name,
         total_amount=request.total_amount,
         subtotal=request.subtotal,
         tax_amount=request.tax_amount,
         tax_rate=request.tax_rate,
         raw_text=request.raw_text,
-        transcript=request.transcript
+        transcript=request.transcript,
+        items=request.items,
+        participants=[
+            ExpenseParticipantSchema(name=p.name, items=p.items or [])
+            for p in request.participants
+        ],
+        created_at=created_at
+    )
+
+
+@router.post("/import")
+async def import_expenses(
+    request: Request,
+    format: Optional[str] = None,
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """
+    Bulk-import expenses from a streamed NDJSON or CSV body
+
+    The format comes from `format=ndjson|csv` or the Content-Type
+    (text/csv, otherwise NDJSON). Rows are validated like POST /expenses
+    (plus an optional `created_at`) and written in batches with COPY.
+    The response is an NDJSON stream of progress and per-row errors;
+    see expense_import.py for the formats.
+    """
+    fmt = (format or "").lower()
+    if not fmt:
+        fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be ndjson or csv"
+        )
+    
+    return ImportProgressResponse(
+        import_expenses_stream(current_user.id, request.stream(), fmt),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/export")
+async def export_expenses(
+    request: Request,
+    format: str = "ndjson",
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """
+    Download all of the user's expenses as NDJSON or CSV, oldest first
+
+    Rows are streamed from a server-side cursor. The body is
+    gzip-compressed when the client sends `Accept-Encoding: gzip`.
+    """
+    fmt = format.lower()
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be ndjson or csv"
+        )
+    
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {
+        "Content-Disposition": f'attachment; filename="expenses.{fmt}"',
+        "Vary": "Accept-Encoding"
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(
+        export_expenses_stream(current_user.id, fmt, compress=compress),
+        media_type=MEDIA_TYPES[fmt],
+        headers=headers
     )
-    db.add(expense)
-    db.flush()  # Get expense.id
-    
-    # Create expense items
-    for item_data in request.items:
-        item = ExpenseItem(
-            expense_id=expense.id,
-            name=item_data.name,
-            price=item_data.price,
-            quantity=item_data.quantity
+
+
+@router.get("/search", response_model=ExpenseListResponse, response_model_exclude_unset=True)
+async def search_expenses(
+    q: str,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
+):
+    """
+    Full-text search over store name, item names, transcript and OCR text
+
+    `q` uses web-search syntax ("quoted phrase", or, -exclude). Results
+    are ranked (store name > items > transcript > raw text), newest first
+    among equal ranks, and keyset-paginated with `next_cursor`.
+    Accepts the same `fields` / `include` parameters as GET /expenses.
+    """
+    selected = _select_fields(fields, include)
+    query_text = q.strip()
+    if not query_text:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search query is empty"
+        )
+    limit = min(max(limit, 1), 100)
+    
+    ts_query = func.websearch_to_tsquery("simple", query_text)
+    rank = func.ts_rank_cd(Expense.search_vector, ts_query)
+    query = (
+        select(Expense, rank)
+        .options(*_listing_options(selected))
+        .where(
+            Expense.user_id == current_user.id,
+            Expense.search_vector.op("@@")(ts_query)
         )
-        db.add(item)
-    
-    # Create expense participants
-    for participant_data in request.participants:
-        participant = ExpenseParticipant(
-            expense_id=expense.id,
-            name=participant_data.name,
-            items=json.dumps(participant_data.items) if participant_data.items else None
+        .order_by(rank.desc(), Expense.created_at.desc(), Expense.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        cursor_rank, cursor_created_at, cursor_id = decode_cursor(cursor, 3)
+        query = query.where(
+            tuple_(rank, Expense.created_at, Expense.id)
+            < tuple_(cursor_rank, cursor_created_at, cursor_id)
         )
-        db.add(participant)
     
-    db.commit()
-    db.refresh(expense)
+    rows = (await db.execute(query)).all()
     
-    # Fetch items and participants
-    items = db.query(ExpenseItem).filter(ExpenseItem.expense_id == expense.id).all()
-    participants = db.query(ExpenseParticipant).filter(ExpenseParticipant.expense_id == expense.id).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, last_rank = rows[-1]
+        next_cursor = encode_cursor(last_rank, last.created_at, last.id)
     
-    return ExpenseResponse(
-        id=str(expense.id),
-        user_id=str(expense.user_id),
-        store_name=expense.store_name,
-        total_amount=expense.total_amount,
-        subtotal=expense.subtotal,
-        tax_amount=expense.tax_amount,
-        tax_rate=expense.tax_rate,
-        raw_text=expense.raw_text,
-        transcript=expense.transcript,
-        items=[
-            ExpenseItemSchema(name=item.name, price=item.price, quantity=item.quantity)
-            for item in items
-        ],
-        participants=[
-            ExpenseParticipantSchema(
-                name=p.name,
-                items=json.loads(p.items) if p.items else []
-            )
-            for p in participants
-        ],
-        created_at=expense.created_at
+    return ExpenseListResponse(
+        expenses=[_to_response(expense, selected) for expense, _ in rows],
+        next_cursor=next_cursor
     )
 
 
-@router.get("", response_model=ExpenseListResponse)
+@router.get("", response_model=ExpenseListResponse, response_model_exclude_unset=True)
 async def get_expenses(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    item: Optional[str] = None,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
 ):
     """
-    Get user's expenses
+    Get user's expenses, newest first
+
+    Pass the returned `next_cursor` back as `cursor` to fetch the next page;
+    keyset pagination on (created_at, id) keeps every page equally cheap.
+    `offset` is still accepted for the first page of older clients.
+    The total count is only computed when `include_total=true`.
+    `item` keeps only expenses where a participant was assigned that item.
+    `raw_text` and `transcript` are omitted unless named in `include`
+    (or `fields`), and are then not even read from the database.
     """
-    # Get expenses
-    expenses = (
-        db.query(Expense)
-        .options(
-            selectinload(Expense.items),
-            selectinload(Expense.participants)
-        )
-        .filter(Expense.user_id == current_user.id)
-        .order_by(Expense.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-        .all()
+    selected = _select_fields(fields, include)
+    query = (
+        select(Expense)
+        .options(*_listing_options(selected))
+        .where(Expense.user_id == current_user.id)
+        .order_by(Expense.created_at.desc(), Expense.id.desc())
+        .limit(limit + 1)
     )
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor, 2)
+        query = query.where(
+            tuple_(Expense.created_at, Expense.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    elif offset:
+        query = query.offset(offset)
+    if item:
+        # JSONB containment, served by the GIN index on participant items
+        query = query.where(Expense.participants.any(ExpenseParticipant.items.contains([item])))
     
-    total = db.query(Expense).filter(Expense.user_id == current_user.id).count()
-    
-    expense_responses = []
-    for expense in expenses:
-        expense_responses.append(ExpenseResponse(
-            id=str(expense.id),
-            user_id=str(expense.user_id),
-            store_name=expense.store_name,
-            total_amount=expense.total_amount,
-            subtotal=expense.subtotal,
-            tax_amount=expense.tax_amount,
-            tax_rate=expense.tax_rate,
-            raw_text=expense.raw_text,
-            transcript=expense.transcript,
-            items=[
-                ExpenseItemSchema(name=item.name, price=item.price, quantity=item.quantity)
-                for item in expense.items
-            ],
-            participants=[
-                ExpenseParticipantSchema(
-                    name=p.name,
-                    items=json.loads(p.items) if p.items else []
-                )
-                for p in expense.participants
-            ],
-            created_at=expense.created_at
-        ))
+    expenses = (await db.scalars(query)).all()
+    
+    next_cursor = None
+    if len(expenses) > limit:
+        expenses = expenses[:limit]
+        last = expenses[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    
+    total = None
+    if include_total:
+        # Maintained count instead of a COUNT(*) over the user's expenses
+        total = await db.scalar(
+            select(UserExpenseSummary.expense_count).where(UserExpenseSummary.user_id == current_user.id)
+        ) or 0
+    
+    expense_responses = [_to_response(expense, selected) for expense in expenses]
+    
+    return ExpenseListResponse(expenses=expense_responses, total=total, next_cursor=next_cursor)
+
+
+@router.get("/summary", response_model=ExpenseSummaryResponse)
+async def get_expense_summary(
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Dashboard totals for the current user, read from user_expense_summary
+    """
+    summary = await db.get(UserExpenseSummary, current_user.id)
+    if not summary:
+        return ExpenseSummaryResponse()
+    
+    month_to_date_total = summary.month_to_date_total
+    if summary.month_start != current_month_start():
+        # No expense written since the month rolled over
+        month_to_date_total = 0
     
-    return ExpenseListResponse(expenses=expense_responses, total=total)
+    return ExpenseSummaryResponse(
+        expense_count=summary.expense_count,
+        lifetime_total=summary.lifetime_total,
+        month_to_date_total=month_to_date_total,
+        owed_to_user=summary.owed_to_user,
+        user_owes=summary.user_owes,
+        updated_at=summary.updated_at
+    )
 
 
 @router.delete("/{expense_id}", response_model=MessageResponse)
 async def delete_expense(
     expense_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Delete an expense
@@ -167,10 +407,14 @@ async def delete_expense(
         )
     
     # Find expense and verify ownership
-    expense = db.query(Expense).filter(
-        Expense.id == expense_uuid,
-        Expense.user_id == current_user.id
-    ).first()
+    expense = await db.scalar(
+        select(Expense)
+        .options(selectinload(Expense.splits), selectinload(Expense.items))
+        .where(
+            Expense.id == expense_uuid,
+            Expense.user_id == current_user.id
+        )
+    )
     
     if not expense:
         raise HTTPException(
@@ -178,72 +422,56 @@ async def delete_expense(
             detail="Expense not found"
         )
     
+    # Take the expense and its splits out of the summaries and rollups
+    await adjust_expense_totals(db, current_user.id, -1, -expense.total_amount, expense.created_at)
+    await adjust_split_balances(db, current_user, expense.splits, sign=-1)
+    await apply_split_balances(db, current_user, expense.splits, sign=-1)
+    await record_expenses(db, current_user.id, [(expense.created_at, expense)], sign=-1)
+    await record_splits(db, current_user.id, expense.created_at, expense.splits, sign=-1)
+    
     # Delete expense (cascade will delete items and participants)
-    db.delete(expense)
-    db.commit()
+    await db.delete(expense)
+    await db.commit()
     
     return MessageResponse(message="Expense deleted successfully")
 
 
-@router.get("/shared-with-me", response_model=ExpenseListResponse)
+@router.get("/shared-with-me", response_model=ExpenseListResponse, response_model_exclude_unset=True)
 async def get_shared_expenses(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
 ):
     """
     Get expenses where user is a participant (not creator)
     Shows bills that others have split with this user
+    Accepts the same `fields` / `include` parameters as GET /expenses.
     """
+    selected = _select_fields(fields, include)
     # Find all expense splits where this user is a participant
-    splits = db.query(ExpenseSplit).filter(
-        ExpenseSplit.participant_email == current_user.email
-    ).order_by(ExpenseSplit.created_at.desc()).limit(limit).offset(offset).all()
+    splits = (await db.scalars(
+        select(ExpenseSplit).where(
+            ExpenseSplit.participant_email == current_user.email
+        ).order_by(ExpenseSplit.created_at.desc()).limit(limit).offset(offset)
+    )).all()
     
     # Get unique expense IDs
     expense_ids = list(set([split.expense_id for split in splits]))
     
     # Get expenses (but not created by this user)
-    expenses = (
-        db.query(Expense)
-        .options(
-            selectinload(Expense.items),
-            selectinload(Expense.participants)
-        )
-        .filter(
+    expenses = (await db.scalars(
+        select(Expense)
+        .options(*_listing_options(selected))
+        .where(
             Expense.id.in_(expense_ids),
             Expense.user_id != current_user.id
         )
-        .all()
-    )
+    )).all()
     
-    expense_responses = []
-    for expense in expenses:
-        # use expense.items and expense.participants 
-        expense_responses.append(ExpenseResponse(
-            id=str(expense.id),
-            user_id=str(expense.user_id),
-            store_name=expense.store_name,
-            total_amount=expense.total_amount,
-            subtotal=expense.subtotal,
-            tax_amount=expense.tax_amount,
-            tax_rate=expense.tax_rate,
-            raw_text=expense.raw_text,
-            transcript=expense.transcript,
-            items=[
-                ExpenseItemSchema(name=item.name, price=item.price, quantity=item.quantity)
-                for item in expense.items
-            ],
-            participants=[
-                ExpenseParticipantSchema(
-                    name=p.name,
-                    items=json.loads(p.items) if p.items else []
-                )
-                for p in expense.participants
-            ],
-            created_at=expense.created_at
-        ))
+    expense_responses = [_to_response(expense, selected) for expense in expenses]
     
     return ExpenseListResponse(expenses=expense_responses, total=len(expense_responses))
 
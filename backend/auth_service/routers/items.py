@@ -0,0 +1,49 @@
+"""
+Item Catalog Routes
+
+Autocomplete over the items a user has bought before, read from the
+item_catalog table maintained by item_catalog.py.
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from decimal import Decimal
+from typing import Optional
+
+from dependencies import get_db, get_current_user
+from user_cache import UserSnapshot
+from item_catalog import suggest_items
+from item_schemas import ItemSuggestion, ItemSuggestResponse
+
+router = APIRouter()
+
+CENT = Decimal("0.01")
+
+
+@router.get("/suggest", response_model=ItemSuggestResponse)
+async def suggest(
+    q: str = Query("", max_length=255),
+    store: Optional[str] = Query(None, max_length=255),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Suggest item names for `q` (prefix and typo-tolerant matches).
+    With `store`, only items bought at that store are considered and the
+    prices are that store's.
+    """
+    rows = await suggest_items(db, current_user.id, q, store, limit)
+    return ItemSuggestResponse(
+        query=q,
+        store_name=store,
+        suggestions=[
+            ItemSuggestion(
+                name=entry.item_label,
+                times_bought=entry.times_bought,
+                last_price=entry.last_price,
+                median_price=Decimal(median).quantize(CENT) if median is not None else None,
+                last_seen_at=entry.last_seen_at,
+            )
+            for entry, median in rows
+        ]
+    )
@@ -1,37 +1,83 @@
 """
 Expense Split Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, Optional
 import uuid as uuid_lib
-import json
-from datetime import datetime
 from decimal import Decimal
 
-from dependencies import get_db, get_current_user, SessionLocal
-from models import User, Expense, ExpenseSplit
+from dependencies import get_db, get_current_user
+from user_cache import UserSnapshot
+from models import User, Expense, ExpenseSplit, Contact
 from split_schemas import (
+    CalculateSplitRequest,
+    CalculateSplitResponse,
     CreateExpenseSplitRequest,
     ExpenseSplitResponse,
     ExpenseSplitListResponse,
     SendBillRequest,
-    SendBillResponse
+    SendBillResponse,
+    SplitPolicy,
+    SplitShare,
+    UpdateSplitRequest
 )
 from schemas import MessageResponse
-from email_service import send_split_bill_email
+from email_outbox import enqueue, split_bill_message
+from expense_summary import adjust_split_balances
+from balance_engine import apply_split_balances
+from analytics_rollups import record_splits
+from split_engine import SplitResult, calculate, from_cents
 
 router = APIRouter()
 
-@router.post("/{expense_id}/splits", response_model=MessageResponse)
-async def create_expense_splits(
-    expense_id: str,
-    request: CreateExpenseSplitRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Create expense splits for an expense
-    """
+def _calculate(participants, items, policy, default_tax=None) -> SplitResult:
+    """Run the split engine, turning bad input into a 400"""
+    policy = policy or SplitPolicy()
+    tax_amount = policy.tax_amount if policy.tax_amount is not None else default_tax
+    try:
+        return calculate(
+            [(item.name, item.price, item.quantity) for item in items],
+            [participant.item_indexes or [] for participant in participants],
+            tax_amount=tax_amount or Decimal(0),
+            tip_amount=policy.tip_amount,
+            tip_percent=policy.tip_percent,
+            tax_split=policy.tax_split,
+            tip_split=policy.tip_split
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+def _contact_uuid(contact_id: Optional[str]) -> Optional[uuid_lib.UUID]:
+    try:
+        return uuid_lib.UUID(contact_id) if contact_id else None
+    except (ValueError, TypeError):
+        return None
+
+
+async def _contact_emails(
+    db: AsyncSession,
+    owner_id: uuid_lib.UUID,
+    contact_ids: Iterable[uuid_lib.UUID]
+) -> Dict[uuid_lib.UUID, str]:
+    """Emails of the owner's contacts, in one joined query"""
+    contact_ids = {contact_id for contact_id in contact_ids if contact_id}
+    if not contact_ids:
+        return {}
+    rows = await db.execute(
+        select(Contact.id, User.email)
+        .join(User, User.id == Contact.friend_user_id)
+        .where(Contact.id.in_(contact_ids), Contact.user_id == owner_id)
+    )
+    return {contact_id: email for contact_id, email in rows}
+
+
+async def _owned_expense(db: AsyncSession, expense_id: str, owner_id: uuid_lib.UUID) -> Expense:
     try:
         expense_uuid = uuid_lib.UUID(expense_id)
     except (ValueError, TypeError):
@@ -40,50 +86,137 @@ async def create_expense_splits(
             detail="Invalid ID format"
         )
     
-    # Verify expense ownership
-    expense = db.query(Expense).filter(
+    expense = await db.scalar(select(Expense).where(
         Expense.id == expense_uuid,
-        Expense.user_id == current_user.id
-    ).first()
+        Expense.user_id == owner_id
+    ))
     
     if not expense:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Expense not found"
         )
+    return expense
+
+
+def _calculate_response(request: CalculateSplitRequest, result: SplitResult) -> CalculateSplitResponse:
+    return CalculateSplitResponse(
+        shares=[
+            SplitShare(
+                participant_name=participant.name,
+                item_amount=from_cents(share.item_cents),
+                tax_amount=from_cents(share.tax_cents),
+                tip_amount=from_cents(share.tip_cents),
+                amount_owed=from_cents(share.total_cents),
+                items_detail=share.items
+            )
+            for participant, share in zip(request.participants, result.shares)
+        ],
+        items_total=from_cents(result.items_cents),
+        tax_amount=from_cents(result.tax_cents),
+        tip_amount=from_cents(result.tip_cents),
+        unassigned_amount=from_cents(result.unassigned_cents)
+    )
+
+
+@router.post("/splits/calculate", response_model=CalculateSplitResponse)
+async def calculate_splits(
+    request: CalculateSplitRequest,
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """
+    Preview shares before the expense is saved; tax comes from the policy
+    only. Nothing is saved.
+    """
+    result = _calculate(request.participants, request.items, request.policy)
+    return _calculate_response(request, result)
+
+
+@router.post("/{expense_id}/splits/calculate", response_model=CalculateSplitResponse)
+async def calculate_expense_splits(
+    expense_id: str,
+    request: CalculateSplitRequest,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Preview each participant's share for item assignments and a tax/tip
+    policy (see split_engine.py); nothing is saved
+    """
+    expense = await _owned_expense(db, expense_id, current_user.id)
+    result = _calculate(request.participants, request.items, request.policy, expense.tax_amount)
+    return _calculate_response(request, result)
+
+
+@router.post("/{expense_id}/splits", response_model=MessageResponse)
+async def create_expense_splits(
+    expense_id: str,
+    request: CreateExpenseSplitRequest,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create expense splits for an expense
+    When the request has items, amounts are computed by the split engine
+    instead of taken from amount_owed. Only billed participants get a split.
+    Contact emails are resolved in one query and all splits are written
+    with one INSERT.
+    """
+    expense = await _owned_expense(db, expense_id, current_user.id)
     
-    # Create splits
-    for participant in request.participants:
-        # If contact_id provided, get email
-        participant_email = participant.email
-        contact_id = None
-        
-        if participant.contact_id:
-            try:
-                contact_uuid = uuid_lib.UUID(participant.contact_id)
-                contact = db.query(Contact).filter(
-                    Contact.id == contact_uuid,
-                    Contact.user_id == current_user.id
-                ).first()
-                if contact:
-                    friend = db.query(User).filter(User.id == contact.friend_user_id).first()
-                    if friend:
-                        participant_email = friend.email
-                        contact_id = contact_uuid
-            except (ValueError, TypeError):
-                pass
-        
-        split = ExpenseSplit(
-            expense_id=expense_uuid,
-            participant_name=participant.name,
-            participant_email=participant_email,
-            contact_id=contact_id,
-            amount_owed=Decimal(str(participant.amount_owed)),
-            items_detail=json.dumps(participant.items_detail) if participant.items_detail else None
+    if request.items is not None:
+        result = _calculate(request.participants, request.items, request.policy, expense.tax_amount)
+        amounts = [from_cents(share.total_cents) for share in result.shares]
+        details = [
+            participant.items_detail or share.items
+            for participant, share in zip(request.participants, result.shares)
+        ]
+    elif any(
+        participant.billed and participant.amount_owed is None
+        for participant in request.participants
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="amount_owed is required for every participant unless items are given"
         )
-        db.add(split)
+    else:
+        amounts = [
+            Decimal(str(participant.amount_owed)) if participant.billed else None
+            for participant in request.participants
+        ]
+        details = [participant.items_detail for participant in request.participants]
     
-    db.commit()
+    billed = [
+        (participant, amount, items_detail)
+        for participant, amount, items_detail in zip(request.participants, amounts, details)
+        if participant.billed
+    ]
+    contact_ids = [_contact_uuid(participant.contact_id) for participant, _, _ in billed]
+    emails = await _contact_emails(db, current_user.id, contact_ids)
+    
+    rows = []
+    for (participant, amount, items_detail), contact_id in zip(billed, contact_ids):
+        # A contact's account email wins over the one typed in
+        email = emails.get(contact_id)
+        rows.append({
+            "id": uuid_lib.uuid4(),
+            "expense_id": expense.id,
+            "participant_name": participant.name,
+            "participant_email": email or participant.email,
+            "contact_id": contact_id if email else None,
+            "amount_owed": amount,
+            "items_detail": items_detail or None,
+            "is_paid": False
+        })
+    
+    if rows:
+        await db.execute(insert(ExpenseSplit).values(rows))
+        # Transient copies for the summary / balance / rollup hooks
+        new_splits = [ExpenseSplit(**row) for row in rows]
+        await adjust_split_balances(db, current_user, new_splits)
+        await apply_split_balances(db, current_user, new_splits)
+        await record_splits(db, current_user.id, expense.created_at, new_splits)
+    await db.commit()
     
     return MessageResponse(message="Expense splits created successfully")
 
@@ -91,11 +224,13 @@ async def create_expense_splits(
 @router.get("/{expense_id}/splits", response_model=ExpenseSplitListResponse)
 async def get_expense_splits(
     expense_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    item: Optional[str] = None
 ):
     """
     Get expense splits for an expense
+    `item` keeps only the participants who were assigned that item.
     """
     try:
         expense_uuid = uuid_lib.UUID(expense_id)
@@ -106,10 +241,10 @@ async def get_expense_splits(
         )
     
     # Verify expense ownership
-    expense = db.query(Expense).filter(
+    expense = await db.scalar(select(Expense).where(
         Expense.id == expense_uuid,
         Expense.user_id == current_user.id
-    ).first()
+    ))
     
     if not expense:
         raise HTTPException(
@@ -118,7 +253,11 @@ async def get_expense_splits(
         )
     
     # Get splits
-    splits = db.query(ExpenseSplit).filter(ExpenseSplit.expense_id == expense_uuid).all()
+    query = select(ExpenseSplit).where(ExpenseSplit.expense_id == expense_uuid)
+    if item:
+        # JSONB containment, served by the GIN index on items_detail
+        query = query.where(ExpenseSplit.items_detail.contains([item]))
+    splits = (await db.scalars(query)).all()
     
     split_responses = []
     for split in splits:
@@ -139,81 +278,85 @@ async def get_expense_splits(
     return ExpenseSplitListResponse(splits=split_responses, total=len(split_responses))
 
 
-async def process_bill_sending_task(
-    expense_uuid: uuid_lib.UUID,
-    participant_ids: list[str],
-    payer_email: str,
-    payer_name: str
+@router.patch("/{expense_id}/splits/{split_id}", response_model=ExpenseSplitResponse)
+async def update_expense_split(
+    expense_id: str,
+    split_id: str,
+    request: UpdateSplitRequest,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Background task to send bill emails
+    Mark a split as paid (or unpaid again)
+    Only the expense owner can change it; balances and the dashboard
+    summary are updated in the same transaction.
     """
-    db = SessionLocal()
     try:
-        # Fetch expense data (need fresh query as session is new)
-        expense = db.query(Expense).filter(Expense.id == expense_uuid).first()
-        if not expense:
-            print(f"Expense {expense_uuid} not found in background task")
-            return
-
-        expense_data = {
-            'store_name': expense.store_name or "Unknown",
-            'total': expense.total_amount,
-            'date': expense.created_at.strftime("%B %d, %Y") if expense.created_at else "Recent"
-        }
-
-        for split_id_str in participant_ids:
-            try:
-                split_id = uuid_lib.UUID(split_id_str)
-                split = db.query(ExpenseSplit).filter(
-                    ExpenseSplit.id == split_id,
-                    ExpenseSplit.expense_id == expense_uuid
-                ).first()
-                
-                if not split or not split.participant_email:
-                    continue
-                
-                # Prepare split data
-                items_detail = json.loads(split.items_detail) if split.items_detail else []
-                split_data = {
-                    'amount_owed': split.amount_owed,
-                    'items_detail': items_detail
-                }
-                
-                # Send email
-                success = await send_split_bill_email(
-                    to_email=split.participant_email,
-                    to_name=split.participant_name,
-                    payer_name=payer_name,
-                    expense_data=expense_data,
-                    split_data=split_data
-                )
-                
-                if success:
-                    # Update split record
-                    split.email_sent = True
-                    split.email_sent_at = datetime.utcnow()
-                    db.commit()
-                    
-            except Exception as e:
-                print(f"Error sending email to participant {split_id_str}: {e}")
-                
-    except Exception as e:
-        print(f"Error in background bill sending task: {e}")
-    finally:
-        db.close()
+        expense_uuid = uuid_lib.UUID(expense_id)
+        split_uuid = uuid_lib.UUID(split_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
+    
+    # Verify expense ownership and find the split in one query
+    split = await db.scalar(
+        select(ExpenseSplit)
+        .join(Expense, Expense.id == ExpenseSplit.expense_id)
+        .where(
+            ExpenseSplit.id == split_uuid,
+            ExpenseSplit.expense_id == expense_uuid,
+            Expense.user_id == current_user.id
+        )
+        .with_for_update(of=ExpenseSplit)
+    )
+    
+    if not split:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Split not found"
+        )
+    
+    if split.is_paid != request.is_paid:
+        # Only unpaid splits count, so settle before flipping the flag
+        # and re-open after flipping it back
+        if request.is_paid:
+            await adjust_split_balances(db, current_user, [split], sign=-1)
+            await apply_split_balances(db, current_user, [split], sign=-1)
+            split.is_paid = True
+        else:
+            split.is_paid = False
+            await adjust_split_balances(db, current_user, [split])
+            await apply_split_balances(db, current_user, [split])
+        await db.commit()
+    
+    return ExpenseSplitResponse(
+        id=str(split.id),
+        expense_id=str(split.expense_id),
+        participant_name=split.participant_name,
+        participant_email=split.participant_email,
+        contact_id=str(split.contact_id) if split.contact_id else None,
+        amount_owed=split.amount_owed,
+        items_detail=split.items_detail,
+        is_paid=split.is_paid,
+        email_sent=split.email_sent,
+        email_sent_at=split.email_sent_at,
+        created_at=split.created_at
+    )
 
 
 @router.post("/{expense_id}/send-bills", response_model=SendBillResponse)
 async def send_bills_to_participants(
     expense_id: str,
     request: SendBillRequest,
-    background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Send bill emails to selected participants
+    The emails are queued in email_outbox and sent by outbox_worker.py;
+    the response says, per requested split, whether it was queued or why not.
     """
     try:
         expense_uuid = uuid_lib.UUID(expense_id)
@@ -224,10 +367,10 @@ async def send_bills_to_participants(
         )
     
     # Verify expense ownership
-    expense = db.query(Expense).filter(
+    expense = await db.scalar(select(Expense).where(
         Expense.id == expense_uuid,
         Expense.user_id == current_user.id
-    ).first()
+    ))
     
     if not expense:
         raise HTTPException(
@@ -236,27 +379,58 @@ async def send_bills_to_participants(
         )
     
     # Get payer (user) info
-    payer = current_user
-    payer_name = payer.email.split('@')[0] if payer else "Your friend"
+    payer_name = current_user.email.split('@')[0]
     
-    # Add to background tasks
-    background_tasks.add_task(
-        process_bill_sending_task,
-        expense_uuid,
-        request.participant_ids,
-        current_user.email,
-        payer_name
-    )
+    # Every requested split in one query
+    split_ids = {}
+    for participant_id in request.participant_ids:
+        try:
+            split_ids[participant_id] = uuid_lib.UUID(participant_id)
+        except (ValueError, TypeError):
+            pass
+    splits_by_id = {}
+    if split_ids:
+        splits_by_id = {
+            split.id: split
+            for split in (await db.scalars(select(ExpenseSplit).where(
+                ExpenseSplit.expense_id == expense_uuid,
+                ExpenseSplit.id.in_(split_ids.values())
+            ))).all()
+        }
     
-    # Return immediate response
+    results = []
+    messages = []
+    for participant_id in dict.fromkeys(request.participant_ids):
+        split = splits_by_id.get(split_ids.get(participant_id))
+        result = {
+            "participant_id": participant_id,
+            "participant_name": split.participant_name if split else None,
+            "status": "failed"
+        }
+        if not split:
+            result["message"] = "Split not found"
+        elif not split.participant_email:
+            result["message"] = "Participant has no email address"
+        else:
+            messages.append((result, split_bill_message(split, payer_name, expense)))
+        results.append(result)
+    
+    # Queue in this transaction; outbox_worker.py does the sending. A split
+    # that already has a pending email is skipped by enqueue(), which
+    # also covers concurrent calls for the same split.
+    queued_ids = set(await enqueue(db, [message for _, message in messages]))
+    await db.commit()
+    
+    for result, message in messages:
+        result["status"] = "queued"
+        if message["id"] in queued_ids:
+            result["message"] = f"Email to {message['recipient']} queued"
+        else:
+            result["message"] = "Email already queued"
+    
+    queued = sum(1 for result in results if result["status"] == "queued")
     return SendBillResponse(
-        sent_count=0,
-        failed_count=0,
-        results=[{
-            "participant_id": "all",
-            "participant_name": "all",
-            "status": "queued",
-            "message": "Emails are being sent in the background"
-        }]
+        sent_count=queued,
+        failed_count=len(results) - queued,
+        results=results
     )
-
@@ -0,0 +1,152 @@
+"""
+Split calculator
+
+Turns item assignments plus a tax/tip policy into exact per-participant
+shares. All arithmetic is done in integer cents, so the shares always add
+up to the amounts being split:
+
+- each item (price x quantity) is divided evenly among the participants
+  assigned to it
+- tax and tip are either divided in proportion to each participant's item
+  subtotal ("proportional") or evenly ("equal")
+
+Whenever an amount does not divide exactly, every share is rounded down and
+the leftover cents go one each to the largest remainders; equal remainders
+are broken by participant order, so the same input always gives the same
+shares.
+
+In proportional mode, items nobody is assigned to (typically the payer's
+own) keep their part of the tax and tip, which is then not charged to
+anyone.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Optional, Sequence, Tuple
+
+CENT = Decimal("0.01")
+
+PROPORTIONAL = "proportional"
+EQUAL = "equal"
+SPLIT_MODES = (PROPORTIONAL, EQUAL)
+
+
+def to_cents(amount) -> int:
+    return int(Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(CENT)
+
+
+def allocate(total: int, weights: Sequence[int]) -> List[int]:
+    """
+    Divide total cents in proportion to weights (negative weights count as
+    zero; all-zero weights divide evenly) with largest-remainder rounding
+    """
+    if not weights:
+        return []
+    weights = [max(weight, 0) for weight in weights]
+    if not any(weights):
+        weights = [1] * len(weights)
+    weight_sum = sum(weights)
+    shares, remainders = [], []
+    for weight in weights:
+        share, remainder = divmod(total * weight, weight_sum)
+        shares.append(share)
+        remainders.append(remainder)
+    leftover = total - sum(shares)
+    for index in sorted(range(len(weights)), key=lambda i: (-remainders[i], i))[:leftover]:
+        shares[index] += 1
+    return shares
+
+
+@dataclass
+class Share:
+    item_cents: int = 0
+    tax_cents: int = 0
+    tip_cents: int = 0
+    items: List[str] = field(default_factory=list)  # Names of the items shared
+
+    @property
+    def total_cents(self) -> int:
+        return self.item_cents + self.tax_cents + self.tip_cents
+
+
+@dataclass
+class SplitResult:
+    shares: List[Share]  # In participant order
+    items_cents: int
+    tax_cents: int
+    tip_cents: int
+    unassigned_cents: int  # Item cost nobody was assigned to
+
+
+def calculate(
+    items: Sequence[Tuple[str, Decimal, Decimal]],
+    assignments: Sequence[Sequence[int]],
+    tax_amount: Decimal = Decimal(0),
+    tip_amount: Optional[Decimal] = None,
+    tip_percent: Optional[Decimal] = None,
+    tax_split: str = PROPORTIONAL,
+    tip_split: str = PROPORTIONAL
+) -> SplitResult:
+    """
+    Compute the shares
+
+    items: (name, price, quantity) per receipt line
+    assignments: per participant, the indexes of the items they share
+    tip_percent: percent of the items total; ignored when tip_amount is set
+
+    Raises ValueError for an unknown split mode or an item index out of range.
+    """
+    for mode in (tax_split, tip_split):
+        if mode not in SPLIT_MODES:
+            raise ValueError(f"Unknown split mode {mode!r} (expected {' or '.join(SPLIT_MODES)})")
+
+    assignees: List[List[int]] = [[] for _ in items]
+    for participant, indexes in enumerate(assignments):
+        for index in dict.fromkeys(indexes):
+            if not 0 <= index < len(items):
+                raise ValueError(f"Item index {index} is out of range")
+            assignees[index].append(participant)
+
+    shares = [Share() for _ in assignments]
+    item_costs = [to_cents(Decimal(price) * Decimal(quantity)) for _, price, quantity in items]
+    unassigned = 0
+    for (name, _, _), cost, sharing in zip(items, item_costs, assignees):
+        if not sharing:
+            unassigned += cost
+            continue
+        for participant, cents in zip(sharing, allocate(cost, [1] * len(sharing))):
+            shares[participant].item_cents += cents
+            shares[participant].items.append(name)
+
+    items_cents = sum(item_costs)
+    tax_cents = to_cents(tax_amount or 0)
+    if tip_amount is not None:
+        tip_cents = to_cents(tip_amount)
+    elif tip_percent is not None:
+        tip_cents = to_cents(Decimal(items_cents) * Decimal(tip_percent) / 10000)
+    else:
+        tip_cents = 0
+
+    def spread(total: int, mode: str) -> List[int]:
+        if mode == EQUAL or not items_cents:
+            return allocate(total, [1] * len(shares))
+        # The unassigned bucket takes its part and is dropped
+        weights = [share.item_cents for share in shares] + [unassigned]
+        return allocate(total, weights)[:len(shares)]
+
+    if shares:
+        for share, cents in zip(shares, spread(tax_cents, tax_split)):
+            share.tax_cents = cents
+        for share, cents in zip(shares, spread(tip_cents, tip_split)):
+            share.tip_cents = cents
+
+    return SplitResult(
+        shares=shares,
+        items_cents=items_cents,
+        tax_cents=tax_cents,
+        tip_cents=tip_cents,
+        unassigned_cents=unassigned
+    )
@@ -2,7 +2,7 @@
 Pydantic schemas for expense split management
 """
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 from decimal import Decimal
 
@@ -12,14 +12,64 @@ class SplitParticipant(BaseModel):
     name: str
     email: Optional[EmailStr] = None
     contact_id: Optional[str] = None
-    amount_owed: Decimal
+    amount_owed: Optional[Decimal] = None  # Required unless the request has items
     items_detail: Optional[List[str]] = None  # List of item names
+    item_indexes: Optional[List[int]] = None  # Positions in the request's items
+    billed: bool = True  # False: shares items, tax and tip but gets no split (e.g. the payer)
+
+
+class SplitItem(BaseModel):
+    """Receipt line to be split"""
+    name: str
+    price: Decimal
+    quantity: Decimal = Decimal(1)
+
+
+class SplitPolicy(BaseModel):
+    """How tax and tip are shared (see split_engine.py)"""
+    tax_amount: Optional[Decimal] = None  # Defaults to the expense's tax_amount, if any
+    tip_amount: Optional[Decimal] = None
+    tip_percent: Optional[Decimal] = None  # Of the items total, if tip_amount is not set
+    tax_split: Literal["proportional", "equal"] = "proportional"
+    tip_split: Literal["proportional", "equal"] = "proportional"
 
 
 class CreateExpenseSplitRequest(BaseModel):
-    """Request to create expense splits"""
+    """
+    Request to create expense splits
+    With items, amount_owed is computed on the server from each
+    participant's item_indexes and the policy.
+    """
     expense_id: str
     participants: List[SplitParticipant]
+    items: Optional[List[SplitItem]] = None
+    policy: Optional[SplitPolicy] = None
+
+
+class CalculateSplitRequest(BaseModel):
+    """Request to preview the shares for item assignments"""
+    participants: List[SplitParticipant]
+    items: List[SplitItem]
+    policy: Optional[SplitPolicy] = None
+
+
+class SplitShare(BaseModel):
+    """One participant's computed share"""
+    participant_name: str
+    item_amount: Decimal
+    tax_amount: Decimal
+    tip_amount: Decimal
+    amount_owed: Decimal
+    items_detail: List[str]
+
+
+class CalculateSplitResponse(BaseModel):
+    """Computed shares; unassigned_amount is item cost nobody was assigned to"""
+    shares: List[SplitShare]
+    items_total: Decimal
+    tax_amount: Decimal
+    tip_amount: Decimal
+    unassigned_amount: Decimal
 
 
 class ExpenseSplitResponse(BaseModel):
@@ -30,7 +80,7 @@ class ExpenseSplitResponse(BaseModel):
     participant_email: Optional[str]
     contact_id: Optional[str]
     amount_owed: Decimal
-    items_detail: Optional[str]
+    items_detail: Optional[List[str]]
     is_paid: bool
     email_sent: bool
     email_sent_at: Optional[datetime]
@@ -46,6 +96,11 @@ class ExpenseSplitListResponse(BaseModel):
     total: int
 
 
+class UpdateSplitRequest(BaseModel):
+    """Request to mark a split as paid or unpaid"""
+    is_paid: bool
+
+
 class SendBillRequest(BaseModel):
     """Request to send bills to selected participants"""
     expense_id: str
@@ -54,9 +109,9 @@ class SendBillRequest(BaseModel):
 
 class SendBillResponse(BaseModel):
     """Response after sending bills"""
-    sent_count: int
-    failed_count: int
-    results: List[dict]  # List of {participant_id, participant_name, status, message}
+    sent_count: int  # Queued for delivery (see email_sent on the split for the outcome)
+    failed_count: int  # Not queued: unknown split or no email address
+    results: List[dict]  # List of {participant_id, participant_name, status: queued/failed, message}
 
 
 
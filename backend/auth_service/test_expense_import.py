@@ -0,0 +1,125 @@
+"""
+Tests for the batched expense import (expense_import.py)
+
+Needs the Postgres database from DATABASE_URL (.env) with migrations
+applied; skipped when it is unreachable (see conftest.py). A throwaway
+user is created and removed by each test:
+
+    python -m pytest test_expense_import.py
+"""
+import asyncio
+import json
+import uuid as uuid_lib
+
+from sqlalchemy import delete, func, insert, select
+
+import expense_import
+from database import AsyncSessionLocal, engine
+from models import Expense, ExpenseItem, User, UserExpenseSummary
+
+BATCH_SIZE = 5
+
+
+async def _create_user() -> uuid_lib.UUID:
+    async with AsyncSessionLocal() as db:
+        user_id = await db.scalar(
+            insert(User)
+            .values(email=f"import-{uuid_lib.uuid4().hex[:12]}@smartbill.test", password_hash="x")
+            .returning(User.id)
+        )
+        await db.commit()
+    return user_id
+
+
+async def _remove_user(user_id: uuid_lib.UUID):
+    async with AsyncSessionLocal() as db:
+        # Summary, rollup and catalog rows go with the user (ON DELETE CASCADE)
+        await db.execute(delete(Expense).where(Expense.user_id == user_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+
+async def _body(count: int):
+    for i in range(count):
+        row = {
+            "store_name": "Import Test",
+            "total_amount": "10.00",
+            "items": [{"name": f"Item {i}", "price": "10.00"}],
+            "participants": [{"name": "Alice", "items": [f"Item {i}"]}],
+        }
+        yield (json.dumps(row) + "\n").encode()
+
+
+async def _run_import(user_id: uuid_lib.UUID, count: int) -> list:
+    events = []
+    async for line in expense_import.import_expenses_stream(
+        user_id, _body(count), "ndjson", batch_size=BATCH_SIZE
+    ):
+        events.append(json.loads(line))
+    return events
+
+
+async def _counts(user_id: uuid_lib.UUID):
+    async with AsyncSessionLocal() as db:
+        expenses = await db.scalar(
+            select(func.count()).select_from(Expense).where(Expense.user_id == user_id)
+        )
+        items = await db.scalar(
+            select(func.count()).select_from(ExpenseItem)
+            .join(Expense, Expense.id == ExpenseItem.expense_id)
+            .where(Expense.user_id == user_id)
+        )
+        summary_count = await db.scalar(
+            select(UserExpenseSummary.expense_count).where(UserExpenseSummary.user_id == user_id)
+        )
+    return expenses, items, summary_count or 0
+
+
+async def _imports_batches():
+    user_id = await _create_user()
+    try:
+        events = await _run_import(user_id, BATCH_SIZE * 2)
+        assert events[-1]["imported"] == BATCH_SIZE * 2, events[-1]
+        assert await _counts(user_id) == (BATCH_SIZE * 2, BATCH_SIZE * 2, BATCH_SIZE * 2)
+    finally:
+        await _remove_user(user_id)
+
+
+async def _failed_batch_leaves_no_rows():
+    user_id = await _create_user()
+    try:
+        events = await _run_import(user_id, BATCH_SIZE * 2)
+        done = events[-1]
+        assert done["imported"] == BATCH_SIZE and done["failed"] == BATCH_SIZE, done
+        assert any(event["event"] == "error" for event in events)
+        # Only the first batch is left: expenses, their items and the summary
+        assert await _counts(user_id) == (BATCH_SIZE, BATCH_SIZE, BATCH_SIZE)
+    finally:
+        await _remove_user(user_id)
+
+
+async def _run(test):
+    try:
+        await test()
+    finally:
+        await engine.dispose()
+
+
+def test_imports_batches(database):
+    asyncio.run(_run(_imports_batches))
+
+
+def test_failed_batch_leaves_no_rows(database, monkeypatch):
+    record_items = expense_import.record_items
+    calls = 0
+
+    async def fail_second_batch(db, user_id, rows):
+        # Fails after the batch's COPYs and summary upserts have run
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("forced failure")
+        await record_items(db, user_id, rows)
+
+    monkeypatch.setattr(expense_import, "record_items", fail_second_batch)
+    asyncio.run(_run(_failed_batch_leaves_no_rows))
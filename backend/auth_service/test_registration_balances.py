@@ -0,0 +1,143 @@
+"""
+Tests for registration (routers/auth.py register): the dashboard totals
+of a participant who registers after a split was addressed to them, and
+the verification code surviving a registration that fails
+
+Needs the Postgres database from DATABASE_URL (.env) with migrations
+applied; skipped when it is unreachable (see conftest.py). The users
+involved are created and removed by the test:
+
+    python -m pytest test_registration_balances.py
+"""
+import asyncio
+import uuid as uuid_lib
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+import routers.auth
+
+from code_store import code_store, REGISTRATION
+from database import AsyncSessionLocal, engine
+from models import Balance, Expense, ExpenseSplit, User, UserExpenseSummary
+from routers.auth import register
+from routers.splits import create_expense_splits, update_expense_split
+from schemas import RegisterRequest
+from split_schemas import CreateExpenseSplitRequest, SplitParticipant, UpdateSplitRequest
+from user_cache import UserSnapshot
+
+AMOUNT = Decimal("12.50")
+
+
+async def _create_owner() -> UserSnapshot:
+    async with AsyncSessionLocal() as db:
+        owner = User(email=f"owner-{uuid_lib.uuid4().hex[:12]}@example.com", password_hash="x")
+        db.add(owner)
+        await db.commit()
+        return UserSnapshot.from_row(owner)
+
+
+async def _remove_users(*emails: str):
+    async with AsyncSessionLocal() as db:
+        user_ids = select(User.id).where(User.email.in_(emails))
+        # Splits go with their expense; summary rows with the user
+        await db.execute(delete(Expense).where(Expense.user_id.in_(user_ids)))
+        await db.execute(delete(Balance).where(Balance.user_id.in_(user_ids)))
+        await db.execute(delete(User).where(User.email.in_(emails)))
+        await db.commit()
+
+
+async def _summary(user_id: uuid_lib.UUID):
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(UserExpenseSummary.owed_to_user, UserExpenseSummary.user_owes)
+            .where(UserExpenseSummary.user_id == user_id)
+        )).first()
+    return tuple(row) if row else (Decimal(0), Decimal(0))
+
+
+async def _register_after_split_then_paid():
+    owner = await _create_owner()
+    email = f"late-{uuid_lib.uuid4().hex[:12]}@example.com"
+    try:
+        async with AsyncSessionLocal() as db:
+            expense_id = await db.scalar(
+                insert(Expense)
+                .values(user_id=owner.id, store_name="Late signup", total_amount=AMOUNT * 2)
+                .returning(Expense.id)
+            )
+            await db.commit()
+            await create_expense_splits(
+                str(expense_id),
+                CreateExpenseSplitRequest(
+                    expense_id=str(expense_id),
+                    participants=[SplitParticipant(name="Late", email=email, amount_owed=AMOUNT)]
+                ),
+                current_user=owner,
+                db=db
+            )
+
+        # The participant registers after the split exists
+        await code_store.put(REGISTRATION, email, "123456")
+        async with AsyncSessionLocal() as db:
+            token = await register(
+                RegisterRequest(email=email, password="secret123", verification_code="123456"),
+                db=db
+            )
+        participant_id = uuid_lib.UUID(token.user_id)
+        assert await _summary(owner.id) == (AMOUNT, 0)
+        assert await _summary(participant_id) == (0, AMOUNT)
+
+        async with AsyncSessionLocal() as db:
+            split_id = await db.scalar(
+                select(ExpenseSplit.id).where(ExpenseSplit.expense_id == expense_id)
+            )
+            await update_expense_split(
+                str(expense_id), str(split_id), UpdateSplitRequest(is_paid=True),
+                current_user=owner, db=db
+            )
+
+        # Settling takes both sides back to zero instead of below it
+        assert await _summary(owner.id) == (0, 0)
+        assert await _summary(participant_id) == (0, 0)
+    finally:
+        await _remove_users(owner.email, email)
+
+
+async def _failing_backfill(db, user_id, email):
+    raise RuntimeError("backfill failed")
+
+
+async def _failed_registration_keeps_code(monkeypatch):
+    email = f"retry-{uuid_lib.uuid4().hex[:12]}@example.com"
+    request = RegisterRequest(email=email, password="secret123", verification_code="654321")
+    await code_store.put(REGISTRATION, email, "654321")
+    try:
+        # Fails after the code was consumed, before the commit
+        monkeypatch.setattr(routers.auth, "backfill_registered_balances", _failing_backfill)
+        with pytest.raises(RuntimeError):
+            async with AsyncSessionLocal() as db:
+                await register(request, db=db)
+        monkeypatch.undo()
+        # The code was consumed in the rolled-back transaction, so it still works
+        async with AsyncSessionLocal() as db:
+            token = await register(request, db=db)
+        assert token.email == email
+    finally:
+        await _remove_users(email)
+
+
+async def _run(test):
+    try:
+        await test()
+    finally:
+        await engine.dispose()
+
+
+def test_register_after_split_then_paid(database):
+    asyncio.run(_run(_register_after_split_then_paid))
+
+
+def test_failed_registration_keeps_code(database, monkeypatch):
+    asyncio.run(_run(lambda: _failed_registration_keeps_code(monkeypatch)))
@@ -0,0 +1,80 @@
+"""
+Tests for queueing bill emails (routers/splits.py send-bills)
+
+Needs the Postgres database from DATABASE_URL (.env) with migrations
+applied; skipped when it is unreachable (see conftest.py). The owner and
+the expense are created and removed by the test:
+
+    python -m pytest test_send_bills.py
+"""
+import asyncio
+import uuid as uuid_lib
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select
+
+from database import AsyncSessionLocal, engine
+from models import EmailOutbox, Expense, ExpenseSplit, User
+from routers.splits import send_bills_to_participants
+from split_schemas import SendBillRequest
+from user_cache import UserSnapshot
+
+
+async def _concurrent_sends_queue_once():
+    async with AsyncSessionLocal() as db:
+        owner = User(email=f"bills-{uuid_lib.uuid4().hex[:12]}@example.com", password_hash="x")
+        db.add(owner)
+        await db.flush()
+        expense_id = await db.scalar(
+            insert(Expense)
+            .values(user_id=owner.id, store_name="Bills", total_amount=Decimal("20.00"))
+            .returning(Expense.id)
+        )
+        split_id = await db.scalar(
+            insert(ExpenseSplit)
+            .values(
+                expense_id=expense_id, participant_name="Friend",
+                participant_email="friend@example.com", amount_owed=Decimal("10.00")
+            )
+            .returning(ExpenseSplit.id)
+        )
+        await db.commit()
+        owner = UserSnapshot.from_row(owner)
+
+    async def send():
+        async with AsyncSessionLocal() as db:
+            return await send_bills_to_participants(
+                str(expense_id),
+                SendBillRequest(expense_id=str(expense_id), participant_ids=[str(split_id)]),
+                current_user=owner,
+                db=db
+            )
+
+    try:
+        responses = await asyncio.gather(*(send() for _ in range(4)))
+        messages = sorted(response.results[0]["message"] for response in responses)
+        assert messages == ["Email already queued"] * 3 + ["Email to friend@example.com queued"], messages
+        assert all(response.sent_count == 1 for response in responses)
+        async with AsyncSessionLocal() as db:
+            pending = await db.scalar(
+                select(func.count()).select_from(EmailOutbox)
+                .where(EmailOutbox.split_id == split_id, EmailOutbox.status == "pending")
+            )
+        assert pending == 1, pending
+    finally:
+        async with AsyncSessionLocal() as db:
+            # Splits and their outbox rows go with the expense
+            await db.execute(delete(Expense).where(Expense.id == expense_id))
+            await db.execute(delete(User).where(User.id == owner.id))
+            await db.commit()
+
+
+async def _run(test):
+    try:
+        await test()
+    finally:
+        await engine.dispose()
+
+
+def test_concurrent_sends_queue_once(database):
+    asyncio.run(_run(_concurrent_sends_queue_once))
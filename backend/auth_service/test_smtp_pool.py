@@ -0,0 +1,254 @@
+"""
+Tests for the pooled SMTP sender (email_service.SMTPPool)
+
+Runs against a stub SMTP server on 127.0.0.1, so no real mail account is
+needed:
+
+    python -m pytest test_smtp_pool.py
+"""
+import asyncio
+import base64
+from email.mime.text import MIMEText
+
+import email_service
+from email_service import SMTPPool
+
+USERNAME = "smartbill"
+PASSWORD = "secret"
+
+
+class StubSMTPServer:
+    """
+    Minimal ESMTP server: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP,
+    QUIT. Records delivered messages and how many sessions were opened.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = 0
+        self.logins = 0
+        self._server = None
+        self._writers = set()
+        self._handlers = set()
+        self.port = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.drop_connections()
+        self._server.close()
+        await self._server.wait_closed()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+
+    def drop_connections(self):
+        """Simulate the server timing out idle sessions"""
+        for writer in list(self._writers):
+            writer.close()
+        self._writers.clear()
+
+    async def _handle(self, reader, writer):
+        self.sessions += 1
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+
+        def reply(line):
+            writer.write((line + "\r\n").encode())
+
+        reply("220 stub ESMTP")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode().rstrip("\r\n")
+                verb = command.split(" ", 1)[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    reply("250-stub")
+                    reply("250-AUTH PLAIN")
+                    reply("250 8BITMIME")
+                elif verb == "AUTH":
+                    credentials = base64.b64decode(command.split()[2]).split(b"\0")
+                    if credentials[1:] == [USERNAME.encode(), PASSWORD.encode()]:
+                        self.logins += 1
+                        reply("235 Authentication successful")
+                    else:
+                        reply("535 Authentication failed")
+                elif verb == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    lines = []
+                    while True:
+                        data_line = await reader.readline()
+                        if data_line in (b".\r\n", b""):
+                            break
+                        lines.append(data_line)
+                    self.messages.append(b"".join(lines))
+                    reply("250 OK queued")
+                elif verb == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    # MAIL, RCPT, RSET, NOOP
+                    reply("250 OK")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def _message(index: int) -> MIMEText:
+    message = MIMEText(f"Bill #{index}", "plain", "utf-8")
+    message["Subject"] = f"SmartBill - bill {index}"
+    message["From"] = "bills@smartbill.test"
+    message["To"] = f"friend{index}@smartbill.test"
+    return message
+
+
+def _pool(server: StubSMTPServer, **options) -> SMTPPool:
+    return SMTPPool(
+        hostname="127.0.0.1",
+        port=server.port,
+        username=USERNAME,
+        password=PASSWORD,
+        start_tls=False,
+        local_hostname="localhost",
+        **options
+    )
+
+
+async def _reuses_sessions():
+    server = StubSMTPServer()
+    await server.start()
+    pool = _pool(server, size=2)
+    try:
+        await asyncio.gather(*(pool.send(_message(i)) for i in range(20)))
+        assert len(server.messages) == 20, server.messages
+        # 20 messages, at most 2 handshakes
+        assert server.sessions <= 2, server.sessions
+        assert server.logins == server.sessions
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+async def _reconnects_after_drop():
+    server = StubSMTPServer()
+    await server.start()
+    pool = _pool(server, size=1)
+    try:
+        await pool.send(_message(1))
+        server.drop_connections()
+        await asyncio.sleep(0.05)
+        await pool.send(_message(2))
+        assert len(server.messages) == 2
+        assert server.sessions == 2
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+async def _recycles_sessions():
+    server = StubSMTPServer()
+    await server.start()
+    pool = _pool(server, size=1, max_messages=3)
+    try:
+        for i in range(7):
+            await pool.send(_message(i))
+        assert len(server.messages) == 7
+        # A new session after every 3 messages
+        assert server.sessions == 3, server.sessions
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+async def _expires_idle_sessions():
+    server = StubSMTPServer()
+    await server.start()
+    pool = _pool(server, size=1, idle_seconds=0.05)
+    try:
+        await pool.send(_message(1))
+        await asyncio.sleep(0.1)
+        await pool.send(_message(2))
+        assert server.sessions == 2
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+async def _rejects_bad_credentials():
+    server = StubSMTPServer()
+    await server.start()
+    pool = SMTPPool(
+        hostname="127.0.0.1", port=server.port, username=USERNAME, password="wrong",
+        start_tls=False, local_hostname="localhost", size=1
+    )
+    try:
+        try:
+            await pool.send(_message(1))
+        except Exception:
+            pass
+        else:
+            raise AssertionError("send with bad credentials should fail")
+        assert server.messages == []
+        assert pool.idle_count() == 0
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+async def _resolves_hostname_on_first_connect(lookups):
+    server = StubSMTPServer()
+    await server.start()
+    pool = SMTPPool(
+        hostname="127.0.0.1", port=server.port, username=USERNAME, password=PASSWORD,
+        start_tls=False, size=1, max_messages=1
+    )
+    try:
+        # Nothing is resolved when the pool is created (module import)
+        assert lookups == []
+        await pool.send(_message(1))
+        await pool.send(_message(2))
+        assert server.sessions == 2
+        assert lookups == ["lookup"], lookups
+        assert pool.local_hostname == "smartbill.test"
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+def test_reuses_sessions():
+    asyncio.run(_reuses_sessions())
+
+
+def test_reconnects_after_drop():
+    asyncio.run(_reconnects_after_drop())
+
+
+def test_recycles_sessions():
+    asyncio.run(_recycles_sessions())
+
+
+def test_expires_idle_sessions():
+    asyncio.run(_expires_idle_sessions())
+
+
+def test_rejects_bad_credentials():
+    asyncio.run(_rejects_bad_credentials())
+
+
+
+def test_resolves_hostname_on_first_connect(monkeypatch):
+    lookups = []
+
+    def getfqdn():
+        lookups.append("lookup")
+        return "smartbill.test"
+
+    monkeypatch.setattr(email_service.socket, "getfqdn", getfqdn)
+    asyncio.run(_resolves_hostname_on_first_connect(lookups))
@@ -0,0 +1,167 @@
+"""
+Tests for the split calculator (split_engine.py)
+
+Pure arithmetic, no database needed:
+
+    python -m pytest test_split_engine.py
+"""
+import random
+from decimal import Decimal
+
+from split_engine import EQUAL, PROPORTIONAL, allocate, calculate, from_cents, to_cents
+
+
+def _total(result) -> int:
+    return sum(share.total_cents for share in result.shares)
+
+
+def test_allocate_sums_to_total():
+    rng = random.Random(49)
+    for _ in range(2000):
+        total = rng.randint(-10000, 100000)
+        weights = [rng.randint(0, 5000) for _ in range(rng.randint(1, 12))]
+        shares = allocate(total, weights)
+        assert sum(shares) == total, (total, weights, shares)
+        assert len(shares) == len(weights)
+
+
+def test_allocate_stays_within_a_cent():
+    rng = random.Random(26)
+    for _ in range(500):
+        total = rng.randint(0, 100000)
+        weights = [rng.randint(1, 5000) for _ in range(rng.randint(1, 8))]
+        for share, weight in zip(allocate(total, weights), weights):
+            exact = total * weight / sum(weights)
+            assert exact - 1 < share < exact + 1, (total, weights)
+
+
+def test_allocate_ties_go_to_earlier_participant():
+    assert allocate(100, [1, 1, 1]) == [34, 33, 33]
+    assert allocate(200, [1, 1, 1]) == [67, 67, 66]
+    assert allocate(5, [1, 1, 1, 1, 1, 1]) == [1, 1, 1, 1, 1, 0]
+    # Larger remainder wins before order is considered
+    assert allocate(10, [1, 2]) == [3, 7]
+
+
+def test_allocate_zero_weights():
+    # A zero weight gets nothing while others have weight
+    assert allocate(100, [0, 1, 1]) == [0, 50, 50]
+    # All zero (or negative) weights split evenly
+    assert allocate(100, [0, 0, 0]) == [34, 33, 33]
+    assert allocate(10, [-5, 0]) == [5, 5]
+    assert allocate(100, []) == []
+
+
+def test_allocate_negative_total():
+    shares = allocate(-100, [1, 1, 1])
+    assert sum(shares) == -100
+    assert max(shares) - min(shares) <= 1
+
+
+def test_cents_round_trip():
+    assert to_cents("12.345") == 1235
+    assert to_cents(Decimal("0.005")) == 1
+    assert to_cents(3) == 300
+    assert from_cents(1235) == Decimal("12.35")
+    assert from_cents(-7) == Decimal("-0.07")
+
+
+def test_shared_item_split_exactly():
+    result = calculate([("Pizza", Decimal("10.00"), 1)], [[0], [0], [0]])
+    assert [share.item_cents for share in result.shares] == [334, 333, 333]
+    assert _total(result) == 1000
+    assert all(share.items == ["Pizza"] for share in result.shares)
+
+
+def test_quantity_multiplies_price():
+    result = calculate([("Soda", Decimal("1.25"), Decimal(3))], [[0]])
+    assert result.items_cents == 375
+    assert result.shares[0].item_cents == 375
+
+
+def test_zero_item_assignee():
+    items = [("Steak", Decimal("30.00"), 1), ("Salad", Decimal("10.00"), 1)]
+    result = calculate(items, [[0], [1], []], tax_amount=Decimal("4.00"))
+    first, second, nothing = result.shares
+    assert (first.item_cents, first.tax_cents) == (3000, 300)
+    assert (second.item_cents, second.tax_cents) == (1000, 100)
+    # Nothing assigned: owes nothing in proportional mode
+    assert (nothing.total_cents, nothing.items) == (0, [])
+    assert _total(result) == 4400
+
+
+def test_zero_item_assignee_pays_equal_tip():
+    items = [("Steak", Decimal("30.00"), 1)]
+    result = calculate(items, [[0], []], tip_amount=Decimal("5.01"), tip_split=EQUAL)
+    assert [share.tip_cents for share in result.shares] == [251, 250]
+
+
+def test_no_items_splits_evenly():
+    result = calculate([], [[], []], tax_amount=Decimal("1.01"), tip_amount=Decimal("2.00"))
+    assert [share.tax_cents for share in result.shares] == [51, 50]
+    assert [share.tip_cents for share in result.shares] == [100, 100]
+
+
+def test_tip_percent_of_items_total():
+    items = [("Pasta", Decimal("20.00"), 1), ("Wine", Decimal("15.00"), 1)]
+    result = calculate(items, [[0], [1]], tip_percent=Decimal(18))
+    assert result.tip_cents == 630
+    assert [share.tip_cents for share in result.shares] == [360, 270]
+    # tip_amount wins over tip_percent
+    result = calculate(items, [[0], [1]], tip_amount=Decimal(5), tip_percent=Decimal(18))
+    assert result.tip_cents == 500
+
+
+def test_unassigned_items_keep_their_tax():
+    items = [("Burger", Decimal("12.00"), 1), ("Payer's lunch", Decimal("12.00"), 1)]
+    result = calculate(items, [[0]], tax_amount=Decimal("2.40"), tax_split=PROPORTIONAL)
+    assert result.unassigned_cents == 1200
+    assert result.shares[0].tax_cents == 120
+    # Equal mode ignores item subtotals
+    result = calculate(items, [[0]], tax_amount=Decimal("2.40"), tax_split=EQUAL)
+    assert result.shares[0].tax_cents == 240
+
+
+def test_fully_assigned_shares_sum_to_receipt():
+    rng = random.Random(2026)
+    for _ in range(300):
+        count = rng.randint(1, 10)
+        items = [
+            (f"Item {i}", Decimal(rng.randint(1, 5000)) / 100, rng.randint(1, 3))
+            for i in range(count)
+        ]
+        people = rng.randint(1, 6)
+        assignments = [[] for _ in range(people)]
+        for index in range(count):
+            for person in rng.sample(range(people), rng.randint(1, people)):
+                assignments[person].append(index)
+        tax = Decimal(rng.randint(0, 999)) / 100
+        tip = Decimal(rng.randint(0, 999)) / 100
+        result = calculate(
+            items, assignments, tax_amount=tax, tip_amount=tip,
+            tax_split=rng.choice([PROPORTIONAL, EQUAL]),
+            tip_split=rng.choice([PROPORTIONAL, EQUAL])
+        )
+        assert result.unassigned_cents == 0
+        assert _total(result) == result.items_cents + to_cents(tax) + to_cents(tip)
+
+
+def test_duplicate_indexes_count_once():
+    result = calculate([("Fries", Decimal("4.00"), 1)], [[0, 0], [0]])
+    assert [share.item_cents for share in result.shares] == [200, 200]
+
+
+def test_rejects_bad_input():
+    items = [("Tea", Decimal("3.00"), 1)]
+    for kwargs in (
+        {"assignments": [[1]]},
+        {"assignments": [[-1]]},
+        {"assignments": [[0]], "tax_split": "weighted"},
+        {"assignments": [[0]], "tip_split": ""},
+    ):
+        try:
+            calculate(items, **kwargs)
+        except ValueError:
+            continue
+        raise AssertionError(f"no ValueError for {kwargs}")
+
@@ -0,0 +1,203 @@
+"""
+In-process cache of authenticated users
+
+get_current_user() resolves the token's user id through this cache, so most
+authenticated requests no longer query `users`. Entries are immutable
+UserSnapshot objects, detached from any session, that expire after
+USER_CACHE_TTL seconds; at most USER_CACHE_SIZE are kept (least recently
+used first out).
+
+Writes that change a user call invalidate_user() inside their transaction.
+It drops the local entry and sends a NOTIFY on USER_CACHE_CHANNEL, which is
+delivered to every worker's listener when the transaction commits. If the
+listener is not connected the worker caches nothing; after a reconnect it
+starts from an empty cache, so missed notifications cannot leave stale
+entries behind.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid as uuid_lib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import DATABASE_URL, to_async_url
+from metrics import metrics
+from models import User
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+USER_CACHE_CHANNEL = "user_cache_invalidate"
+# LISTEN needs a session-level connection; point this past PgBouncer if needed
+USER_CACHE_LISTEN_URL = os.getenv("USER_CACHE_LISTEN_URL", DATABASE_URL)
+LISTEN_RETRY_SECONDS = 5
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Read-only copy of the `users` columns routers need (no password hash)"""
+    id: uuid_lib.UUID
+    email: str
+    email_verified: bool
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_row(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            email_verified=user.email_verified,
+            created_at=user.created_at,
+        )
+
+
+class UserCache:
+    """Bounded LRU map of user id -> (expires_at, UserSnapshot)"""
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[uuid_lib.UUID, tuple]" = OrderedDict()
+        # Bumped by every invalidation; a load that started before one is not stored
+        self.generation = 0
+        # Only cache while invalidations can be received
+        self.enabled = False
+
+    def get(self, user_id: uuid_lib.UUID) -> Optional[UserSnapshot]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            metrics.inc("user_cache_misses")
+            return None
+        expires_at, snapshot = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            metrics.inc("user_cache_expired")
+            metrics.inc("user_cache_misses")
+            return None
+        self._entries.move_to_end(user_id)
+        metrics.inc("user_cache_hits")
+        return snapshot
+
+    def put(self, snapshot: UserSnapshot, generation: int):
+        if not self.enabled or self.max_size <= 0 or generation != self.generation:
+            return
+        self._entries[snapshot.id] = (time.monotonic() + self.ttl, snapshot)
+        self._entries.move_to_end(snapshot.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            metrics.inc("user_cache_evictions")
+
+    def invalidate(self, user_id: uuid_lib.UUID):
+        self.generation += 1
+        if self._entries.pop(user_id, None) is not None:
+            metrics.inc("user_cache_invalidations")
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserCache()
+metrics.gauge("user_cache_size", lambda: len(user_cache))
+
+
+async def load_user(db: AsyncSession, user_id: uuid_lib.UUID) -> Optional[UserSnapshot]:
+    """Snapshot of a user, from the cache or one query on a miss"""
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+    generation = user_cache.generation
+    row = (await db.execute(
+        select(User.id, User.email, User.email_verified, User.created_at)
+        .where(User.id == user_id)
+    )).one_or_none()
+    if row is None:
+        return None
+    snapshot = UserSnapshot.from_row(row)
+    user_cache.put(snapshot, generation)
+    return snapshot
+
+
+async def invalidate_user(db: AsyncSession, user_id: uuid_lib.UUID):
+    """
+    Drop a user from every worker's cache. Call inside the transaction that
+    changes the user; other workers are notified when it commits.
+    """
+    user_cache.invalidate(user_id)
+    await db.execute(select(func.pg_notify(USER_CACHE_CHANNEL, str(user_id))))
+
+
+def _on_notify(connection, pid, channel, payload):
+    try:
+        user_cache.invalidate(uuid_lib.UUID(payload))
+    except ValueError:
+        # Unknown payload: play safe
+        user_cache.clear()
+
+
+async def _listen_forever(stopped: asyncio.Event):
+    dsn = to_async_url(USER_CACHE_LISTEN_URL).replace("postgresql+asyncpg://", "postgresql://", 1)
+    while not stopped.is_set():
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(USER_CACHE_CHANNEL, _on_notify)
+            # Anything cached before LISTEN took effect may have missed a NOTIFY
+            user_cache.clear()
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            user_cache.enabled = True
+            _, pending = await asyncio.wait(
+                [asyncio.ensure_future(stopped.wait()), asyncio.ensure_future(lost.wait())],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in pending:
+                task.cancel()
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning("User cache listener unavailable: %s", e)
+        finally:
+            user_cache.enabled = False
+            user_cache.clear()
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        if not stopped.is_set():
+            metrics.inc("user_cache_listener_reconnects")
+            try:
+                await asyncio.wait_for(stopped.wait(), LISTEN_RETRY_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+_listener: Optional[asyncio.Task] = None
+_stopped: Optional[asyncio.Event] = None
+
+
+async def start_invalidation_listener():
+    """Start this worker's LISTEN task (app startup)"""
+    global _listener, _stopped
+    if USER_CACHE_SIZE <= 0 or _listener is not None:
+        return
+    _stopped = asyncio.Event()
+    _listener = asyncio.create_task(_listen_forever(_stopped))
+
+
+async def stop_invalidation_listener():
+    """Stop the LISTEN task (app shutdown)"""
+    global _listener
+    if _listener is None:
+        return
+    _stopped.set()
+    await _listener
+    _listener = None
@@ -7,6 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import logging
 import os
+import sys
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -14,6 +15,12 @@ from models import OCRResponse, ErrorResponse, TestRequest
 from gemini_ocr_engine import GeminiOCREngine as OCREngine
 from parser import ReceiptParser
 
+# Modules shared by all services (profiling.py) live in backend/shared
+SHARED_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
+from profiling import install_profiler
+
 # Load environment variables from .env file
 # Try loading from current directory first, then from project root
 load_dotenv()  # Current directory (ocr_service/)
@@ -42,6 +49,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (X-Profile-Token header / PROFILE_SAMPLE_RATE)
+install_profiler(app, "ocr_service")
+
 # OCR engine (lazy loaded)
 ocr_engine: Optional[OCREngine] = None
 
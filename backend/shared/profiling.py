@@ -0,0 +1,247 @@
+"""
+Per-request sampling profiler
+
+Requests that carry the admin profiling header (or that are picked by the
+global sample rate) are profiled by a background thread that samples the
+request's thread stack every few milliseconds. Samples are written as
+collapsed stacks ("frame;frame;frame count"), which flamegraph.pl,
+speedscope and inferno read directly.
+
+Lives in backend/shared; each service's main.py puts that directory on
+sys.path before importing it.
+
+The event loop thread is sampled. A sample is kept as the request's own
+only while one of its tasks is running on the loop: the request's task
+and, on Python 3.12+, any task it spawned (tagged through a ContextVar;
+older Pythons cannot read another task's context, so there only the
+request's own task counts). While another request's task is running the
+sample is recorded as a single "(other tasks)" frame, so concurrent
+requests do not leak into the profile but the time lost to them stays
+visible. Samples inside the event loop's selector mean the request was
+awaiting I/O.
+
+Sync (`def`) routes and anything else run in the threadpool are not
+sampled: the worker thread cannot be attributed to a request from the
+sampler, so their time shows up as the loop waiting.
+
+Environment:
+    PROFILE_ADMIN_TOKEN   Secret expected in the X-Profile-Token header.
+                          Header-triggered profiling and the listing
+                          endpoints are disabled while this is empty.
+    PROFILE_SAMPLE_RATE   Fraction of all requests to profile (0.0 - 1.0).
+    PROFILE_INTERVAL_MS   Sampling interval in milliseconds.
+    PROFILE_DIR           Directory that stores the .folded files.
+    PROFILE_MAX_FILES     Oldest files are deleted beyond this count.
+"""
+import asyncio
+import contextvars
+import hmac
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+OTHER_TASKS_FRAME = "(other tasks)"
+
+# Sampler of the profiled request the current task belongs to
+_profiled_request: contextvars.ContextVar = contextvars.ContextVar("profiled_request", default=None)
+
+
+class ProfilerSettings:
+    """Profiler configuration, read from the environment at install time"""
+
+    def __init__(self, service_name: str):
+        self.service_name = service_name
+        self.admin_token = os.getenv("PROFILE_ADMIN_TOKEN", "")
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.interval = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+        self.directory = os.getenv(
+            "PROFILE_DIR",
+            os.path.join(tempfile.gettempdir(), "smartbill_profiles", service_name)
+        )
+        self.max_files = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+    def token_matches(self, token: Optional[str]) -> bool:
+        if not self.admin_token or not token:
+            return False
+        return hmac.compare_digest(token, self.admin_token)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the event loop thread at a fixed interval until stopped,
+    keeping only the stacks of the request's own tasks
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, task: asyncio.Task, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.loop = loop
+        self.task = task
+        self.loop_thread_id = threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def _owns(self, task: Optional[asyncio.Task]) -> bool:
+        if task is None or task is self.task:
+            # None: the loop is idle in its selector, i.e. awaiting I/O
+            return True
+        get_context = getattr(task, "get_context", None)  # Python 3.12+
+        return get_context is not None and get_context().get(_profiled_request) is self
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            running = asyncio.current_task(self.loop)
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            if not self._owns(running):
+                self.stacks[OTHER_TASKS_FRAME] += 1
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self.join()
+        return self.stacks
+
+
+def _write_profile(settings: ProfilerSettings, name: str, stacks: Counter):
+    """Write collapsed stacks and prune the directory to max_files"""
+    os.makedirs(settings.directory, exist_ok=True)
+    path = os.path.join(settings.directory, name)
+    with open(path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    files = sorted(
+        (entry for entry in os.scandir(settings.directory) if entry.name.endswith(".folded")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in files[:max(0, len(files) - settings.max_files)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware that profiles selected HTTP requests.
+    Requests that are not selected pass straight through.
+    """
+
+    def __init__(self, app, settings: ProfilerSettings):
+        self.app = app
+        self.settings = settings
+
+    def _should_profile(self, scope) -> bool:
+        for key, value in scope.get("headers", []):
+            if key == PROFILE_HEADER.lower().encode():
+                return self.settings.token_matches(value.decode("latin-1"))
+        return self.settings.sample_rate > 0 and random.random() < self.settings.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+        started_at = datetime.now(timezone.utc)
+        name = (
+            f"{self.settings.service_name}-{started_at:%Y%m%dT%H%M%S%f}-"
+            f"{scope['method']}-{slug}.folded"
+        )
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (PROFILE_ID_HEADER.lower().encode(), name.encode())
+                ]
+            await send(message)
+
+        sampler = StackSampler(
+            asyncio.get_running_loop(), asyncio.current_task(), self.settings.interval
+        )
+        tag = _profiled_request.set(sampler)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            stacks = sampler.stop()
+            _profiled_request.reset(tag)
+            await asyncio.to_thread(_write_profile, self.settings, name, stacks)
+
+
+def _profiles_router(settings: ProfilerSettings) -> APIRouter:
+    router = APIRouter(prefix="/debug/profiles", tags=["Profiling"])
+
+    def require_admin(x_profile_token: Optional[str] = Header(None)):
+        if not settings.token_matches(x_profile_token):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Profiling access denied"
+            )
+
+    @router.get("", dependencies=[Depends(require_admin)])
+    def list_profiles():
+        """List stored profiles, newest first"""
+        if not os.path.isdir(settings.directory):
+            return {"service": settings.service_name, "profiles": [], "total": 0}
+        entries = sorted(
+            (entry for entry in os.scandir(settings.directory) if entry.name.endswith(".folded")),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True
+        )
+        profiles = [
+            {
+                "name": entry.name,
+                "size_bytes": entry.stat().st_size,
+                "created_at": datetime.fromtimestamp(entry.stat().st_mtime, timezone.utc),
+            }
+            for entry in entries
+        ]
+        return {"service": settings.service_name, "profiles": profiles, "total": len(profiles)}
+
+    @router.get("/{name}", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+    def get_profile(name: str):
+        """Download one profile in collapsed-stack format"""
+        path = os.path.join(settings.directory, os.path.basename(name))
+        if not name.endswith(".folded") or not os.path.isfile(path):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found"
+            )
+        with open(path) as f:
+            return f.read()
+
+    return router
+
+
+def install_profiler(app: FastAPI, service_name: str) -> ProfilerSettings:
+    """Add the profiling middleware and listing endpoints to an app"""
+    settings = ProfilerSettings(service_name)
+    app.add_middleware(ProfilerMiddleware, settings=settings)
+    app.include_router(_profiles_router(settings))
+    return settings
@@ -1,3 +1,5 @@
+import os
+import sys
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, List
@@ -6,6 +8,12 @@ from models.schemas import ExpenseData
 from services.transcription import transcription_service
 from services.parser import expense_parser_service
 
+# Modules shared by all services (profiling.py) live in backend/shared
+SHARED_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
+from profiling import install_profiler
+
 app = FastAPI(title="Splitwise Voice Expense API")
 
 # CORS middleware for frontend
@@ -17,6 +25,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (X-Profile-Token header / PROFILE_SAMPLE_RATE)
+install_profiler(app, "stt_service")
+
 @app.post("/process-voice-expense", response_model=ExpenseData)
 async def process_voice_expense(
     audio: UploadFile = File(...),
@@ -1,5 +1,5 @@
 // SplitBillModal.jsx
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { X, Users, DollarSign, Send, Check, Mail } from 'lucide-react';
 import { contactsAPI, splitsAPI } from '../services/api';
 
@@ -9,6 +9,17 @@ const toNum = (v) => {
   return Number.isNaN(n) ? 0 : n;
 };
 const fmt = (v) => toNum(v).toFixed(2);
+const norm = (s) => s.toLowerCase().trim();
+const parseList = (v) => (typeof v === 'string' ? JSON.parse(v) : v || []);
+const contactName = (c) => c.nickname || c.friend_email.split('@')[0];
+const namesMatch = (a, b) => {
+  const x = a.toLowerCase();
+  const y = b.toLowerCase();
+  return x === y || x.includes(y) || y.includes(x);
+};
+
+/* 税按各人商品小计比例分摊（税额默认取账单的 tax_amount） */
+const SPLIT_POLICY = { tax_split: 'proportional', tip_split: 'proportional' };
 
 const SplitBillModal = ({ isOpen, onClose, expense, onSuccess }) => {
   const [allContacts, setAllContacts] = useState([]);
@@ -19,6 +30,7 @@ const SplitBillModal = ({ isOpen, onClose, expense, onSuccess }) => {
   const [loading, setLoading] = useState(false);
   const [sending, setSending] = useState(false);
   const [error, setError] = useState('');
+  const previewRequest = useRef(0);
 
   /* -------------------------------------------------
    * 数据加载
@@ -44,11 +56,7 @@ const SplitBillModal = ({ isOpen, onClose, expense, onSuccess }) => {
       const relevant = contacts.filter((c) => {
         if (!expense.participants?.length)
           return splits.some((s) => s.contact_id === c.id);
-        const name = (c.nickname || c.friend_email.split('@')[0]).toLowerCase();
-        return expense.participants.some((p) => {
-          const pName = p.name.toLowerCase();
-          return name === pName || name.includes(pName) || pName.includes(name);
-        });
+        return expense.participants.some((p) => namesMatch(contactName(c), p.name));
       });
       setRelevantContacts(relevant);
 
@@ -62,18 +70,14 @@ const SplitBillModal = ({ isOpen, onClose, expense, onSuccess }) => {
           if (s.contact_id && relevant.some((c) => c.id === s.contact_id)) {
             calc[s.contact_id] = {
               amount: toNum(s.amount_owed),
-              items:
-                typeof s.items_detail === 'string'
-                  ? JSON.parse(s.items_detail)
-                  : s.items_detail || [],
+              items: parseList(s.items_detail),
               aaDetails: [],
             };
           }
         });
         setSplitCalculations(calc);
       } else {
-        const calc = calculateSplitsFromParticipants(relevant);
-        setSplitCalculations(calc);
+        setSplitCalculations({});
       }
     } catch (err) {
       setError('Failed to load data: ' + err.message);
@@ -82,60 +86,90 @@ const SplitBillModal = ({ isOpen, onClose, expense, onSuccess }) => {
     }
   };
 
-  /* 根据 participants 自动计算每人应付 */
-  const calculateSplitsFromParticipants = (contacts) => {
-    if (!expense.participants || !expense.items) return {};
-    const calc = {};
-    expense.participants.forEach((p) => {
-      if (!p.items) return;
-      const contact = contacts.find((c) => {
-        const name = (c.nickname || c.friend_email.split('@')[0]).toLowerCase();
-        return (
-          name === p.name.toLowerCase() ||
-          name.includes(p.name.toLowerCase()) ||
-          p.name.toLowerCase().includes(name)
-        );
-      });
-      if (!contact) return;
+  /* 账单商品（金额由服务端按 item_indexes 计算） */
+  const splitItems = () =>
+    (expense.items || []).map((i) => ({
+      name: i.name,
+      price: toNum(i.price),
+      quantity: toNum(i.quantity) || 1,
+    }));
 
-      let total = 0;
-      const items =
-        typeof p.items === 'string' ? JSON.parse(p.items) : p.items;
-      items.forEach((itemName) => {
-        const item = expense.items.find(
-          (i) =>
-            i.name.toLowerCase().trim() === itemName.toLowerCase().trim()
-        );
-        if (!item) return;
-        const shared = expense.participants.filter((pp) => {
-          const ppItems =
-            typeof pp.items === 'string' ? JSON.parse(pp.items) : pp.items;
-          return ppItems.some(
-            (ii) => ii.toLowerCase().trim() === itemName.toLowerCase().trim()
-          );
-        }).length;
-        total += toNum(item.price) / (shared || 1);
-      });
-      calc[contact.id] = { amount: total, items, aaDetails: [] };
+  /*
+   * 账单的所有参与者及其分到的商品下标；
+   * 只有匹配到已选联系人的参与者才生成分账（billed），
+   * 其余参与者（如付款人自己）仍参与商品和税的分摊
+   */
+  const splitParticipants = (contactIds) => {
+    const selected = relevantContacts.filter((c) => contactIds.includes(c.id));
+    const items = expense.items || [];
+    const used = new Set();
+    const participants = (expense.participants || []).map((p) => {
+      const item_indexes = parseList(p.items)
+        .map((name) => items.findIndex((i) => norm(i.name) === norm(name)))
+        .filter((idx) => idx >= 0);
+      const contact = selected.find(
+        (c) => !used.has(c.id) && namesMatch(contactName(c), p.name)
+      );
+      if (!contact) return { name: p.name, item_indexes, billed: false };
+      used.add(contact.id);
+      return {
+        name: contactName(contact),
+        email: contact.friend_email,
+        contact_id: contact.id,
+        item_indexes,
+      };
     });
-    return calc;
+    // 没有对应参与者的联系人（账单没有参与者时）：不分商品
+    selected
+      .filter((c) => !used.has(c.id))
+      .forEach((c) =>
+        participants.push({
+          name: contactName(c),
+          email: c.friend_email,
+          contact_id: c.id,
+          item_indexes: [],
+        })
+      );
+    return participants;
+  };
+
+  /* 由服务端计算所选联系人的应付金额 */
+  const refreshPreview = async (contactIds) => {
+    const request = ++previewRequest.current;
+    if (!contactIds.length) return setSplitCalculations({});
+    try {
+      const participants = splitParticipants(contactIds);
+      const res = await splitsAPI.calculateSplits(
+        expense.id,
+        participants,
+        splitItems(),
+        SPLIT_POLICY
+      );
+      if (request !== previewRequest.current) return;
+      const calc = {};
+      participants.forEach((p, idx) => {
+        if (p.billed === false) return;
+        const share = res.shares[idx];
+        calc[p.contact_id] = {
+          amount: toNum(share.amount_owed),
+          items: share.items_detail,
+          aaDetails: [],
+        };
+      });
+      setSplitCalculations(calc);
+    } catch (err) {
+      if (request === previewRequest.current)
+        setError('Failed to calculate split: ' + err.message);
+    }
   };
 
   /* 勾选 / 取消联系人 */
   const handleToggleContact = (contactId) => {
-    setSelectedContactIds((prev) => {
-      if (prev.includes(contactId)) {
-        const nextCalc = { ...splitCalculations };
-        delete nextCalc[contactId];
-        setSplitCalculations(nextCalc);
-        return prev.filter((id) => id !== contactId);
-      } else {
-        const contact = relevantContacts.find((c) => c.id === contactId);
-        const calc = calculateSplitsFromParticipants([contact]);
-        setSplitCalculations((prevCalc) => ({ ...prevCalc, ...calc }));
-        return [...prev, contactId];
-      }
-    });
+    const next = selectedContactIds.includes(contactId)
+      ? selectedContactIds.filter((id) => id !== contactId)
+      : [...selectedContactIds, contactId];
+    setSelectedContactIds(next);
+    refreshPreview(next);
   };
 
   /* 发送账单 */
@@ -144,18 +178,12 @@ const SplitBillModal = ({ isOpen, onClose, expense, onSuccess }) => {
       return setError('Select at least one person');
     setSending(true);
     try {
-      const participants = selectedContactIds.map((id) => {
-        const contact = relevantContacts.find((c) => c.id === id);
-        const calc = splitCalculations[id];
-        return {
-          name: contact.nickname || contact.friend_email.split('@')[0],
-          email: contact.friend_email,
-          contact_id: contact.id,
-          amount_owed: calc.amount,
-          items_detail: calc.items || [],
-        };
-      });
-      await splitsAPI.createSplits(expense.id, participants);
+      await splitsAPI.createSplits(
+        expense.id,
+        splitParticipants(selectedContactIds),
+        splitItems(),
+        SPLIT_POLICY
+      );
       const splitsRes = await splitsAPI.getSplits(expense.id);
       const ids = splitsRes.splits
         .filter((s) => selectedContactIds.includes(s.contact_id))
@@ -30,17 +30,19 @@ export default function Dashboard() {
     (async () => {
       setLoading(true);
       try {
-        const [myRes, sharedRes] = await Promise.all([
-          expenseAPI.getExpenses(50, 0),
-          expenseAPI.getSharedExpenses(50, 0),
+        const [myRes, sharedRes, summary] = await Promise.all([
+          expenseAPI.getExpenses(50, 0, { include: 'transcript' }),
+          expenseAPI.getSharedExpenses(50, 0, { include: 'transcript' }),
+          expenseAPI.getSummary(),
         ]);
         const my = myRes.expenses || [];
         const shared = sharedRes.expenses || [];
         setExpenses(my);
         setSharedExpenses(shared);
 
-        const total = myRes.total || 0;
-        const amount = my.reduce((s, e) => s + Number(e.total_amount || 0), 0);
+        /* 统计数据由后端汇总表提供，不在前端累加 */
+        const total = summary.expense_count || 0;
+        const amount = Number(summary.lifetime_total || 0);
         const participants = new Set();
         my.forEach((e) => e.participants?.forEach((p) => participants.add(p.name)));
         setStats({
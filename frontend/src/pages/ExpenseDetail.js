@@ -24,7 +24,7 @@ const ExpenseDetail = () => {
     (async () => {
       setLoading(true);
       try {
-        const res = await expenseAPI.getExpenses(100, 0);
+        const res = await expenseAPI.getExpenses(100, 0, { include: 'transcript' });
         const found = res.expenses?.find((e) => e.id === id);
         if (!found) throw new Error('Expense not found');
         setExpense(found);
@@ -14,16 +14,39 @@ const History = () => {
   const [expenses, setExpenses] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [searchResults, setSearchResults] = useState(null);
 
   useEffect(() => {
     loadExpenses();
   }, []);
 
+  // 服务端全文搜索（输入停止 300ms 后请求），可搜到所有历史账单
+  useEffect(() => {
+    const q = searchTerm.trim();
+    if (!q) {
+      setSearchResults(null);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await expenseAPI.searchExpenses(q, 50, { include: 'transcript' });
+        if (!cancelled) setSearchResults(res.expenses || []);
+      } catch (err) {
+        if (!cancelled) setError(err.message || 'Search failed');
+      }
+    }, 300);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
   const loadExpenses = async () => {
     try {
       setLoading(true);
       setError(null);
-      const res = await expenseAPI.getExpenses(100, 0);
+      const res = await expenseAPI.getExpenses(100, 0, { include: 'transcript' });
       setExpenses(res.expenses || []);
     } catch (err) {
       setError(err.message || 'Failed to load expenses');
@@ -32,15 +55,9 @@ const History = () => {
     }
   };
 
-  // 搜索过滤
-  const filtered = expenses.filter((exp) => {
-    const matches =
-      !searchTerm ||
-      exp.store_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      exp.transcript?.toLowerCase().includes(searchTerm.toLowerCase());
-    // statusFilter 暂留（后端无 status 字段）
-    return matches;
-  });
+  // 有搜索词时显示服务端搜索结果
+  // statusFilter 暂留（后端无 status 字段）
+  const filtered = searchTerm.trim() ? (searchResults || []) : expenses;
 
   // 统计数据
   const stats = {
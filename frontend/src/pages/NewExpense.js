@@ -4,7 +4,7 @@ import { Mic, MicOff } from 'lucide-react';
 import PageHeader from '../components/PageHeader';
 import StepIndicator from '../components/StepIndicator';
 import UploadArea from '../components/UploadArea';
-import { ocrAPI, sttAPI, expenseAPI, contactGroupsAPI, contactsAPI } from '../services/api';
+import { ocrAPI, sttAPI, expenseAPI, contactGroupsAPI, contactsAPI, itemsAPI, splitsAPI } from '../services/api';
 import { STEPS } from '../constants';
 import authService from '../services/authService';
 
@@ -41,12 +41,38 @@ const NewExpense = () => {
   const [selectedGroupId, setSelectedGroupId] = useState(null);
   const [contacts, setContacts] = useState([]);
 
+  /* Item name autocomplete */
+  const [itemQuery, setItemQuery] = useState('');
+  const [itemSuggestions, setItemSuggestions] = useState([]);
+
   /* ---------- 生命周期 ---------- */
   useEffect(() => {
     loadContactGroups();
     loadContacts();
   }, []);
 
+  // 商品名联想（输入停止 150ms 后请求），优先当前商店的历史商品
+  useEffect(() => {
+    const q = itemQuery.trim();
+    if (!q) {
+      setItemSuggestions([]);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await itemsAPI.suggest(q, ocrResult?.store_name || null, 8);
+        if (!cancelled) setItemSuggestions(res.suggestions || []);
+      } catch (err) {
+        if (!cancelled) setItemSuggestions([]);
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [itemQuery, ocrResult?.store_name]);
+
   const loadContactGroups = async () => {
     try {
       const res = await contactGroupsAPI.getContactGroups();
@@ -132,6 +158,9 @@ const handleItemChange = (idx, field, val) => {
     items[idx][field] = Math.max(1, parseInt(val, 10) || 1);
   } else {
     items[idx][field] = val;
+    if (field === 'name') {
+      setItemQuery(val);
+    }
   }
 
   // If autoCalculate is enabled, recalculate subtotal and total
@@ -481,30 +510,34 @@ const handleRemoveItem = (idx) => {
     if (activeStep > 1) setActiveStep((s) => s - 1);
   };
 
-  /* ---------- 每人应付金额计算 ---------- */
-  const perPersonTotal = React.useMemo(() => {
+  /* ---------- 每人应付金额计算（服务端按商品分配和税计算） ---------- */
+  const [perPersonTotal, setPerPersonTotal] = useState({});
+  useEffect(() => {
+    if (activeStep !== 5) return;
     // Use expanded items if available
     const itemsToUse = expandedItems.length > 0 ? expandedItems : (ocrResult?.items || []);
-    if (!itemsToUse || itemsToUse.length === 0) return {};
-    
-    const res = {};
-    participants.forEach((p) => {
-      const key = p.toLowerCase().trim();
-      const indices = itemAssignments[key] || [];
-      let sum = 0;
-      indices.forEach((itemIdx) => {
-        const item = itemsToUse[itemIdx];
-        if (!item) return;
-        const shareCount = participants.filter((pp) => {
-          const ppKey = pp.toLowerCase().trim();
-          return itemAssignments[ppKey]?.includes(itemIdx);
-        }).length;
-        if (shareCount) sum += (item.price || 0) / shareCount;
-      });
-      res[p] = sum.toFixed(2);
-    });
-    return res;
-  }, [participants, itemAssignments, ocrResult, expandedItems]);
+    if (!itemsToUse.length || !participants.length) return setPerPersonTotal({});
+
+    let cancelled = false;
+    splitsAPI.previewSplits(
+      participants.map((p) => ({
+        name: p,
+        item_indexes: itemAssignments[p.toLowerCase().trim()] || [],
+      })),
+      itemsToUse.map((it) => ({ name: it.name, price: it.price || 0, quantity: 1 })),
+      { tax_amount: ocrResult?.tax_amount || 0, tax_split: 'proportional' }
+    )
+      .then((res) => {
+        if (cancelled) return;
+        const totals = {};
+        participants.forEach((p, idx) => {
+          totals[p] = Number(res.shares[idx].amount_owed).toFixed(2);
+        });
+        setPerPersonTotal(totals);
+      })
+      .catch((err) => !cancelled && setError(err.message || 'Failed to calculate shares'));
+    return () => { cancelled = true; };
+  }, [activeStep, participants, itemAssignments, ocrResult, expandedItems]);
 
 
 
@@ -693,6 +726,15 @@ const handleRemoveItem = (idx) => {
                 </span>
               )}
             </h4>
+            <datalist id="item-suggestions">
+              {itemSuggestions.map((s) => (
+                <option
+                  key={s.name}
+                  value={s.name}
+                  label={s.last_price != null ? `$${Number(s.last_price).toFixed(2)} last time` : undefined}
+                />
+              ))}
+            </datalist>
             <div className="space-y-3">
               {ocrResult.items.map((item, idx) => (
                 <div key={idx} className="flex items-center gap-3 bg-gray-50 border border-gray-200 rounded-lg p-3">
@@ -701,6 +743,7 @@ const handleRemoveItem = (idx) => {
                     type="text"
                     value={item.name || ''}
                     onChange={(e) => handleItemChange(idx, 'name', e.target.value)}
+                    list="item-suggestions"
                     placeholder="Item name"
                     className="flex-2 px-3 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500"
                   />
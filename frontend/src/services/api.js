@@ -341,9 +341,52 @@ export const expenseAPI = {
 
   /**
    * Get user's expenses
+   * @param {Object} options - { cursor, includeTotal, include, fields }; pass
+   *   the previous response's next_cursor as cursor to load the next page.
+   *   raw_text / transcript are only returned when listed in include.
    */
-  getExpenses: async (limit = 50, offset = 0) => {
-    return apiRequest(`/api/expenses?limit=${limit}&offset=${offset}`, {
+  getExpenses: async (limit = 50, offset = 0, options = {}) => {
+    const params = new URLSearchParams({ limit, offset });
+    if (options.cursor) {
+      params.set('cursor', options.cursor);
+    }
+    if (options.includeTotal) {
+      params.set('include_total', 'true');
+    }
+    if (options.include) {
+      params.set('include', options.include);
+    }
+    if (options.fields) {
+      params.set('fields', options.fields);
+    }
+    return apiRequest(`/api/expenses?${params.toString()}`, {
+      method: 'GET',
+    });
+  },
+
+  /**
+   * Full-text search over store, items, transcript and OCR text
+   * @param {Object} options - { cursor, include }; pass the previous
+   *   response's next_cursor as cursor to load more results
+   */
+  searchExpenses: async (q, limit = 20, options = {}) => {
+    const params = new URLSearchParams({ q, limit });
+    if (options.cursor) {
+      params.set('cursor', options.cursor);
+    }
+    if (options.include) {
+      params.set('include', options.include);
+    }
+    return apiRequest(`/api/expenses/search?${params.toString()}`, {
+      method: 'GET',
+    });
+  },
+
+  /**
+   * Get dashboard totals (count, lifetime / month-to-date, owed / owing)
+   */
+  getSummary: async () => {
+    return apiRequest('/api/expenses/summary', {
       method: 'GET',
     });
   },
@@ -351,8 +394,12 @@ export const expenseAPI = {
   /**
    * Get expenses shared with me
    */
-  getSharedExpenses: async (limit = 50, offset = 0) => {
-    return apiRequest(`/api/expenses/shared-with-me?limit=${limit}&offset=${offset}`, {
+  getSharedExpenses: async (limit = 50, offset = 0, options = {}) => {
+    const params = new URLSearchParams({ limit, offset });
+    if (options.include) {
+      params.set('include', options.include);
+    }
+    return apiRequest(`/api/expenses/shared-with-me?${params.toString()}`, {
       method: 'GET',
     });
   },
@@ -456,6 +503,27 @@ export const contactGroupsAPI = {
     });
   },
 
+  /**
+   * Add contacts to a contact group
+   */
+  addGroupMembers: async (groupId, contactIds) => {
+    return apiRequest(`/api/contact-groups/${groupId}/members`, {
+      method: 'POST',
+      body: JSON.stringify({
+        contact_ids: contactIds,
+      }),
+    });
+  },
+
+  /**
+   * Remove a contact from a contact group
+   */
+  removeGroupMember: async (groupId, contactId) => {
+    return apiRequest(`/api/contact-groups/${groupId}/members/${contactId}`, {
+      method: 'DELETE',
+    });
+  },
+
   /**
    * Delete a contact group
    */
@@ -472,17 +540,44 @@ export const contactGroupsAPI = {
 export const splitsAPI = {
   /**
    * Create expense splits
+   * With items, amount_owed is computed on the server from each
+   * participant's item_indexes (see calculateSplits); participants with
+   * billed: false share items, tax and tip but get no split
    */
-  createSplits: async (expenseId, participants) => {
+  createSplits: async (expenseId, participants, items, policy) => {
     return apiRequest(`/api/expenses/${expenseId}/splits`, {
       method: 'POST',
       body: JSON.stringify({
         expense_id: expenseId,
         participants: participants,
+        items: items,
+        policy: policy,
       }),
     });
   },
 
+  /**
+   * Preview per-participant shares computed on the server
+   * participants: [{name, item_indexes}], items: [{name, price, quantity}],
+   * policy: {tax_amount, tip_amount, tip_percent, tax_split, tip_split}
+   */
+  calculateSplits: async (expenseId, participants, items, policy = {}) => {
+    return apiRequest(`/api/expenses/${expenseId}/splits/calculate`, {
+      method: 'POST',
+      body: JSON.stringify({ participants, items, policy }),
+    });
+  },
+
+  /**
+   * Same preview before the expense is saved (tax only from policy.tax_amount)
+   */
+  previewSplits: async (participants, items, policy = {}) => {
+    return apiRequest('/api/expenses/splits/calculate', {
+      method: 'POST',
+      body: JSON.stringify({ participants, items, policy }),
+    });
+  },
+
   /**
    * Get expense splits
    */
@@ -506,6 +601,24 @@ export const splitsAPI = {
   },
 };
 
+/**
+ * Item catalog API
+ */
+export const itemsAPI = {
+  /**
+   * Suggest item names from purchase history (optionally for one store)
+   */
+  suggest: async (q, store = null, limit = 10) => {
+    const params = new URLSearchParams({ q, limit });
+    if (store) {
+      params.set('store', store);
+    }
+    return apiRequest(`/api/items/suggest?${params.toString()}`, {
+      method: 'GET',
+    });
+  },
+};
+
 export default {
   auth: authAPI,
   ocr: ocrAPI,
@@ -515,5 +628,6 @@ export default {
   contacts: contactsAPI,
   contactGroups: contactGroupsAPI,
   splits: splitsAPI,
+  items: itemsAPI,
 };
 
@@ -12,6 +12,13 @@ if [[ "$OSTYPE" == "darwin"* ]]; then
     
     sleep 2
     
+    # Email outbox worker (sends queued bill emails)
+    osascript -e 'tell application "Terminal"
+        do script "cd '"$PWD"'/backend/auth_service && source venv/bin/activate && echo \"📧 Email Outbox Worker\" && python outbox_worker.py"
+    end tell'
+    
+    sleep 2
+    
     # OCR Service (Port 8000)
     osascript -e 'tell application "Terminal"
         do script "cd '"$PWD"'/backend/ocr_service && source venv/bin/activate && echo \"📸 OCR Service (Port 8000)\" && python -m uvicorn main:app --reload --port 8000"